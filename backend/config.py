@@ -1,12 +1,47 @@
 import os
 import json
+import hashlib
+import tempfile
+import threading
 
 CONFIG_FILE = os.path.join(os.path.dirname(__file__), 'config.json')
 PROMPTS_DIR = os.path.join(os.path.dirname(__file__), 'prompts')
+PROMPT_FILES = ["transcript.md", "extract.md", "verify.md", "thread_writer.md", "thread_judge.md"]
+
+
+def _atomic_write(path: str, content: str):
+    """Writes to a temp file in the same directory and swaps it into place."""
+    directory = os.path.dirname(path)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=os.path.basename(path))
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try: os.remove(tmp_path)
+        except OSError: pass
+        raise
+
 
 class ConfigManager:
+    # Process-wide snapshot, reloaded only when a file's mtime/size changes
+    _snapshot = None
+    _stamps = None
+    _lock = threading.RLock()
+
     @staticmethod
-    def get_config():
+    def _file_stamps() -> tuple:
+        stamps = []
+        for path in [CONFIG_FILE] + [os.path.join(PROMPTS_DIR, name) for name in PROMPT_FILES]:
+            try:
+                stat = os.stat(path)
+                stamps.append((path, stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                stamps.append((path, None, None))
+        return tuple(stamps)
+
+    @staticmethod
+    def _load() -> dict:
         """Reads models config and all prompt files."""
         # Read models config
         if os.path.exists(CONFIG_FILE):
@@ -23,7 +58,7 @@ class ConfigManager:
 
         # Read prompts
         prompts = {}
-        for filename in ["transcript.md", "extract.md", "verify.md", "thread_writer.md", "thread_judge.md"]:
+        for filename in PROMPT_FILES:
             path = os.path.join(PROMPTS_DIR, filename)
             if os.path.exists(path):
                 with open(path, 'r', encoding='utf-8') as f:
@@ -33,32 +68,60 @@ class ConfigManager:
             else:
                 prompts[filename.replace('.md', '')] = ""
 
+        models = config.get("models", {})
+        # Content-derived version, stable across restarts
+        digest = hashlib.sha256(
+            json.dumps({"models": models, "prompts": prompts}, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+
         return {
-            "models": config.get("models", {}),
-            "prompts": prompts
+            "models": models,
+            "prompts": prompts,
+            "version": digest
+        }
+
+    @staticmethod
+    def get_config():
+        """
+        Returns the current config snapshot (models, prompts, version).
+        Files are only re-read when their mtime or size changed. Callers get
+        their own copy, so a job can hold on to one consistent snapshot.
+        """
+        stamps = ConfigManager._file_stamps()
+        with ConfigManager._lock:
+            if ConfigManager._snapshot is None or stamps != ConfigManager._stamps:
+                ConfigManager._snapshot = ConfigManager._load()
+                ConfigManager._stamps = stamps
+            snapshot = ConfigManager._snapshot
+
+        return {
+            "models": dict(snapshot["models"]),
+            "prompts": dict(snapshot["prompts"]),
+            "version": snapshot["version"]
         }
 
     @staticmethod
     def update_config(data):
-        """Updates models config and writes prompt files."""
-        # Update models
-        if "models" in data:
-            current_config = {}
-            if os.path.exists(CONFIG_FILE):
-                with open(CONFIG_FILE, 'r') as f:
-                    current_config = json.load(f)
-            
-            current_config["models"] = data["models"]
-            
-            with open(CONFIG_FILE, 'w') as f:
-                json.dump(current_config, f, indent=2)
-
-        # Update prompts
-        if "prompts" in data:
-            for key, content in data["prompts"].items():
-                filename = f"{key}.md"
-                path = os.path.join(PROMPTS_DIR, filename)
-                with open(path, 'w', encoding='utf-8') as f:
-                    f.write(content)
+        """Updates models config and writes prompt files atomically."""
+        with ConfigManager._lock:
+            # Update models
+            if "models" in data:
+                current_config = {}
+                if os.path.exists(CONFIG_FILE):
+                    with open(CONFIG_FILE, 'r') as f:
+                        current_config = json.load(f)
+
+                current_config["models"] = data["models"]
+                _atomic_write(CONFIG_FILE, json.dumps(current_config, indent=2))
+
+            # Update prompts
+            if "prompts" in data:
+                for key, content in data["prompts"].items():
+                    filename = f"{key}.md"
+                    path = os.path.join(PROMPTS_DIR, filename)
+                    _atomic_write(path, content)
+
+            # Force a reload even if a write landed within mtime resolution
+            ConfigManager._snapshot = None
 
         return ConfigManager.get_config()
@@ -0,0 +1,163 @@
+"""
+LLM Response Cache
+Opt-in, on-disk cache of OpenRouter completions keyed by a hash of the
+model, messages and sampling params. Entries expire after a TTL and the
+least recently used ones are evicted once the cache exceeds its size budget.
+
+Enable with LLM_CACHE_ENABLED=1 in .env.
+"""
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Optional
+from .utils import get_env_var, file_sha256
+
+PROJECT_ROOT = Path(__file__).parent.parent.resolve()
+CACHE_DIR = PROJECT_ROOT / "cache"
+LLM_CACHE_FILE = CACHE_DIR / "llm_cache.sqlite3"
+
+LLM_CACHE_ENABLED = (get_env_var("LLM_CACHE_ENABLED") or "").lower() in ("1", "true", "yes")
+LLM_CACHE_MAX_BYTES = int(get_env_var("LLM_CACHE_MAX_MB") or 512) * 1024 * 1024
+# 0 disables expiry
+LLM_CACHE_TTL_SECONDS = int(get_env_var("LLM_CACHE_TTL_HOURS") or 24 * 7) * 3600
+
+
+def _keyable(obj):
+    """Replaces file-backed audio parts with a digest of the file contents."""
+    if isinstance(obj, dict):
+        if "file" in obj and "format" in obj:
+            return {"sha256": file_sha256(obj["file"]), "format": obj["format"]}
+        return {k: _keyable(v) for k, v in obj.items()}
+    if isinstance(obj, list):
+        return [_keyable(v) for v in obj]
+    return obj
+
+
+def make_cache_key(model: str, messages: list, params: Optional[dict] = None) -> str:
+    """Content hash of everything that determines a completion."""
+    material = json.dumps(
+        {"model": model, "messages": _keyable(messages), "params": params or {}},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    def __init__(self, path: Path, max_bytes: int, ttl_seconds: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._total_bytes = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed)")
+            conn.commit()
+            self._total_bytes = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            db = self._db()
+            row = db.execute("SELECT value, size, created FROM entries WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row and self.ttl_seconds and now - row[2] > self.ttl_seconds:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                db.commit()
+                self._total_bytes -= row[1]
+                row = None
+            if not row:
+                self.misses += 1
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            db.commit()
+            self.hits += 1
+            return zlib.decompress(row[0]).decode("utf-8")
+
+    def set(self, key: str, value: str):
+        blob = zlib.compress(value.encode("utf-8"))
+        if len(blob) > self.max_bytes:
+            return
+        with self._lock:
+            db = self._db()
+            now = time.time()
+            old = db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            if old:
+                self._total_bytes -= old[0]
+            db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._total_bytes += len(blob)
+            self._evict(db)
+            db.commit()
+
+    def _evict(self, db: sqlite3.Connection):
+        """Drops expired entries, then least recently used ones until under budget."""
+        if self.ttl_seconds:
+            cutoff = time.time() - self.ttl_seconds
+            expired = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries WHERE created < ?", (cutoff,)).fetchone()
+            if expired[0]:
+                db.execute("DELETE FROM entries WHERE created < ?", (cutoff,))
+                self._total_bytes -= expired[1]
+                self.evictions += expired[0]
+
+        while self._total_bytes > self.max_bytes:
+            rows = db.execute("SELECT key, size FROM entries ORDER BY accessed ASC LIMIT 32").fetchall()
+            if not rows:
+                self._total_bytes = 0
+                break
+            for key, size in rows:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._total_bytes -= size
+                self.evictions += 1
+                if self._total_bytes <= self.max_bytes:
+                    break
+
+    def clear(self):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM entries")
+            db.commit()
+            self._total_bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = self._db().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "enabled": LLM_CACHE_ENABLED,
+                "entries": entries,
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+llm_cache = LLMCache(LLM_CACHE_FILE, LLM_CACHE_MAX_BYTES, LLM_CACHE_TTL_SECONDS)
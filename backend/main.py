@@ -1,18 +1,29 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi.responses import FileResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional, List
-import requests
 import os
+import json
 import uuid
 from pathlib import Path
-from .services.downloader import download_space, download_space_generator, get_video_formats, download_video_generator, VIDEOS_DIR
-from .services.processor import analyze_audio, transcribe_full_space
+from .services.downloader import download_space_generator, get_video_formats, download_video_generator, resume_downloads, VIDEOS_DIR
 from .services.thread_generator import generate_thread
 from .services.scout import ScoutService
-from .services.clip_renderer import render_clip, CLIPS_DIR, LOGOS_DIR
+from .services.scout_store import scout_store
+from .services.auto_ingest import auto_ingest, AUTO_INGEST_ENABLED
+from .services.storage import storage, touch
+from .services.clip_renderer import CLIPS_DIR, LOGOS_DIR
+from .services.jobs import job_manager
+from .services.pipeline import run_process, run_transcribe, run_live, run_render_clip, run_render_batch, PhaseReporter
+from .services.transcript_store import transcript_store
+from .services.download_index import download_index
+from .services.download_manager import download_manager
+from .services.alignment import align_segments
 from .config import ConfigManager
+from .utils import get_http_session, track_usage
+from .llm_cache import llm_cache
+from .metrics import render_metrics
 
 app = FastAPI()
 
@@ -25,6 +36,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def clean_up_storage():
+    """Sweeps temp files of the last run and brings every area within its quota."""
+    storage.sweep_orphans()
+    storage.enforce_all()
+
+@app.on_event("startup")
+def resume_queued_downloads():
+    """Restarts downloads left in the persisted queue by the last run."""
+    resume_downloads()
+
+@app.on_event("startup")
+def start_auto_ingest():
+    """Starts the background scheduler when AUTO_INGEST_ENABLED is set."""
+    if AUTO_INGEST_ENABLED:
+        auto_ingest.start()
+
 class AnalyzeRequest(BaseModel):
     url: str
 
@@ -33,11 +61,15 @@ class ThreadResult(BaseModel):
     iterations: int
     approved: bool
     feedback_history: List[dict]
+    candidates: List[dict] = []
 
 class AnalyzeResponse(BaseModel):
     markdown_report: str
     audio_path: str
     thread_result: Optional[ThreadResult] = None
+    aligned_segments: Optional[List[dict]] = None
+    usage: Optional[dict] = None
+    config_version: Optional[str] = None
 
 class ConfigRequest(BaseModel):
     models: dict
@@ -46,9 +78,17 @@ class ConfigRequest(BaseModel):
 class ScoutRequest(BaseModel):
     username: str = ""
 
+class WatchlistRequest(BaseModel):
+    usernames: List[str]
+
+class WatchlistScanRequest(BaseModel):
+    usernames: Optional[List[str]] = None
+    force: bool = False
+
 class ThreadRequest(BaseModel):
     transcript: str
     segments: str
+    candidates: Optional[int] = None
 
 class RenderClipRequest(BaseModel):
     audio_path: str
@@ -61,11 +101,31 @@ class RenderClipRequest(BaseModel):
     logo_position: str = "top-right"
     colors: Optional[dict] = None
 
+class AlignRequest(BaseModel):
+    audio_path: str
+    segments: str
+
+class ClipSpec(BaseModel):
+    start_time: float
+    end_time: float
+    layout: str = "centered_waveform"
+    title: Optional[str] = None
+    caption_text: str = ""
+
+class RenderBatchRequest(BaseModel):
+    audio_path: str
+    clips: List[ClipSpec]
+    title: str = "Space2Thread"
+    logo_path: Optional[str] = None
+    logo_position: str = "top-right"
+    colors: Optional[dict] = None
+    concurrency: Optional[int] = None
+
 @app.get("/api/models")
-async def get_models():
+def get_models():
     """Fetches available models from OpenRouter."""
     try:
-        response = requests.get("https://openrouter.ai/api/v1/models")
+        response = get_http_session().get("https://openrouter.ai/api/v1/models", timeout=30)
         if response.status_code == 200:
             data = response.json()
             # Sort by ID for easier finding
@@ -77,17 +137,33 @@ async def get_models():
         return {"models": []}
 
 @app.get("/api/config")
-async def get_config():
+def get_config():
     """Returns current configuration."""
     return ConfigManager.get_config()
 
 @app.post("/api/config")
-async def update_config(request: ConfigRequest):
+def update_config(request: ConfigRequest):
     """Updates configuration."""
     return ConfigManager.update_config(request.dict())
 
+@app.get("/api/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Prometheus-format latency, byte, token and cost metrics."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+@app.get("/api/llm-cache")
+def get_llm_cache_stats():
+    """Returns LLM response cache size and hit/miss counters."""
+    return llm_cache.stats()
+
+@app.delete("/api/llm-cache")
+def clear_llm_cache():
+    """Drops every cached LLM response."""
+    llm_cache.clear()
+    return llm_cache.stats()
+
 @app.post("/api/scout")
-async def scout_space(request: ScoutRequest):
+def scout_space(request: ScoutRequest):
     """Finds the latest space for a user."""
     try:
         url = ScoutService.find_latest_space(request.username)
@@ -98,12 +174,69 @@ async def scout_space(request: ScoutRequest):
         print(f"Scout Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/scout/watchlist")
+def get_watchlist():
+    return {"usernames": scout_store.get_watchlist()}
+
+@app.put("/api/scout/watchlist")
+def set_watchlist(request: WatchlistRequest):
+    """Replaces the list of usernames scanned by /api/scout/watchlist/scan."""
+    return {"usernames": scout_store.set_watchlist(request.usernames)}
+
+@app.post("/api/scout/watchlist/scan")
+def scan_watchlist(request: WatchlistScanRequest):
+    """
+    Scans the watchlist (or the given usernames) in parallel and returns
+    the Spaces not seen in earlier scans. Per-user results are cached for
+    SCOUT_CACHE_TTL seconds unless force is set.
+    """
+    try:
+        return ScoutService.scan_watchlist(request.usernames, force=request.force)
+    except Exception as e:
+        print(f"Scout Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/scout/seen")
+def list_seen_spaces(limit: int = 100):
+    """Spaces found by earlier scans, newest first."""
+    return {"spaces": scout_store.list_seen(limit)}
+
+@app.get("/api/auto-ingest")
+def auto_ingest_status(limit: int = 50):
+    """Scheduler state and the most recent auto-ingested Spaces."""
+    return {**auto_ingest.stats(), "spaces": scout_store.ingest_list(limit)}
+
+@app.post("/api/auto-ingest/scan")
+def auto_ingest_scan():
+    """Scans now instead of waiting for the next interval; returns the newly queued Spaces."""
+    if not AUTO_INGEST_ENABLED:
+        raise HTTPException(status_code=409, detail="Auto-ingest is disabled (set AUTO_INGEST_ENABLED=1)")
+    try:
+        return {"queued": auto_ingest.scan()}
+    except Exception as e:
+        print(f"Auto-Ingest Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/auto-ingest/{space_id}")
+def auto_ingest_result(space_id: str):
+    """An auto-ingested Space with its process result (report, thread, segments)."""
+    item = scout_store.ingest_get(space_id)
+    if not item:
+        raise HTTPException(status_code=404, detail="Space not found")
+    return item
+
 @app.post("/api/generate-thread")
-async def api_generate_thread(request: ThreadRequest):
+def api_generate_thread(request: ThreadRequest):
     """Standalone endpoint to generate thread from transcript + segments."""
     try:
-        result = generate_thread(request.transcript, request.segments)
-        return result
+        config = ConfigManager.get_config()
+        with track_usage() as usage:
+            result = generate_thread(
+                request.transcript, request.segments,
+                on_progress=PhaseReporter(None), candidates=request.candidates,
+                config=config
+            )
+        return {**result, "usage": usage.totals(), "config_version": config["version"]}
     except Exception as e:
         print(f"Thread Generation Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -120,16 +253,39 @@ def download_mp3(request: DownloadRequest):
     """Downloads a Twitter/X Space as MP3 only — streams progress as JSON lines."""
     print(f"[Download Only/Streaming] Received request for: {request.url}")
     return StreamingResponse(
-        download_space_generator(request.url),
+        _then_enforce(download_space_generator(request.url), "downloads"),
         media_type="application/x-ndjson"
     )
 
+def _then_enforce(stream, area: str):
+    """Passes a download stream through, then applies the area's quota (also if the client leaves)."""
+    try:
+        yield from stream
+    finally:
+        storage.enforce(area)
+
+@app.get("/api/downloads")
+def list_downloads(kind: Optional[str] = None):
+    """Lists indexed downloads (most recently used first) and the download queue."""
+    return {"downloads": download_index.list(kind), "queue": download_manager.stats()}
+
+@app.get("/api/storage")
+def storage_usage():
+    """Disk usage and quota per storage area."""
+    return storage.stats()
+
+@app.post("/api/storage/enforce")
+def storage_enforce():
+    """Applies every area's quota now; returns the evicted files."""
+    return {"evicted": storage.enforce_all()}
+
 @app.get("/api/files/{filename}")
 async def serve_file(filename: str):
     """Serves a downloaded MP3 file for browser download."""
     filepath = os.path.join("downloads", filename)
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="File not found")
+    touch(filepath)
     return FileResponse(
         filepath,
         media_type="audio/mpeg",
@@ -142,88 +298,177 @@ def transcribe_space(request: DownloadRequest):
     """Downloads a Space and transcribes it — no segment extraction or threads."""
     try:
         print(f"[Transcribe] Received request for: {request.url}")
-        audio_path = download_space(request.url)
-        print(f"[Transcribe] Downloaded: {audio_path}")
-        
-        transcript = transcribe_full_space(audio_path)
-        filename = os.path.basename(audio_path)
+        with track_usage() as usage:
+            result = run_transcribe(url=request.url)
         print(f"[Transcribe] Complete.")
-        return {
-            "transcript": transcript,
-            "audio_path": audio_path,
-            "filename": filename,
-            "download_url": f"/api/files/{filename}"
-        }
+        return {**result, "usage": usage.totals()}
     except Exception as e:
         print(f"Transcribe Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/transcripts")
+def list_transcripts():
+    """Lists stored transcripts (metadata only)."""
+    return {"transcripts": transcript_store.list_transcripts()}
+
+@app.get("/api/transcripts/{transcript_id}")
+def get_transcript(transcript_id: int):
+    """Returns a stored transcript with its text and word timings (if any)."""
+    record = transcript_store.get_by_id(transcript_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Transcript not found")
+    return record
+
 @app.post("/api/process", response_model=AnalyzeResponse)
-async def process_space(request: AnalyzeRequest):
+def process_space(request: AnalyzeRequest):
     try:
-        # 1. Download
         print(f"Received request for URL: {request.url}")
-        audio_path = download_space(request.url)
-        print(f"Downloaded to: {audio_path}")
-        
-        # 2. Analyze (extract viral segments)
-        print("Starting analysis...")
-        report = analyze_audio(audio_path)
-        print("Analysis complete.")
-        
-        # 3. Generate tweet thread automatically
-        print("Generating tweet thread...")
-        thread_result = None
-        try:
-            segments = report.get("segments", "")
-            transcript = report.get("transcript", "")
-            
-            if transcript:
-                result = generate_thread(transcript, segments)
-                thread_result = ThreadResult(
-                    thread=result["thread"],
-                    iterations=result["iterations"],
-                    approved=result["approved"],
-                    feedback_history=result["feedback_history"]
-                )
-                print(f"Thread generated: approved={result['approved']}, iterations={result['iterations']}")
-            else:
-                print("Warning: Could not extract transcript for thread generation")
-        except Exception as thread_error:
-            print(f"Thread generation failed (non-fatal): {thread_error}")
-            # Continue without thread - don't fail the whole request
-        
-        return AnalyzeResponse(
-            markdown_report=report.get("markdown_report", ""),
-            audio_path=audio_path,
-            thread_result=thread_result
-        )
-        
+        with track_usage() as usage:
+            result = run_process(url=request.url)
+        return {**result, "usage": usage.totals()}
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/align-segments")
+def api_align_segments(request: AlignRequest):
+    """
+    Finds start/end times for each row of a segments markdown table, ready
+    to pass to /api/render-clip or /api/render-clips/stream.
+    """
+    if not os.path.exists(request.audio_path):
+        raise HTTPException(status_code=404, detail="Audio file not found")
+    try:
+        return {"segments": align_segments(request.audio_path, request.segments)}
+    except Exception as e:
+        print(f"Alignment Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.post("/api/render-clip")
-async def api_render_clip(request: RenderClipRequest):
+def api_render_clip(request: RenderClipRequest):
     """Renders a video clip from a segment."""
     try:
-        output_path = render_clip(
-            audio_path=request.audio_path,
-            start_time=request.start_time,
-            end_time=request.end_time,
-            layout=request.layout,
-            title=request.title,
-            caption_text=request.caption_text,
-            logo_path=request.logo_path,
-            logo_position=request.logo_position,
-            colors=request.colors,
-        )
-        filename = os.path.basename(output_path)
-        return {"clip_url": f"/api/clips/{filename}", "filename": filename}
+        return run_render_clip(**request.dict())
     except Exception as e:
         print(f"Clip Render Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/render-clips/stream")
+def render_clips_stream(request: RenderBatchRequest):
+    """
+    Renders a batch of clips from one source audio and streams JSON lines:
+    phase events, one clip_completed/clip_failed event per clip as it
+    finishes, then the full result.
+    """
+    if not request.clips:
+        raise HTTPException(status_code=400, detail="No clips to render")
+    job = job_manager.submit("render-clips", run_render_batch, **request.dict())
+    return StreamingResponse(_job_event_stream(job), media_type="application/x-ndjson")
+
+@app.post("/api/process/stream")
+def process_space_stream(request: AnalyzeRequest):
+    """
+    Runs the process pipeline as a job and streams its progress as JSON
+    lines: phase events with elapsed time and token counts, partial results
+    (transcript, segments, drafts) as soon as they exist, then the result.
+    """
+    print(f"[Process/Streaming] Received request for: {request.url}")
+    job = job_manager.submit("process", run_process, url=request.url)
+    return StreamingResponse(_job_event_stream(job), media_type="application/x-ndjson")
+
+@app.post("/api/live/stream")
+def live_space_stream(request: AnalyzeRequest):
+    """
+    Records a live Space and streams JSON lines while it runs: a
+    chunk_sealed event per recorded chunk, transcript_updated events with
+    the rolling transcript, then the usual process events once it ends.
+    """
+    print(f"[Live/Streaming] Received request for: {request.url}")
+    job = job_manager.submit("live", run_live, url=request.url)
+    return StreamingResponse(_job_event_stream(job), media_type="application/x-ndjson")
+
+def _job_event_stream(job):
+    yield json.dumps({"job_id": job.id, "status": job.status}) + "\n"
+    for event in job_manager.iter_events(job):
+        yield json.dumps(event) + "\n"
+
+# ─────────────────────────────────────────────
+# Background Jobs
+# ─────────────────────────────────────────────
+
+@app.post("/api/jobs/process")
+def submit_process_job(request: AnalyzeRequest):
+    """Queues the full process pipeline and returns a job id immediately."""
+    job = job_manager.submit("process", run_process, url=request.url)
+    return job.to_dict()
+
+@app.post("/api/jobs/live")
+def submit_live_job(request: AnalyzeRequest):
+    """Starts recording + rolling transcription of a live Space and returns a job id."""
+    job = job_manager.submit("live", run_live, url=request.url)
+    return job.to_dict()
+
+@app.post("/api/jobs/transcribe")
+def submit_transcribe_job(request: DownloadRequest):
+    """Queues download + transcription and returns a job id immediately."""
+    job = job_manager.submit("transcribe", run_transcribe, url=request.url)
+    return job.to_dict()
+
+@app.post("/api/jobs/render-clip")
+def submit_render_job(request: RenderClipRequest):
+    """Queues a clip render and returns a job id immediately."""
+    job = job_manager.submit("render-clip", run_render_clip, **request.dict())
+    return job.to_dict()
+
+@app.post("/api/jobs/render-clips")
+def submit_render_batch_job(request: RenderBatchRequest):
+    """Queues a batch clip render and returns a job id immediately."""
+    if not request.clips:
+        raise HTTPException(status_code=400, detail="No clips to render")
+    job = job_manager.submit("render-clips", run_render_batch, **request.dict())
+    return job.to_dict()
+
+@app.get("/api/jobs")
+def list_jobs():
+    """Lists recent jobs and worker pool usage."""
+    return {"jobs": job_manager.list(), **job_manager.stats()}
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    """Returns the status of a job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/api/jobs/{job_id}/events")
+def stream_job_events(job_id: str):
+    """Streams a job's progress events (past and live) as JSON lines."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return StreamingResponse(_job_event_stream(job), media_type="application/x-ndjson")
+
+@app.get("/api/jobs/{job_id}/result")
+def get_job_result(job_id: str):
+    """Returns the result of a completed job."""
+    job = job_manager.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job.to_dict(include_result=True)
+
+@app.post("/api/jobs/{job_id}/cancel")
+def cancel_job(job_id: str):
+    """Cancels a queued job, or stops a running one at its next stage."""
+    job = job_manager.cancel(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
 @app.post("/api/upload-logo")
 async def upload_logo(file: UploadFile = File(...)):
     """Upload a logo/profile image for use in clips."""
@@ -235,6 +480,7 @@ async def upload_logo(file: UploadFile = File(...)):
         with open(filepath, "wb") as f:
             content = await file.read()
             f.write(content)
+        storage.enforce("logos")
         
         return {"logo_path": filepath, "filename": filename}
     except Exception as e:
@@ -247,6 +493,7 @@ async def serve_clip(filename: str):
     filepath = str(CLIPS_DIR / filename)
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="Clip not found")
+    touch(filepath)
     return FileResponse(filepath, media_type="video/mp4", filename=filename)
 
 if __name__ == "__main__":
@@ -273,7 +520,7 @@ def api_download_video(request: VideoDownloadRequest):
     """Downloads a video as MP4 — streams progress as JSON lines."""
     print(f"[Video Download/Streaming] URL: {request.url}, Quality: {request.quality}")
     return StreamingResponse(
-        download_video_generator(request.url, request.quality),
+        _then_enforce(download_video_generator(request.url, request.quality), "videos"),
         media_type="application/x-ndjson"
     )
 
@@ -283,6 +530,7 @@ async def serve_video(filename: str):
     filepath = os.path.join(VIDEOS_DIR, filename)
     if not os.path.exists(filepath):
         raise HTTPException(status_code=404, detail="Video not found")
+    touch(filepath)
     return FileResponse(
         filepath,
         media_type="video/mp4",
@@ -0,0 +1,141 @@
+"""
+Metrics
+Minimal in-process counters and histograms rendered in the Prometheus text
+exposition format at /api/metrics. Kept dependency-free on purpose; swap in
+prometheus_client if we ever need multiprocess support.
+"""
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+
+# Latency buckets (seconds) wide enough for a 3-hour transcription
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: tuple, extra: tuple = ()) -> str:
+    pairs = key + extra
+    if not pairs:
+        return ""
+    body = ",".join(
+        '{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for k, v in pairs
+    )
+    return "{" + body + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the duration of the block; adds status=error if it raises."""
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            yield
+        except BaseException:
+            status = "error"
+            raise
+        finally:
+            self.observe(time.perf_counter() - start, status=status, **labels)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, (('le', repr(float(bound))),))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, (('le', '+Inf'),))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+_registry = []
+
+
+def counter(name: str, help_text: str) -> Counter:
+    metric = Counter(name, help_text)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+    metric = Histogram(name, help_text, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def render_metrics() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ─────────────────────────────────────────────
+# Application metrics
+# ─────────────────────────────────────────────
+
+OPENROUTER_LATENCY = histogram("s2t_openrouter_request_seconds", "OpenRouter completion latency")
+OPENROUTER_TOKENS = counter("s2t_openrouter_tokens_total", "OpenRouter tokens by model and type")
+OPENROUTER_COST = counter("s2t_openrouter_cost_usd_total", "OpenRouter cost reported in usage (USD)")
+OPENROUTER_REQUEST_BYTES = counter("s2t_openrouter_request_bytes_total", "Bytes uploaded to OpenRouter")
+LLM_CACHE_LOOKUPS = counter("s2t_llm_cache_lookups_total", "LLM response cache lookups by result")
+
+DOWNLOAD_LATENCY = histogram("s2t_download_seconds", "Space/video download time including conversion")
+DOWNLOAD_BYTES = counter("s2t_download_bytes_total", "Bytes of audio/video written by downloads")
+
+FFMPEG_LATENCY = histogram("s2t_ffmpeg_seconds", "ffmpeg operation time by operation")
+
+DEEPGRAM_LATENCY = histogram("s2t_deepgram_request_seconds", "Deepgram transcription latency")
+DEEPGRAM_UPLOAD_BYTES = counter("s2t_deepgram_upload_bytes_total", "Bytes uploaded to Deepgram")
+
+RENDER_LATENCY = histogram("s2t_remotion_render_seconds", "Remotion clip render time by composition")
+RENDERED_VIDEO_SECONDS = counter("s2t_remotion_rendered_video_seconds_total", "Seconds of video rendered")
+
+PIPELINE_PHASE_LATENCY = histogram("s2t_pipeline_phase_seconds", "Pipeline phase duration")
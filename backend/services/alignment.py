@@ -0,0 +1,197 @@
+"""
+Quote Alignment
+Finds where the verbatim quotes in the extract/verify segments table were
+spoken. A trigram inverted index over the Space's word-timed transcript
+lets each quote vote for its most likely position, so every segment comes
+back with start/end times that can go straight to the clip renderer.
+
+Quotes may be stitched from several parts ("..." between them), which the
+extract prompt explicitly allows; each part is aligned on its own.
+"""
+import re
+import threading
+from collections import Counter, OrderedDict, defaultdict
+from typing import Optional
+from .word_index import WordIndex
+from .clip_renderer import get_space_word_index
+from .transcript_store import transcript_store
+
+NGRAM = 3
+# Share of a part's trigrams that must hit for it to count as found
+MIN_SCORE = 0.3
+# A hit may drift this many words from the winning start (inserted/dropped words)
+DRIFT = 4
+# Padding so the first and last word are not clipped
+LEAD_IN = 0.15
+TAIL = 0.3
+# Parts further apart than this are not merged into one clip span
+MAX_CLIP_SECONDS = 180
+ALIGNER_CACHE_SIZE = 4
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# "...", "…", "[...]", " / " or a closing quote followed by another quote
+_PART_SPLIT_RE = re.compile(r'\s*(?:\[\s*\.\.\.\s*\]|\.{3,}|…|\s/\s|"\s+")\s*')
+
+
+def normalize_tokens(text: str) -> list:
+    """Lowercase alphanumeric tokens; apostrophes are dropped (don't → dont)."""
+    return _WORD_RE.findall(text.lower().replace("'", "").replace("’", ""))
+
+
+def split_quote(text: str) -> list:
+    """Splits a stitched quote into its verbatim parts."""
+    parts = []
+    for part in _PART_SPLIT_RE.split(text or ""):
+        part = part.strip().strip('"“”').strip()
+        if len(normalize_tokens(part)) >= 2:
+            parts.append(part)
+    return parts
+
+
+def parse_segment_table(markdown: str) -> list:
+    """
+    Parses the segments markdown table into
+    {option, category, hook, body} dicts, one per row.
+    """
+    header = None
+    segments = []
+    for line in (markdown or "").splitlines():
+        line = line.strip()
+        if not line.startswith("|"):
+            continue
+        cells = [c.strip() for c in line.strip("|").split("|")]
+        if header is None:
+            if any("hook" in c.lower() for c in cells):
+                header = [c.lower() for c in cells]
+            continue
+        if all(re.fullmatch(r":?-+:?", c) for c in cells if c):
+            continue
+
+        def column(*names):
+            for i, name in enumerate(header):
+                if any(n in name for n in names) and i < len(cells):
+                    return cells[i]
+            return ""
+
+        segments.append({
+            "option": column("option", "#"),
+            "category": column("category"),
+            "hook": column("hook"),
+            "body": column("argument", "body"),
+        })
+    return segments
+
+
+class QuoteAligner:
+    def __init__(self, index: WordIndex):
+        self.index = index
+        # Tokenized like the quotes: "e.g." or "well-known" become two tokens,
+        # each mapped back to the word (and timings) it came from
+        self.tokens = []
+        self.word_of = []
+        for word, text in enumerate(index.tokens):
+            for token in normalize_tokens(text):
+                self.tokens.append(token)
+                self.word_of.append(word)
+        self.postings = defaultdict(list)
+        for i in range(len(self.tokens) - NGRAM + 1):
+            self.postings[tuple(self.tokens[i:i + NGRAM])].append(i)
+
+    def match(self, text: str) -> Optional[dict]:
+        """Aligns one verbatim part; returns {start, end, score, words} or None."""
+        tokens = normalize_tokens(text)
+        grams = [tuple(tokens[j:j + NGRAM]) for j in range(len(tokens) - NGRAM + 1)]
+        if not grams:
+            return None
+
+        # Each trigram hit votes for where the quote would start
+        votes = Counter()
+        hits = []
+        for j, gram in enumerate(grams):
+            for position in self.postings.get(gram, ()):
+                votes[position - j] += 1
+                hits.append((position - j, position))
+        if not votes:
+            return None
+
+        # Smooth votes over the drift window and pick the best start
+        best_start, best_votes = None, 0
+        for candidate in votes:
+            total = sum(votes.get(candidate + d, 0) for d in range(-DRIFT, DRIFT + 1))
+            if total > best_votes:
+                best_start, best_votes = candidate, total
+
+        matched = [p for start, p in hits if abs(start - best_start) <= DRIFT]
+        score = min(1.0, len(set(matched)) / len(grams))
+        if score < MIN_SCORE:
+            return None
+
+        first, last = self.word_of[min(matched)], self.word_of[max(matched) + NGRAM - 1]
+        return {
+            "start": self.index.starts[first],
+            "end": self.index.ends[last],
+            "score": round(score, 3),
+            "words": [first, last],
+        }
+
+    def align_segment(self, segment: dict) -> dict:
+        """
+        Aligns a segment's hook and body parts. start_time/end_time cover all
+        parts when they fit in one clip, otherwise just the body.
+        """
+        parts = []
+        for role in ("hook", "body"):
+            for text in split_quote(segment.get(role, "")):
+                found = self.match(text)
+                parts.append({"role": role, "text": text, **(found or {"start": None, "end": None, "score": 0.0})})
+
+        located = [p for p in parts if p["start"] is not None]
+        span = located
+        if located and max(p["end"] for p in located) - min(p["start"] for p in located) > MAX_CLIP_SECONDS:
+            span = [p for p in located if p["role"] == "body"] or located
+
+        result = {**segment, "parts": parts, "start_time": None, "end_time": None, "hook_outside_clip": span != located}
+        if span:
+            result["start_time"] = round(max(0.0, min(p["start"] for p in span) - LEAD_IN), 3)
+            result["end_time"] = round(max(p["end"] for p in span) + TAIL, 3)
+            result["confidence"] = round(sum(p["score"] for p in parts) / len(parts), 3)
+        return result
+
+
+_aligners = OrderedDict()
+_aligners_lock = threading.Lock()
+
+
+def get_aligner(audio_path: str) -> Optional[QuoteAligner]:
+    """Aligner over a Space's word index, built once per Space and kept in memory."""
+    audio_sha = transcript_store.audio_hash(audio_path)
+    with _aligners_lock:
+        aligner = _aligners.get(audio_sha)
+        if aligner is not None:
+            _aligners.move_to_end(audio_sha)
+            return aligner
+
+    index = get_space_word_index(audio_path)
+    if index is None:
+        return None
+    aligner = QuoteAligner(index)
+    with _aligners_lock:
+        _aligners[audio_sha] = aligner
+        while len(_aligners) > ALIGNER_CACHE_SIZE:
+            _aligners.popitem(last=False)
+    return aligner
+
+
+def align_segments(audio_path: str, segments_markdown: str) -> list:
+    """Parses the segments table and attaches start/end times to each row."""
+    segments = parse_segment_table(segments_markdown)
+    if not segments:
+        return []
+    aligner = get_aligner(audio_path)
+    if aligner is None:
+        print("[Align] No word timings available; segments left unaligned")
+        return segments
+    aligned = [aligner.align_segment(segment) for segment in segments]
+    found = sum(1 for s in aligned if s["start_time"] is not None)
+    print(f"[Align] Located {found}/{len(aligned)} segments")
+    return aligned
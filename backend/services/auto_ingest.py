@@ -0,0 +1,128 @@
+"""
+Auto-Ingest
+Background scheduler that scans the Scout watchlist (or AUTO_INGEST_ACCOUNTS)
+every AUTO_INGEST_INTERVAL seconds and runs the full process pipeline for
+each new Space, at most AUTO_INGEST_CONCURRENCY at a time and
+AUTO_INGEST_DAILY_BUDGET per day. Results are kept in the scout store, so
+threads are ready before anyone opens the UI. The queue survives restarts.
+"""
+import time
+import datetime
+import threading
+from typing import Optional
+from ..utils import get_env_var
+from .jobs import Job, job_manager
+from .pipeline import run_process
+from .scout import ScoutService
+from .scout_store import scout_store, normalize_username
+
+AUTO_INGEST_ENABLED = (get_env_var("AUTO_INGEST_ENABLED") or "0") != "0"
+AUTO_INGEST_INTERVAL = int(get_env_var("AUTO_INGEST_INTERVAL") or 30 * 60)
+# Spaces started per calendar day; the rest wait for the next day
+AUTO_INGEST_DAILY_BUDGET = int(get_env_var("AUTO_INGEST_DAILY_BUDGET") or 10)
+# Process jobs running at once
+AUTO_INGEST_CONCURRENCY = int(get_env_var("AUTO_INGEST_CONCURRENCY") or 2)
+# Comma-separated usernames; the Scout watchlist is used when unset
+AUTO_INGEST_ACCOUNTS = [u.strip() for u in (get_env_var("AUTO_INGEST_ACCOUNTS") or "").split(",") if u.strip()]
+
+
+def _start_of_day() -> float:
+    return time.mktime(datetime.date.today().timetuple())
+
+
+class AutoIngest:
+    def __init__(self, interval: int, daily_budget: int, concurrency: int, accounts: Optional[list] = None):
+        self.interval = interval
+        self.daily_budget = daily_budget
+        self.concurrency = concurrency
+        self.accounts = accounts or None
+        self.last_scan = None
+        self._running = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the polling thread; Spaces interrupted by a restart are queued again."""
+        if self._thread is not None:
+            return
+        requeued = scout_store.ingest_requeue_running()
+        if requeued:
+            print(f"[Auto-Ingest] Re-queued {requeued} interrupted Spaces")
+        self._thread = threading.Thread(target=self._loop, daemon=True, name="auto-ingest")
+        self._thread.start()
+        print(f"[Auto-Ingest] Polling every {self.interval}s (budget {self.daily_budget}/day, {self.concurrency} at once)")
+
+    def _loop(self):
+        while True:
+            try:
+                self.scan()
+            except Exception as e:
+                print(f"[Auto-Ingest] Scan failed: {e}")
+                self.last_scan = {"time": time.time(), "error": str(e)}
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def scan(self) -> list:
+        """
+        Scans for new Spaces, queues them and starts what the limits allow.
+        Only the ingest queue decides what is new, so Spaces already shown
+        by a manual Scout scan are still picked up.
+        """
+        accounts = list(dict.fromkeys(
+            u for u in map(normalize_username, self.accounts or scout_store.get_watchlist()) if u
+        ))
+        spaces, errors = ScoutService.find_spaces_bulk(accounts)
+        queued = [space for space in spaces if scout_store.ingest_add(space)]
+        self.last_scan = {
+            "time": time.time(),
+            "scanned": len(accounts),
+            "queued": len(queued),
+            "errors": errors,
+        }
+        if queued:
+            print(f"[Auto-Ingest] Queued {len(queued)} new Spaces")
+        self._dispatch()
+        return queued
+
+    def budget_left(self) -> int:
+        return max(0, self.daily_budget - scout_store.ingest_started_since(_start_of_day()))
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            slots = min(self.concurrency - len(self._running), self.budget_left())
+            for item in scout_store.ingest_next(max(0, slots)):
+                job = job_manager.submit("auto-process", run_process, url=item["url"])
+                self._running[item["id"]] = job
+                scout_store.ingest_update(item["id"], "running", job_id=job.id)
+                print(f"[Auto-Ingest] Processing {item['url']} (job {job.id})")
+                started.append((item["id"], job))
+        # Registered outside the lock: the callback runs at once if the job already finished
+        for space_id, job in started:
+            job.future.add_done_callback(lambda _, space_id=space_id, job=job: self._finished(space_id, job))
+
+    def _finished(self, space_id: str, job: Job):
+        status = job.status if job.status in ("completed", "failed") else "cancelled"
+        scout_store.ingest_update(space_id, status, error=job.error, result=job.result)
+        print(f"[Auto-Ingest] {space_id}: {status}")
+        with self._lock:
+            self._running.pop(space_id, None)
+        self._dispatch()
+
+    def stats(self) -> dict:
+        with self._lock:
+            running = [{"id": space_id, "job_id": job.id, "phase": job.phase} for space_id, job in self._running.items()]
+        return {
+            "enabled": self._thread is not None,
+            "interval": self.interval,
+            "daily_budget": self.daily_budget,
+            "budget_left": self.budget_left(),
+            "concurrency": self.concurrency,
+            "accounts": self.accounts or scout_store.get_watchlist(),
+            "running": running,
+            "last_scan": self.last_scan,
+        }
+
+
+auto_ingest = AutoIngest(AUTO_INGEST_INTERVAL, AUTO_INGEST_DAILY_BUDGET, AUTO_INGEST_CONCURRENCY, AUTO_INGEST_ACCOUNTS)
@@ -1,12 +1,16 @@
 import os
 import subprocess
 import json
+import time
 import uuid
 import shutil
+import threading
 import base64
 import requests
 import concurrent.futures
+import mimetypes
 from pathlib import Path
+from typing import Callable, Optional
 
 # Project root (parent of backend)
 PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
@@ -14,7 +18,6 @@ REMOTION_DIR = PROJECT_ROOT / "remotion"
 REMOTION_PUBLIC = REMOTION_DIR / "public"
 CLIPS_DIR = PROJECT_ROOT / "downloads" / "clips"
 LOGOS_DIR = PROJECT_ROOT / "downloads" / "logos"
-FFMPEG_DIR = PROJECT_ROOT / "ffmpeg" / "ffmpeg-8.0.1-essentials_build" / "bin"
 
 REMOTION_PUBLIC.mkdir(parents=True, exist_ok=True)
 CLIPS_DIR.mkdir(parents=True, exist_ok=True)
@@ -24,6 +27,29 @@ OPENROUTER_URL = "https://openrouter.ai/api/v1/chat/completions"
 
 
 from ..utils import get_env_var
+from ..metrics import (
+    DEEPGRAM_LATENCY, DEEPGRAM_UPLOAD_BYTES, FFMPEG_LATENCY,
+    RENDER_LATENCY, RENDERED_VIDEO_SECONDS,
+)
+from .media import (
+    extract_window, get_ffmpeg_bin, get_speech_proxy_or_source, loudness_filter, probe_duration,
+)
+from .transcript_store import transcript_store
+from .word_index import WordIndex
+from . import render_server
+from .waveform import waveform_props
+
+
+# Deepgram timeouts: connect, then a read budget that grows with the audio
+# (a whole Space is uploaded and transcribed in one request)
+DEEPGRAM_CONNECT_TIMEOUT = 30
+DEEPGRAM_READ_TIMEOUT = 120
+DEEPGRAM_READ_SECONDS_PER_MINUTE = 6
+
+
+def _deepgram_timeout(duration_seconds: float) -> tuple:
+    minutes = max(0.0, duration_seconds or 0.0) / 60
+    return DEEPGRAM_CONNECT_TIMEOUT, DEEPGRAM_READ_TIMEOUT + minutes * DEEPGRAM_READ_SECONDS_PER_MINUTE
 
 
 def get_word_timestamps(audio_path: str, duration_seconds: float) -> list:
@@ -44,9 +70,14 @@ def get_word_timestamps(audio_path: str, duration_seconds: float) -> list:
         "Authorization": f"Token {api_key}",
     }
     
+    content_type = mimetypes.guess_type(audio_path)[0]
+    if content_type:
+        headers["Content-Type"] = content_type
+
     try:
-        with open(audio_path, "rb") as f:
-            resp = requests.post(url, headers=headers, data=f)
+        DEEPGRAM_UPLOAD_BYTES.inc(os.path.getsize(audio_path))
+        with DEEPGRAM_LATENCY.time(), open(audio_path, "rb") as f:
+            resp = requests.post(url, headers=headers, data=f, timeout=_deepgram_timeout(duration_seconds))
             
         if resp.status_code != 200:
             print(f"Deepgram API error ({resp.status_code}): {resp.text}")
@@ -73,88 +104,258 @@ def get_word_timestamps(audio_path: str, duration_seconds: float) -> list:
 def slice_audio(input_path: str, start_time: float, end_time: float) -> str:
     """
     Slices audio into remotion/public/ for static file serving.
+    Seeks on the input side, so only the clip itself is decoded wherever it
+    sits in the Space, and normalizes with the source's cached loudness.
     Returns filename (not full path).
     """
     filename = f"slice_{uuid.uuid4().hex[:8]}.mp3"
     output_path = str(REMOTION_PUBLIC / filename)
 
-    ffmpeg_bin = str(FFMPEG_DIR / "ffmpeg.exe")
     duration = end_time - start_time
 
     cmd = [
-        ffmpeg_bin, "-y",
+        get_ffmpeg_bin(), "-y",
+        "-ss", f"{start_time:.3f}",
+        "-t", f"{duration:.3f}",
         "-i", input_path,
-        "-ss", str(start_time),
-        "-t", str(duration),
-        "-af", "loudnorm=I=-16:TP=-1.5:LRA=11",  # normalize to -16 LUFS
+        "-af", loudness_filter(input_path),  # normalize to -16 LUFS
         "-acodec", "libmp3lame",
         "-q:a", "2",
         output_path,
     ]
 
     print(f"Slicing audio: {start_time}s - {end_time}s ({duration:.0f}s)")
-    result = subprocess.run(cmd, capture_output=True, text=True)
+    with FFMPEG_LATENCY.time(operation="slice"):
+        result = subprocess.run(cmd, capture_output=True, text=True)
     if result.returncode != 0:
         raise Exception(f"FFmpeg slice failed: {result.stderr}")
 
     return filename
 
 
-def render_clip(
-    audio_path: str,
-    start_time: float,
-    end_time: float,
+def _render_with_cli(composition_id: str, output_path: str, input_props: dict):
+    """Renders through `npx remotion render` (bundles and launches a browser every call)."""
+    props_file = str(CLIPS_DIR / f"props_{uuid.uuid4().hex[:8]}.json")
+    with open(props_file, "w") as f:
+        json.dump(input_props, f)
+
+    command = [
+        "npx", "remotion", "render",
+        "src/index.ts", composition_id, output_path,
+        "--props", props_file,
+    ]
+
+    try:
+        with RENDER_LATENCY.time(composition=composition_id, renderer="cli"):
+            result = subprocess.run(
+                command,
+                cwd=str(REMOTION_DIR),
+                capture_output=True,
+                text=True,
+                shell=True,
+            )
+    finally:
+        try: os.remove(props_file)
+        except: pass
+
+    if result.returncode != 0:
+        print(f"Remotion stderr:\n{result.stderr[-1000:]}")
+        raise Exception(f"Remotion render failed: {result.stderr[-500:]}")
+
+
+DEFAULT_COLORS = {
+    "background": "#0a0a0a",
+    "waveform": "#a855f7",
+    "text": "#ffffff",
+    "accent": "#3b82f6",
+}
+
+LAYOUT_MAP = {
+    "centered_waveform": "CenteredWaveform",
+    "split_screen": "SplitScreen",
+    "podcast_card": "PodcastCard",
+}
+
+# barCount each composition passes to <Waveform>
+WAVEFORM_BARS = {
+    "CenteredWaveform": 40,
+    "SplitScreen": 24,
+    "PodcastCard": 28,
+}
+
+
+# Ranges closer than this share one decode in a batch slice; farther apart
+# they get their own input-side seek instead of decoding the gap
+SLICE_GROUP_GAP_SECONDS = 60
+
+
+def _group_ranges(ranges: list) -> list:
+    """Groups range indexes whose ranges overlap or lie within SLICE_GROUP_GAP_SECONDS; returns (start, end, indexes)."""
+    groups = []
+    for i in sorted(range(len(ranges)), key=lambda i: ranges[i][0]):
+        start, end = ranges[i]
+        if groups and start - groups[-1][1] <= SLICE_GROUP_GAP_SECONDS:
+            groups[-1][1] = max(groups[-1][1], end)
+            groups[-1][2].append(i)
+        else:
+            groups.append([start, end, [i]])
+    return [tuple(group) for group in groups]
+
+
+def slice_audio_batch(input_path: str, ranges: list) -> list:
+    """
+    Cuts several (start, end) ranges out of one source in a single ffmpeg
+    run into normalized slices in remotion/public/. Nearby ranges share one
+    decode; each group is its own input seeked on the input side, so the
+    audio between distant clips is never decoded.
+    Returns filenames in the same order as ranges.
+    """
+    filenames = [f"slice_{uuid.uuid4().hex[:8]}.mp3" for _ in ranges]
+    groups = _group_ranges(ranges)
+
+    normalize = loudness_filter(input_path)
+    cmd = [get_ffmpeg_bin(), "-y"]
+    filters = []
+    for g, (first, last, members) in enumerate(groups):
+        cmd += ["-ss", f"{first:.3f}", "-t", f"{last - first:.3f}", "-i", input_path]
+        branches = "".join(f"[s{i}]" for i in members)
+        filters.append(f"[{g}:a]asplit={len(members)}{branches}")
+        for i in members:
+            start, end = ranges[i]
+            filters.append(
+                f"[s{i}]atrim=start={start - first:.3f}:end={end - first:.3f},asetpts=PTS-STARTPTS,"
+                f"{normalize}[o{i}]"
+            )
+
+    cmd += ["-filter_complex", ";".join(filters)]
+    for i, filename in enumerate(filenames):
+        cmd += ["-map", f"[o{i}]", "-acodec", "libmp3lame", "-q:a", "2", str(REMOTION_PUBLIC / filename)]
+
+    print(f"Slicing {len(ranges)} clips in one pass ({len(groups)} seeks)")
+    with FFMPEG_LATENCY.time(operation="slice_batch"):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        for filename in filenames:
+            remove_public_file(filename)
+        raise Exception(f"FFmpeg batch slice failed: {result.stderr[-500:]}")
+
+    return filenames
+
+
+_index_locks = {}
+_index_locks_guard = threading.Lock()
+# audio sha → time of the last failed whole-Space attempt; clips fall back to
+# per-clip timings until WORD_INDEX_RETRY_SECONDS have passed
+_index_failures = {}
+WORD_INDEX_RETRY_SECONDS = 10 * 60
+
+
+def _index_failed_recently(audio_sha: str) -> bool:
+    failed = _index_failures.get(audio_sha)
+    return failed is not None and time.time() - failed < WORD_INDEX_RETRY_SECONDS
+
+
+def get_space_word_index(audio_path: str) -> Optional[WordIndex]:
+    """
+    Word timings for the whole Space, transcribed by Deepgram once (from the
+    speech proxy) and stored in the transcript store. Returns None if they
+    cannot be produced; a failure is remembered for WORD_INDEX_RETRY_SECONDS
+    so the clips of a batch don't each retry the whole upload.
+    """
+    audio_sha = transcript_store.audio_hash(audio_path)
+    index = transcript_store.get_word_index(audio_sha)
+    if index is not None or _index_failed_recently(audio_sha):
+        return index
+
+    with _index_locks_guard:
+        lock = _index_locks.setdefault(audio_sha, threading.Lock())
+    with lock:
+        # Another clip of the same Space may have built it while we waited
+        index = transcript_store.get_word_index(audio_sha)
+        if index is not None or _index_failed_recently(audio_sha):
+            return index
+
+        speech_source = get_speech_proxy_or_source(audio_path)
+        print(f"Building word index for {os.path.basename(audio_path)}")
+        try:
+            words = get_word_timestamps(speech_source, probe_duration(speech_source))
+        except Exception:
+            _index_failures[audio_sha] = time.time()
+            raise
+        if not words:
+            _index_failures[audio_sha] = time.time()
+            return None
+        _index_failures.pop(audio_sha, None)
+        return transcript_store.save_word_timings(audio_path, words)
+
+
+def get_clip_words(audio_path: str, start_time: float, end_time: float, sliced_audio_path: str) -> list:
+    """
+    Word-level timestamps for karaoke captions, rebased to the clip start.
+    Served from the whole-Space word index; if that is unavailable, sends
+    Deepgram a window of the small speech proxy for just this clip.
+    """
+    try:
+        index = get_space_word_index(audio_path)
+    except Exception as e:
+        print(f"Word index unavailable: {e}")
+        index = None
+    if index is not None:
+        return index.range(start_time, end_time)
+
+    duration_seconds = end_time - start_time
+    speech_source = get_speech_proxy_or_source(audio_path)
+    speech_slice_path = str(CLIPS_DIR / f"speech_{uuid.uuid4().hex[:8]}{Path(speech_source).suffix}")
+    try:
+        extract_window(speech_source, start_time, duration_seconds, speech_slice_path)
+        return get_word_timestamps(speech_slice_path, duration_seconds)
+    except Exception as e:
+        print(f"Speech window failed, aligning the clip slice instead: {e}")
+        return get_word_timestamps(sliced_audio_path, duration_seconds)
+    finally:
+        try: os.remove(speech_slice_path)
+        except: pass
+
+
+def stage_logo(logo_path: Optional[str]) -> Optional[str]:
+    """Copies a logo into remotion/public/ and returns its filename."""
+    if not logo_path or not os.path.exists(logo_path):
+        return None
+    logo_filename = f"logo_{uuid.uuid4().hex[:8]}{Path(logo_path).suffix}"
+    shutil.copy2(logo_path, str(REMOTION_PUBLIC / logo_filename))
+    return logo_filename
+
+
+def remove_public_file(filename: Optional[str]):
+    if filename:
+        try: os.remove(str(REMOTION_PUBLIC / filename))
+        except: pass
+
+
+def render_composition(
     layout: str,
+    audio_filename: str,
+    duration_seconds: float,
     title: str,
+    words: list,
     caption_text: str = "",
-    logo_path: str = None,
+    logo_filename: Optional[str] = None,
     logo_position: str = "top-right",
     colors: dict = None,
+    on_progress: Optional[Callable] = None,
 ) -> str:
     """
-    Renders a video clip using Remotion.
-
-    Steps:
-    1. Slice audio into remotion/public/
-    2. Transcribe the slice (if caption_text not provided)
-    3. Copy logo to remotion/public/ if provided
-    4. Render with Remotion CLI
-    5. Return path to output MP4
+    Renders an already sliced clip on the persistent render server (Remotion
+    CLI as fallback). Returns path to the output MP4.
     """
-    if colors is None:
-        colors = {
-            "background": "#0a0a0a",
-            "waveform": "#a855f7",
-            "text": "#ffffff",
-            "accent": "#3b82f6",
-        }
-
-    layout_map = {
-        "centered_waveform": "CenteredWaveform",
-        "split_screen": "SplitScreen",
-        "podcast_card": "PodcastCard",
-    }
-    composition_id = layout_map.get(layout, "CenteredWaveform")
-
-    # 1. Slice audio
-    audio_filename = slice_audio(audio_path, start_time, end_time)
-    duration_seconds = end_time - start_time
-    sliced_audio_path = str(REMOTION_PUBLIC / audio_filename)
-
-    # 2. Get word-level timestamps for karaoke captions
-    words = get_word_timestamps(sliced_audio_path, duration_seconds)
+    composition_id = LAYOUT_MAP.get(layout, "CenteredWaveform")
 
     # Build plain text fallback from words
     plain_text = " ".join(w.get("text", "") for w in words) if words else (caption_text or "")
 
-    # 3. Copy logo
-    logo_filename = None
-    if logo_path and os.path.exists(logo_path):
-        ext = Path(logo_path).suffix
-        logo_filename = f"logo_{uuid.uuid4().hex[:8]}{ext}"
-        shutil.copy2(logo_path, str(REMOTION_PUBLIC / logo_filename))
+    # Bar levels for every frame, so the composition skips decoding + FFT
+    waveform = waveform_props(str(REMOTION_PUBLIC / audio_filename), duration_seconds, WAVEFORM_BARS[composition_id])
 
-    # 4. Build props
     input_props = {
         "audioFile": audio_filename,
         "title": title,
@@ -163,44 +364,80 @@ def render_clip(
         "captions": None,
         "logoFile": logo_filename,
         "logoPosition": logo_position,
-        "colors": colors,
+        "colors": colors or DEFAULT_COLORS,
         "durationInSeconds": duration_seconds,
+        "waveform": waveform,
     }
 
     output_filename = f"clip_{uuid.uuid4().hex[:8]}.mp4"
     output_path = str(CLIPS_DIR / output_filename)
 
-    props_file = str(CLIPS_DIR / f"props_{uuid.uuid4().hex[:8]}.json")
-    with open(props_file, "w") as f:
-        json.dump(input_props, f)
-
-    # 5. Render
-    command = [
-        "npx", "remotion", "render",
-        "src/index.ts", composition_id, output_path,
-        "--props", props_file,
-    ]
-
     print(f"Rendering: {composition_id} ({duration_seconds:.0f}s)")
-    result = subprocess.run(
-        command,
-        cwd=str(REMOTION_DIR),
-        capture_output=True,
-        text=True,
-        shell=True,
-    )
-
-    # Cleanup temps
-    for f in [props_file, sliced_audio_path]:
-        try: os.remove(f)
-        except: pass
-    if logo_filename:
-        try: os.remove(str(REMOTION_PUBLIC / logo_filename))
-        except: pass
-
-    if result.returncode != 0:
-        print(f"Remotion stderr:\n{result.stderr[-1000:]}")
-        raise Exception(f"Remotion render failed: {result.stderr[-500:]}")
+    try:
+        if render_server.RENDER_SERVER_ENABLED:
+            try:
+                with RENDER_LATENCY.time(composition=composition_id, renderer="server"):
+                    render_server.render(composition_id, output_path, input_props, on_progress=on_progress)
+            except render_server.RenderServerUnavailable as e:
+                print(f"Render server unavailable, falling back to CLI: {e}")
+                _render_with_cli(composition_id, output_path, input_props)
+        else:
+            _render_with_cli(composition_id, output_path, input_props)
+    except BaseException:
+        # Don't leave a partial clip behind
+        try: os.remove(output_path)
+        except OSError: pass
+        raise
 
+    RENDERED_VIDEO_SECONDS.inc(duration_seconds, composition=composition_id)
     print(f"Clip ready: {output_path}")
     return output_path
+
+
+def render_clip(
+    audio_path: str,
+    start_time: float,
+    end_time: float,
+    layout: str,
+    title: str,
+    caption_text: str = "",
+    logo_path: str = None,
+    logo_position: str = "top-right",
+    colors: dict = None,
+    on_progress: Optional[Callable] = None,
+) -> str:
+    """
+    Renders a video clip using Remotion.
+
+    Steps:
+    1. Slice audio into remotion/public/
+    2. Transcribe the slice (if caption_text not provided)
+    3. Copy logo to remotion/public/ if provided
+    4. Render on the persistent render server (Remotion CLI as fallback)
+    5. Return path to output MP4
+
+    on_progress receives render progress events when the render server is used.
+    """
+    # 1. Slice audio
+    audio_filename = slice_audio(audio_path, start_time, end_time)
+    logo_filename = None
+    try:
+        # 2. Word timings
+        words = get_clip_words(audio_path, start_time, end_time, str(REMOTION_PUBLIC / audio_filename))
+
+        # 3. Copy logo
+        logo_filename = stage_logo(logo_path)
+
+        # 4. Render
+        return render_composition(
+            layout, audio_filename, end_time - start_time, title, words,
+            caption_text=caption_text,
+            logo_filename=logo_filename,
+            logo_position=logo_position,
+            colors=colors,
+            on_progress=on_progress,
+        )
+    finally:
+        # Cleanup temps
+        remove_public_file(audio_filename)
+        remove_public_file(logo_filename)
@@ -0,0 +1,239 @@
+"""
+Download Index
+Persistent record of every downloaded Space/video keyed by its canonical
+ID (extractor + media ID, plus a variant such as video quality), with
+metadata, file path, size and checksum. URLs are mapped to keys, and
+well-known URL shapes are parsed offline, so a cache hit needs no network.
+"""
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+from ..utils import file_sha256
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+DATA_DIR = PROJECT_ROOT / "data"
+DOWNLOADS_DB = DATA_DIR / "downloads.sqlite3"
+
+# URL patterns we can resolve to an ID without asking yt-dlp. The names
+# match yt-dlp's extractor_key so offline and extracted keys agree.
+_URL_PATTERNS = [
+    ("TwitterSpaces", re.compile(r"^https?://(?:www\.|mobile\.)?(?:twitter|x)\.com/i/spaces/([0-9a-zA-Z]+)")),
+    ("Youtube", re.compile(r"^https?://(?:www\.|m\.|music\.)?youtube\.com/(?:watch\?(?:.*&)?v=|shorts/|live/|embed/)([0-9A-Za-z_-]{11})")),
+    ("Youtube", re.compile(r"^https?://youtu\.be/([0-9A-Za-z_-]{11})")),
+]
+
+# Metadata fields kept from the yt-dlp info dict
+METADATA_FIELDS = ("id", "title", "uploader", "uploader_id", "duration", "upload_date", "webpage_url", "extractor_key")
+
+
+def canonical_id(url: str) -> Optional[tuple]:
+    """(extractor_key, media_id) parsed from the URL alone, or None."""
+    for extractor, pattern in _URL_PATTERNS:
+        match = pattern.match((url or "").strip())
+        if match:
+            return extractor, match.group(1)
+    return None
+
+
+def make_key(kind: str, extractor: str, media_id: str, variant: str = "") -> str:
+    key = f"{kind}:{extractor}:{media_id}"
+    return f"{key}:{variant}" if variant else key
+
+
+class DownloadIndex:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS downloads (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    extractor TEXT NOT NULL,
+                    media_id TEXT NOT NULL,
+                    title TEXT,
+                    filepath TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    metadata BLOB
+                );
+                CREATE TABLE IF NOT EXISTS url_aliases (
+                    url TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (url, kind, variant)
+                );
+                CREATE TABLE IF NOT EXISTS download_queue (
+                    key TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    created REAL NOT NULL
+                );
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def key_for_url(self, url: str, kind: str, variant: str = "") -> Optional[str]:
+        """Resolves a URL to an index key without network, if possible."""
+        parsed = canonical_id(url)
+        if parsed:
+            return make_key(kind, parsed[0], parsed[1], variant)
+        with self._lock:
+            row = self._db().execute(
+                "SELECT key FROM url_aliases WHERE url = ? AND kind = ? AND variant = ?",
+                (url.strip(), kind, variant),
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, key: str) -> Optional[dict]:
+        """
+        Returns the entry for key if its file is still on disk with the
+        recorded size; stale entries are dropped.
+        """
+        with self._lock:
+            row = self._db().execute(
+                "SELECT key, kind, title, filepath, size, sha256, created, metadata FROM downloads WHERE key = ?",
+                (key,),
+            ).fetchone()
+        if not row:
+            return None
+        filepath = row[3]
+        try:
+            valid = os.path.getsize(filepath) == row[4]
+        except OSError:
+            valid = False
+        if not valid:
+            self.remove(key)
+            return None
+        with self._lock:
+            db = self._db()
+            db.execute("UPDATE downloads SET last_used = ? WHERE key = ?", (time.time(), key))
+            db.commit()
+        return {
+            "key": row[0],
+            "kind": row[1],
+            "title": row[2],
+            "filepath": filepath,
+            "filename": os.path.basename(filepath),
+            "size": row[4],
+            "sha256": row[5],
+            "created": row[6],
+            "metadata": json.loads(zlib.decompress(row[7]).decode("utf-8")) if row[7] else {},
+        }
+
+    def put(self, key: str, kind: str, url: str, info: dict, filepath: str, variant: str = "") -> dict:
+        """Records a finished download and maps url to it."""
+        filepath = os.path.abspath(filepath)
+        metadata = {field: info.get(field) for field in METADATA_FIELDS if info.get(field) is not None}
+        size = os.path.getsize(filepath)
+        digest = file_sha256(filepath)
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            db.execute(
+                """INSERT OR REPLACE INTO downloads
+                       (key, kind, extractor, media_id, title, filepath, size, sha256, created, last_used, metadata)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                (key, kind, info.get("extractor_key", ""), str(info.get("id", "")), info.get("title"),
+                 filepath, size, digest, now, now,
+                 zlib.compress(json.dumps(metadata).encode("utf-8"))),
+            )
+            db.commit()
+        self.add_alias(url, kind, key, variant)
+        return self.get(key)
+
+    def add_alias(self, url: str, kind: str, key: str, variant: str = ""):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO url_aliases (url, kind, variant, key) VALUES (?, ?, ?, ?)",
+                (url.strip(), kind, variant, key),
+            )
+            db.commit()
+
+    def remove(self, key: str):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM downloads WHERE key = ?", (key,))
+            db.execute("DELETE FROM url_aliases WHERE key = ?", (key,))
+            db.commit()
+
+    def remove_files(self, filepaths: list):
+        """Drops the entries (and URL aliases) of files that were deleted."""
+        filepaths = [os.path.abspath(p) for p in filepaths]
+        if not filepaths:
+            return
+        placeholders = ",".join("?" * len(filepaths))
+        with self._lock:
+            db = self._db()
+            db.execute(
+                f"DELETE FROM url_aliases WHERE key IN (SELECT key FROM downloads WHERE filepath IN ({placeholders}))",
+                filepaths,
+            )
+            db.execute(f"DELETE FROM downloads WHERE filepath IN ({placeholders})", filepaths)
+            db.commit()
+
+    def queue_add(self, key: str, kind: str, url: str, variant: str = ""):
+        """Persists a queued/running download so it survives a restart."""
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR IGNORE INTO download_queue (key, kind, url, variant, created) VALUES (?, ?, ?, ?, ?)",
+                (key, kind, url.strip(), variant, time.time()),
+            )
+            db.commit()
+
+    def queue_remove(self, key: str):
+        with self._lock:
+            db = self._db()
+            db.execute("DELETE FROM download_queue WHERE key = ?", (key,))
+            db.commit()
+
+    def queue_list(self) -> list:
+        """Persisted downloads in the order they were queued."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT key, kind, url, variant FROM download_queue ORDER BY created"
+            ).fetchall()
+        return [{"key": r[0], "kind": r[1], "url": r[2], "variant": r[3]} for r in rows]
+
+    def list(self, kind: Optional[str] = None) -> list:
+        """Index entries (no metadata), most recently used first."""
+        query = "SELECT key, kind, title, filepath, size, created, last_used FROM downloads"
+        params = ()
+        if kind:
+            query += " WHERE kind = ?"
+            params = (kind,)
+        with self._lock:
+            rows = self._db().execute(query + " ORDER BY last_used DESC", params).fetchall()
+        return [
+            {
+                "key": r[0],
+                "kind": r[1],
+                "title": r[2],
+                "filename": os.path.basename(r[3]),
+                "size": r[4],
+                "created": r[5],
+                "last_used": r[6],
+            }
+            for r in rows
+        ]
+
+
+download_index = DownloadIndex(DOWNLOADS_DB)
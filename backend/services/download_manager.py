@@ -0,0 +1,134 @@
+"""
+Download Manager
+Runs downloads with a global concurrency limit and a per-host limit,
+instead of one unbounded thread per request. Waiting downloads are told
+their queue position. The queue is persisted in the download index, so
+downloads that were queued or running when the server stopped are
+restarted on the next start, resuming from their partial fragments.
+"""
+import threading
+from collections import Counter
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from ..utils import get_env_var
+from .download_index import download_index
+
+# Downloads running at once
+DOWNLOAD_CONCURRENCY = int(get_env_var("DOWNLOAD_CONCURRENCY") or 3)
+# Downloads running at once against one host
+DOWNLOAD_PER_HOST = int(get_env_var("DOWNLOAD_PER_HOST") or 2)
+
+_HOST_ALIASES = {
+    "twitter.com": "x.com",
+    "mobile.twitter.com": "x.com",
+    "youtu.be": "youtube.com",
+    "m.youtube.com": "youtube.com",
+    "music.youtube.com": "youtube.com",
+}
+
+
+def host_of(url: str) -> str:
+    host = (urlparse((url or "").strip()).hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    return _HOST_ALIASES.get(host, host)
+
+
+class _Task:
+    def __init__(self, key: str, kind: str, url: str, variant: str,
+                 run: Callable, on_position: Optional[Callable]):
+        self.key = key
+        self.kind = kind
+        self.url = url
+        self.variant = variant
+        self.host = host_of(url)
+        self.run = run
+        self.on_position = on_position
+        self.position = None
+
+
+class DownloadManager:
+    def __init__(self, limit: int, per_host: int):
+        self.limit = limit
+        self.per_host = per_host
+        self._pending = []
+        self._running = {}
+        self._hosts = Counter()
+        self._lock = threading.Lock()
+
+    def submit(self, key: str, kind: str, url: str, variant: str, run: Callable,
+               on_position: Optional[Callable] = None, persist: bool = True):
+        """
+        Queues run() for the download identified by key. on_position(n) is
+        called whenever the task's place in the queue changes (0 = starting).
+        """
+        if persist:
+            download_index.queue_add(key, kind, url, variant)
+        task = _Task(key, kind, url, variant, run, on_position)
+        with self._lock:
+            self._pending.append(task)
+            started, waiting = self._dispatch()
+        self._notify(started, waiting)
+
+    def _dispatch(self):
+        """Starts pending tasks that fit the limits. Caller holds the lock."""
+        started = []
+        index = 0
+        while len(self._running) < self.limit and index < len(self._pending):
+            task = self._pending[index]
+            if self._hosts[task.host] >= self.per_host:
+                index += 1
+                continue
+            self._pending.pop(index)
+            self._running[task.key] = task
+            self._hosts[task.host] += 1
+            started.append(task)
+            threading.Thread(target=self._run, args=(task,), daemon=True, name=f"download-{task.host}").start()
+
+        waiting = []
+        for position, task in enumerate(self._pending, start=1):
+            if task.position != position:
+                task.position = position
+                waiting.append((task, position))
+        return started, waiting
+
+    def _notify(self, started: list, waiting: list):
+        for task in started:
+            if task.position is not None and task.on_position:
+                task.on_position(0)
+        for task, position in waiting:
+            if task.on_position:
+                task.on_position(position)
+
+    def _run(self, task: _Task):
+        try:
+            task.run()
+        finally:
+            download_index.queue_remove(task.key)
+            with self._lock:
+                self._running.pop(task.key, None)
+                self._hosts[task.host] -= 1
+                started, waiting = self._dispatch()
+            self._notify(started, waiting)
+
+    def restore(self, start: Callable):
+        """Restarts downloads left in the persisted queue: start(kind, url, variant)."""
+        for item in download_index.queue_list():
+            print(f"[Download] Resuming queued download: {item['url']}")
+            try:
+                start(item["kind"], item["url"], item["variant"])
+            except Exception as e:
+                print(f"[Download] Could not resume {item['url']}: {e}")
+                download_index.queue_remove(item["key"])
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "per_host": self.per_host,
+                "running": [{"key": t.key, "host": t.host} for t in self._running.values()],
+                "queued": [{"key": t.key, "host": t.host, "position": i} for i, t in enumerate(self._pending, start=1)],
+            }
+
+
+download_manager = DownloadManager(DOWNLOAD_CONCURRENCY, DOWNLOAD_PER_HOST)
@@ -3,9 +3,12 @@ import glob
 from pathlib import Path
 import yt_dlp
 import json
-import queue
 import threading
+import time
 import re
+from ..metrics import DOWNLOAD_LATENCY, DOWNLOAD_BYTES
+from .download_index import download_index, make_key
+from .download_manager import download_manager
 
 DOWNLOAD_DIR = "downloads"
 
@@ -28,16 +31,188 @@ def _get_cookie_opts() -> dict:
         return {'cookiefile': str(COOKIES_FILE)}
     return {}
 
-def download_space_generator(url: str):
+
+# Files are named after the title plus the media ID, so identically titled
+# Spaces no longer overwrite each other
+SPACE_TEMPLATE = "%(title)s [%(id)s].%(ext)s"
+# Files downloaded before the ID was part of the name. Only Spaces are adopted:
+# legacy videos carry no quality in their name, so they can't be matched to a variant
+LEGACY_TEMPLATE = "%(title)s.%(ext)s"
+
+# Keep .part/.ytdl files and pick up from the last finished fragment, so a
+# download interrupted by a crash or restart resumes instead of starting over
+# (file names are stable because they include the media ID)
+RESUME_OPTS = {
+    'continuedl': True,
+    'nopart': False,
+    'retries': 10,
+    'fragment_retries': 10,
+}
+
+
+def _fetch(kind: str, url: str, ydl_opts: dict, ext: str, variant: str = "") -> dict:
     """
-    Downloads a Twitter Space as MP3 using yt-dlp API.
-    Yields progress information as JSON strings ending with newline.
+    Resolves url through the download index, downloading on a miss.
+    A hit costs no network. A miss extracts metadata once and downloads
+    from that same info dict. Returns {filepath, filename, cached}.
     """
-    output_template = os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s")
-    q = queue.Queue()
-    
+    started = time.perf_counter()
+
+    key = download_index.key_for_url(url, kind, variant)
+    entry = download_index.get(key) if key else None
+    if entry:
+        print(f"[Cache Hit] Re-using existing download: {entry['filepath']}")
+        DOWNLOAD_LATENCY.observe(time.perf_counter() - started, kind=kind, cached="true")
+        return {"filepath": entry["filepath"], "filename": entry["filename"], "cached": True}
+
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+        key = make_key(kind, info.get("extractor_key", ""), str(info.get("id", "")), variant)
+
+        # Known under another URL
+        entry = download_index.get(key)
+        if entry:
+            download_index.add_alias(url, kind, key, variant)
+            DOWNLOAD_LATENCY.observe(time.perf_counter() - started, kind=kind, cached="true")
+            return {"filepath": entry["filepath"], "filename": entry["filename"], "cached": True}
+
+        # Downloaded before the index existed
+        legacy_dir = os.path.dirname(ydl_opts['outtmpl'])
+        legacy_path = os.path.splitext(ydl.prepare_filename(info, outtmpl=os.path.join(legacy_dir, LEGACY_TEMPLATE)))[0] + ext
+        if kind == "space" and os.path.exists(legacy_path):
+            entry = download_index.put(key, kind, url, info, legacy_path, variant)
+            DOWNLOAD_LATENCY.observe(time.perf_counter() - started, kind=kind, cached="true")
+            return {"filepath": entry["filepath"], "filename": entry["filename"], "cached": True}
+
+        info = ydl.process_ie_result(info, download=True)
+        if info.get('requested_downloads'):
+            final_path = info['requested_downloads'][0]['filepath']
+        else:
+            base, _ = os.path.splitext(ydl.prepare_filename(info))
+            final_path = base + ext
+
+    entry = download_index.put(key, kind, url, info, final_path, variant)
+    DOWNLOAD_LATENCY.observe(time.perf_counter() - started, kind=kind, cached="false")
+    DOWNLOAD_BYTES.inc(entry["size"], kind=kind)
+    return {"filepath": entry["filepath"], "filename": entry["filename"], "cached": False}
+
+
+# ─────────────────────────────────────────────
+# Single-flight downloads
+# ─────────────────────────────────────────────
+
+class _Flight:
+    """
+    One underlying download shared by every caller asking for the same
+    media at the same time. Events are kept so late joiners replay the
+    stream from the start; the result (or error) goes to every waiter.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.events = []
+        self.result = None
+        self.error = None
+        self.done = False
+        self.subscribers = 0
+        self._cond = threading.Condition()
+
+    def publish(self, event: dict):
+        with self._cond:
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, result: dict = None, error: str = None):
+        with self._cond:
+            self.result = result
+            self.error = error
+            if error is None:
+                self.events.append({"status": "completed", **result})
+            else:
+                self.events.append({"status": "error", "message": error})
+            self.done = True
+            self._cond.notify_all()
+
+    def follow(self):
+        """Yields every event from the start, then live ones until finished."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.events) and not self.done:
+                    self._cond.wait(timeout=1.0)
+                batch = self.events[index:]
+                index += len(batch)
+                finished = self.done and index >= len(self.events)
+            for event in batch:
+                yield event
+            if finished:
+                return
+
+    def wait(self) -> dict:
+        with self._cond:
+            while not self.done:
+                self._cond.wait(timeout=1.0)
+        if self.error is not None:
+            raise Exception(self.error)
+        return self.result
+
+
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def _flight_key(kind: str, url: str, variant: str = "") -> str:
+    """Canonical key when the URL can be resolved offline, else the URL itself."""
+    return download_index.key_for_url(url, kind, variant) or f"{kind}:{url.strip()}:{variant}"
+
+
+def _join_flight(kind: str, url: str, variant: str, run) -> _Flight:
+    """
+    Returns the in-flight download for this media, queueing run(flight)
+    on the download manager if there is none.
+    """
+    key = _flight_key(kind, url, variant)
+    with _flights_lock:
+        flight = _flights.get(key)
+        if flight is not None:
+            flight.subscribers += 1
+            print(f"[Download] Joining in-flight download {key} ({flight.subscribers} waiting)")
+            return flight
+        flight = _flights[key] = _Flight(key)
+        flight.subscribers = 1
+
+    def target():
+        try:
+            run(flight)
+        except Exception as e:
+            if not flight.done:
+                flight.finish(error=str(e))
+        finally:
+            with _flights_lock:
+                _flights.pop(key, None)
+
+    def on_position(position: int):
+        if position:
+            flight.publish({"status": "queued", "phase": "queue", "position": position})
+        else:
+            flight.publish({"status": "starting", "phase": "queue", "position": 0})
+
+    download_manager.submit(key, kind, url, variant, target, on_position=on_position)
+    return flight
+
+
+def _stream(flight: _Flight):
+    for msg in flight.follow():
+        yield json.dumps(msg) + "\n"
+
+
+def _run_space_download(url: str, flight: _Flight):
+    """Downloads a Twitter Space as MP3, publishing progress to the flight."""
+    output_template = os.path.join(DOWNLOAD_DIR, SPACE_TEMPLATE)
+
     def progress_hook(d):
         if d['status'] == 'downloading':
+            info = d.get('info_dict') or {}
             percent = 0.0
             frag_index = d.get('frag_index', 0)
             total_frags = d.get('total_frags', 0)
@@ -56,131 +231,77 @@ def download_space_generator(url: str):
                     except ValueError:
                         pass
                 
-            q.put({
+            flight.publish({
                 "status": "downloading",
                 "phase": "download",
                 "progress": round(percent, 2),
                 "fragment": frag_index,
                 "total_fragments": total_frags,
                 "speed": re.sub(r'\x1b\[[0-9;]*m', '', d.get('_speed_str', 'N/A')).strip() if isinstance(d.get('_speed_str'), str) else 'N/A',
-                "eta": d.get('_eta_str', 'N/A')
+                "eta": d.get('_eta_str', 'N/A'),
+                # Lets readers follow the contiguous prefix yt-dlp has written
+                "part_path": d.get('tmpfilename'),
+                "duration": info.get('duration'),
+                "abr": info.get('abr') or info.get('tbr'),
             })
         elif d['status'] == 'finished':
-            q.put({
+            flight.publish({
                 "status": "processing",
                 "phase": "convert",
                 "progress": 100,
                 "message": "Converting audio to MP3..."
             })
 
-    def run_download():
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'outtmpl': output_template,
-            'ffmpeg_location': str(FFMPEG_DIR),
-            'concurrent_fragment_downloads': 10,
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'progress_hooks': [progress_hook],
-        }
-        
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # First check if the file already exists by predicting the filename
-                info_dict_meta = ydl.extract_info(url, download=False)
-                filename_predicted = ydl.prepare_filename(info_dict_meta)
-                base_predicted, _ = os.path.splitext(filename_predicted)
-                predicted_mp3_path = base_predicted + ".mp3"
-                
-                if os.path.exists(predicted_mp3_path):
-                    q.put({
-                        "status": "completed",
-                        "filename": os.path.basename(predicted_mp3_path),
-                        "filepath": predicted_mp3_path,
-                        "cached": True
-                    })
-                    return
-                
-                # If it doesn't exist, proceed with the actual download
-                info_dict = ydl.extract_info(url, download=True)
-                
-                final_path = ""
-                if 'requested_downloads' in info_dict:
-                    final_path = info_dict['requested_downloads'][0]['filepath']
-                else:
-                    filename = ydl.prepare_filename(info_dict)
-                    base, _ = os.path.splitext(filename)
-                    final_path = base + ".mp3"
-                    
-                q.put({
-                    "status": "completed",
-                    "filename": os.path.basename(final_path),
-                    "filepath": final_path,
-                    "cached": False
-                })
-        except Exception as e:
-            print(f"[Space Download Error] {e}")
-            q.put({
-                "status": "error",
-                "message": str(e)
-            })
-
-
-
-    thread = threading.Thread(target=run_download)
-    thread.start()
-
-    while True:
-        try:
-            msg = q.get(timeout=1.0)
-            yield json.dumps(msg) + "\n"
-            if msg["status"] in ["completed", "error"]:
-                break
-        except queue.Empty:
-            if not thread.is_alive():
-                break
-
-def download_space(url: str) -> str:
-    """
-    Synchronous download function used by other endpoints that don't need streaming.
-    Returns the absolute path to the downloaded MP3.
-    """
-    output_template = os.path.join(DOWNLOAD_DIR, "%(title)s.%(ext)s")
     ydl_opts = {
         'format': 'bestaudio/best',
         'outtmpl': output_template,
+        'quiet': True,
+        'no_warnings': True,
         'ffmpeg_location': str(FFMPEG_DIR),
         'concurrent_fragment_downloads': 10,
+        **RESUME_OPTS,
         'postprocessors': [{
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '192',
         }],
-        'quiet': True,
-        'no_warnings': True,
+        'progress_hooks': [progress_hook],
     }
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-        # Check cache first
-        info_dict_meta = ydl.extract_info(url, download=False)
-        filename_predicted = ydl.prepare_filename(info_dict_meta)
-        base_predicted, _ = os.path.splitext(filename_predicted)
-        predicted_mp3_path = os.path.abspath(base_predicted + ".mp3")
-        
-        if os.path.exists(predicted_mp3_path):
-            print(f"[Cache Hit] Re-using existing download: {predicted_mp3_path}")
-            return predicted_mp3_path
-            
-        # If not cached, download it
-        info_dict = ydl.extract_info(url, download=True)
-        if 'requested_downloads' in info_dict:
-            return os.path.abspath(info_dict['requested_downloads'][0]['filepath'])
-        else:
-            filename = ydl.prepare_filename(info_dict)
-            base, _ = os.path.splitext(filename)
-            return os.path.abspath(base + ".mp3")
+
+    try:
+        flight.finish(_fetch("space", url, ydl_opts, ".mp3"))
+    except Exception as e:
+        print(f"[Space Download Error] {e}")
+        flight.finish(error=str(e))
+
+
+def _space_flight(url: str) -> _Flight:
+    return _join_flight("space", url, "", lambda flight: _run_space_download(url, flight))
+
+
+def download_space_generator(url: str):
+    """
+    Downloads a Twitter Space as MP3 using yt-dlp API.
+    Yields progress information as JSON strings ending with newline.
+    Concurrent calls for the same Space share one download.
+    """
+    return _stream(_space_flight(url))
+
+
+def space_download_events(url: str):
+    """
+    Progress events of the (possibly shared) download of a Space as dicts,
+    ending with a completed or error event.
+    """
+    return _space_flight(url).follow()
+
+
+def download_space(url: str) -> str:
+    """
+    Synchronous download function used by other endpoints that don't need streaming.
+    Returns the absolute path to the downloaded MP3.
+    """
+    return os.path.abspath(_space_flight(url).wait()["filepath"])
 
 
 # ─────────────────────────────────────────────
@@ -237,15 +358,9 @@ def get_video_formats(url: str) -> list:
     }
 
 
-def download_video_generator(url: str, quality: str = "1080"):
-    """
-    Downloads a video as MP4 using yt-dlp API with quality selection.
-    Yields progress information as JSON strings ending with newline.
-    """
-    output_template = os.path.join(VIDEOS_DIR, "%(title)s.%(ext)s")
-    q = queue.Queue()
-
-    height = quality.replace('p', '')
+def _run_video_download(url: str, height: str, flight: _Flight):
+    """Downloads a video as MP4, publishing progress to the flight."""
+    output_template = os.path.join(VIDEOS_DIR, f"%(title)s [%(id)s] {height}p.%(ext)s")
 
     def progress_hook(d):
         if d['status'] == 'downloading':
@@ -267,82 +382,60 @@ def download_video_generator(url: str, quality: str = "1080"):
                     except ValueError:
                         pass
 
-            q.put({
+            flight.publish({
                 "status": "downloading",
                 "progress": round(percent, 2),
                 "speed": re.sub(r'\x1b\[[0-9;]*m', '', d.get('_speed_str', 'N/A')).strip() if isinstance(d.get('_speed_str'), str) else 'N/A',
-                "eta": d.get('_eta_str', 'N/A')
+                "eta": d.get('_eta_str', 'N/A'),
             })
         elif d['status'] == 'finished':
-            q.put({
+            flight.publish({
                 "status": "processing",
                 "progress": 100,
                 "message": "Merging video and audio..."
             })
 
-    def run_download():
-        format_str = f'bestvideo[height<={height}]+bestaudio/best[height<={height}]/bestvideo+bestaudio/best'
-        ydl_opts = {
-            'format': format_str,
-            'merge_output_format': 'mp4',
-            'outtmpl': output_template,
-            'ffmpeg_location': str(FFMPEG_DIR),
-            'concurrent_fragment_downloads': 10,
-            'progress_hooks': [progress_hook],
-            'quiet': True,
-            'no_warnings': True,
-            **_get_cookie_opts(),
-        }
+    format_str = f'bestvideo[height<={height}]+bestaudio/best[height<={height}]/bestvideo+bestaudio/best'
+    ydl_opts = {
+        'format': format_str,
+        'merge_output_format': 'mp4',
+        'outtmpl': output_template,
+        'ffmpeg_location': str(FFMPEG_DIR),
+        'concurrent_fragment_downloads': 10,
+        **RESUME_OPTS,
+        'progress_hooks': [progress_hook],
+        'quiet': True,
+        'no_warnings': True,
+        **_get_cookie_opts(),
+    }
 
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                # Check cache first
-                info_dict_meta = ydl.extract_info(url, download=False)
-                filename_predicted = ydl.prepare_filename(info_dict_meta)
-                base_predicted, _ = os.path.splitext(filename_predicted)
-                predicted_mp4_path = base_predicted + ".mp4"
-
-                if os.path.exists(predicted_mp4_path):
-                    q.put({
-                        "status": "completed",
-                        "filename": os.path.basename(predicted_mp4_path),
-                        "filepath": predicted_mp4_path,
-                        "cached": True
-                    })
-                    return
-
-                # Download
-                info_dict = ydl.extract_info(url, download=True)
-
-                final_path = ""
-                if 'requested_downloads' in info_dict:
-                    final_path = info_dict['requested_downloads'][0]['filepath']
-                else:
-                    filename = ydl.prepare_filename(info_dict)
-                    base, _ = os.path.splitext(filename)
-                    final_path = base + ".mp4"
-
-                q.put({
-                    "status": "completed",
-                    "filename": os.path.basename(final_path),
-                    "filepath": final_path,
-                    "cached": False
-                })
-        except Exception as e:
-            q.put({
-                "status": "error",
-                "message": str(e)
-            })
+    try:
+        flight.finish(_fetch("video", url, ydl_opts, ".mp4", variant=f"{height}p"))
+    except Exception as e:
+        flight.finish(error=str(e))
 
-    thread = threading.Thread(target=run_download)
-    thread.start()
 
-    while True:
-        try:
-            msg = q.get(timeout=1.0)
-            yield json.dumps(msg) + "\n"
-            if msg["status"] in ["completed", "error"]:
-                break
-        except queue.Empty:
-            if not thread.is_alive():
-                break
+def _video_flight(url: str, quality: str) -> _Flight:
+    height = quality.replace('p', '')
+    return _join_flight("video", url, f"{height}p", lambda flight: _run_video_download(url, height, flight))
+
+
+def download_video_generator(url: str, quality: str = "1080"):
+    """
+    Downloads a video as MP4 using yt-dlp API with quality selection.
+    Yields progress information as JSON strings ending with newline.
+    Concurrent calls for the same video and quality share one download.
+    """
+    return _stream(_video_flight(url, quality))
+
+
+def _resume_download(kind: str, url: str, variant: str):
+    if kind == "space":
+        _space_flight(url)
+    elif kind == "video":
+        _video_flight(url, variant)
+
+
+def resume_downloads():
+    """Restarts downloads that were queued or running when the server stopped."""
+    download_manager.restore(_resume_download)
@@ -0,0 +1,220 @@
+"""
+Background Jobs
+Runs long pipelines (process, transcribe, render) off the request path.
+Submitting returns a job id immediately; the work runs on a bounded worker
+pool and each stage additionally takes a slot from a CPU pool (ffmpeg /
+Remotion) or an I/O pool (LLM / HTTP) so heavy renders cannot starve
+network-bound work and vice versa.
+"""
+import os
+import time
+import uuid
+import threading
+import traceback
+import concurrent.futures
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+from ..utils import get_env_var, UsageTracker, track_usage
+
+# Jobs running at once
+JOB_WORKERS = int(get_env_var("JOB_WORKERS") or 4)
+# Concurrent CPU-heavy stages (ffmpeg, Remotion)
+CPU_STAGE_LIMIT = int(get_env_var("JOB_CPU_LIMIT") or max(1, (os.cpu_count() or 2) // 2))
+# Concurrent network-bound stages (downloads, LLM calls)
+IO_STAGE_LIMIT = int(get_env_var("JOB_IO_LIMIT") or 8)
+# Finished jobs kept in memory for status/result lookups
+JOB_HISTORY_LIMIT = 200
+
+FINISHED_STATES = ("completed", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    pass
+
+
+class Job:
+    def __init__(self, kind: str, params: dict):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.phase = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.usage = UsageTracker()
+        self.events = []
+        self._cond = threading.Condition()
+        self._cancel = threading.Event()
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel.is_set()
+
+    def check_cancelled(self):
+        """Raises JobCancelled if a cancel was requested. Called between stages."""
+        if self._cancel.is_set():
+            raise JobCancelled(f"Job {self.id} was cancelled")
+
+    def set_phase(self, phase: str):
+        self.check_cancelled()
+        self.phase = phase
+        print(f"[Job {self.id}] {self.kind}: {phase}")
+
+    def emit(self, event: dict):
+        """Appends a progress event for streaming followers."""
+        with self._cond:
+            self.events.append({"job_id": self.id, **event})
+            self._cond.notify_all()
+
+    def _finish(self, status: str, event: dict):
+        # Status and the final event change together so followers never
+        # see a finished job without its last event.
+        with self._cond:
+            self.status = status
+            self.finished = time.time()
+            self.events.append({"job_id": self.id, "status": status, **event})
+            self._cond.notify_all()
+
+    def to_dict(self, include_result: bool = False) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "phase": self.phase,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+            "usage": self.usage.totals(),
+        }
+        if self.started:
+            data["elapsed"] = round((self.finished or time.time()) - self.started, 2)
+        if include_result:
+            data["result"] = self.result
+        return data
+
+
+class JobManager:
+    def __init__(self, workers: int, cpu_limit: int, io_limit: int):
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self._slots = {
+            "cpu": threading.BoundedSemaphore(cpu_limit),
+            "io": threading.BoundedSemaphore(io_limit),
+        }
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable, **params) -> Job:
+        """Queues fn(job, **params) and returns the job right away."""
+        job = Job(kind, params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        job.future = self._executor.submit(self._run, job, fn, params)
+        return job
+
+    def _run(self, job: Job, fn: Callable, params: dict):
+        if job.cancel_requested:
+            job._finish("cancelled", {})
+            return
+        job.status = "running"
+        job.started = time.time()
+        job.emit({"status": "running"})
+        try:
+            with track_usage(job.usage):
+                result = fn(job, **params)
+            job.result = result
+            job._finish("completed", {"result": result, "usage": job.usage.totals()})
+        except JobCancelled:
+            job._finish("cancelled", {})
+        except Exception as e:
+            print(f"[Job {job.id}] failed: {e}")
+            traceback.print_exc()
+            job.error = str(e)
+            job._finish("failed", {"message": str(e)})
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.status in FINISHED_STATES]
+        for job in finished[:max(0, len(finished) - JOB_HISTORY_LIMIT)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return [job.to_dict() for job in reversed(self._jobs.values())]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """
+        Requests cancellation. Queued jobs never start; running jobs stop at
+        the next stage boundary.
+        """
+        job = self.get(job_id)
+        if not job or job.status in FINISHED_STATES:
+            return job
+        job._cancel.set()
+        if job.future and job.future.cancel():
+            job._finish("cancelled", {})
+        return job
+
+    def iter_events(self, job: Job, heartbeat: float = 15.0):
+        """
+        Yields the job's events from the start, then live ones until it
+        finishes. Emits a heartbeat while idle so proxies keep the stream open.
+        """
+        index = 0
+        while True:
+            with job._cond:
+                if index >= len(job.events) and job.status not in FINISHED_STATES:
+                    job._cond.wait(timeout=heartbeat)
+                batch = job.events[index:]
+                index += len(batch)
+                done = job.status in FINISHED_STATES and index >= len(job.events)
+            if not batch and not done:
+                yield {"job_id": job.id, "status": "heartbeat", "phase": job.phase}
+            for event in batch:
+                yield event
+            if done:
+                return
+
+    @contextmanager
+    def stage(self, kind: str, job: Optional[Job] = None, phase: Optional[str] = None):
+        """
+        Holds a CPU or I/O slot for the duration of a pipeline stage. With a
+        job, also records the phase and honours cancellation.
+        """
+        if job and phase:
+            job.set_phase(phase)
+        slots = self._slots[kind]
+        slots.acquire()
+        try:
+            if job:
+                job.check_cancelled()
+            yield
+        finally:
+            slots.release()
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": JOB_WORKERS,
+            "cpu_limit": CPU_STAGE_LIMIT,
+            "io_limit": IO_STAGE_LIMIT,
+            "jobs": counts,
+        }
+
+
+job_manager = JobManager(JOB_WORKERS, CPU_STAGE_LIMIT, IO_STAGE_LIMIT)
@@ -0,0 +1,191 @@
+"""
+Live Space Recording
+Follows the HLS stream of a Space that is still live. One ffmpeg process
+reads the stream and writes both the full-quality MP3 and fixed-length
+speech chunks; a chunk is sealed as soon as ffmpeg starts the next one, so
+it can be transcribed while the Space is still going.
+"""
+import os
+import glob
+import shutil
+import subprocess
+import yt_dlp
+from pathlib import Path
+from typing import Optional
+from ..utils import get_env_var
+from .media import (
+    get_ffmpeg_bin, SPEECH_PROXY_FORMAT, SPEECH_PROXY_SAMPLE_RATE, SPEECH_PROXY_BITRATE,
+)
+from .download_index import download_index, make_key
+from .downloader import DOWNLOAD_DIR, SPACE_TEMPLATE, _get_cookie_opts
+from .processor import CHUNK_OVERLAP_SECONDS
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+LIVE_DIR = PROJECT_ROOT / "downloads" / "live"
+
+# Length of each sealed chunk; a chunk's transcript lands this long after it started
+LIVE_CHUNK_SECONDS = int(get_env_var("LIVE_CHUNK_SECONDS") or 300)
+# How often the recording directory is checked for sealed chunks
+POLL_SECONDS = 2
+# Grace period for ffmpeg to finalize its outputs when a recording is stopped
+STOP_TIMEOUT = 15
+
+
+def resolve_live_stream(url: str) -> dict:
+    """yt-dlp info for a Space, including its HLS stream URL and headers."""
+    ydl_opts = {
+        'format': 'bestaudio/best',
+        'quiet': True,
+        'no_warnings': True,
+        **_get_cookie_opts(),
+    }
+    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        info = ydl.extract_info(url, download=False)
+    if not info.get("url") and info.get("requested_formats"):
+        info["url"] = info["requested_formats"][0].get("url")
+    if not info.get("url"):
+        raise Exception("No audio stream found for this Space")
+    return info
+
+
+class LiveRecorder:
+    def __init__(self, info: dict, chunk_seconds: int = LIVE_CHUNK_SECONDS):
+        self.info = info
+        self.chunk_seconds = chunk_seconds
+        self.work_dir = str(LIVE_DIR / str(info.get("id", "space")))
+        self.full_path = os.path.join(self.work_dir, "full.mp3")
+        self.log_path = os.path.join(self.work_dir, "ffmpeg.log")
+        self.chunks = []
+        self._process = None
+        self._log = None
+
+    def start(self):
+        # A previous recording of this Space that never finished is discarded
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        os.makedirs(self.work_dir)
+
+        cmd = [get_ffmpeg_bin(), "-hide_banner", "-loglevel", "error", "-y"]
+        headers = self.info.get("http_headers") or {}
+        if headers:
+            cmd += ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+        cmd += [
+            # Start from the oldest segment the playlist still lists
+            "-live_start_index", "0",
+            "-i", self.info["url"],
+            "-map", "0:a", "-vn",
+            "-c:a", "libmp3lame", "-q:a", "2",
+            self.full_path,
+            "-map", "0:a", "-vn",
+            "-ac", "1",
+            "-ar", str(SPEECH_PROXY_SAMPLE_RATE),
+            "-c:a", "libopus",
+            "-b:a", SPEECH_PROXY_BITRATE,
+            "-application", "voip",
+            "-f", "segment",
+            "-segment_time", str(self.chunk_seconds),
+            "-segment_format", SPEECH_PROXY_FORMAT,
+            "-reset_timestamps", "1",
+            os.path.join(self.work_dir, "chunk_%05d.ogg"),
+        ]
+        self._log = open(self.log_path, "wb")
+        print(f"[Live] Recording {self.info.get('title')} in {self.chunk_seconds}s chunks")
+        self._process = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=self._log)
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def sealed_chunks(self, final: bool = False) -> list:
+        """
+        New chunks that ffmpeg has finished writing: every chunk but the one
+        being written, or all of them once the recording has ended.
+        """
+        files = sorted(glob.glob(os.path.join(self.work_dir, "chunk_*.ogg")))
+        sealed = files if final else files[:-1]
+        new = []
+        for index in range(len(self.chunks), len(sealed)):
+            chunk = {"index": index, "path": sealed[index], "start": float(index * self.chunk_seconds)}
+            self.chunks.append(chunk)
+            new.append(chunk)
+        return new
+
+    def window(self, chunk: dict) -> tuple:
+        """
+        Audio to transcribe for a chunk: (path, start, remove). Chunks after
+        the first are prefixed with the tail of the previous one, so words
+        cut at the boundary are heard whole and the seam can be stitched.
+        """
+        if chunk["index"] == 0:
+            return chunk["path"], chunk["start"], False
+
+        previous = self.chunks[chunk["index"] - 1]
+        window_path = os.path.join(self.work_dir, f"window_{chunk['index']:05d}.ogg")
+        cmd = [
+            get_ffmpeg_bin(), "-y",
+            "-sseof", f"-{CHUNK_OVERLAP_SECONDS}", "-i", previous["path"],
+            "-i", chunk["path"],
+            "-filter_complex", "[0:a][1:a]concat=n=2:v=0:a=1",
+            "-ac", "1",
+            "-ar", str(SPEECH_PROXY_SAMPLE_RATE),
+            "-c:a", "libopus",
+            "-b:a", SPEECH_PROXY_BITRATE,
+            "-application", "voip",
+            "-f", SPEECH_PROXY_FORMAT,
+            window_path,
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"[Live] Overlap window failed, transcribing chunk alone: {result.stderr[-300:]}")
+            return chunk["path"], chunk["start"], False
+        return window_path, chunk["start"] - CHUNK_OVERLAP_SECONDS, True
+
+    def stop(self):
+        """Asks ffmpeg to finish (flushing both outputs), killing it if it hangs."""
+        if self.running:
+            try:
+                self._process.stdin.write(b"q")
+                self._process.stdin.flush()
+            except OSError:
+                pass
+            try:
+                self._process.wait(timeout=STOP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        self._close_log()
+
+    def check(self):
+        """Raises if the recording failed before producing any audio."""
+        self._close_log()
+        if self._process and self._process.returncode not in (0, None):
+            tail = self._log_tail()
+            if not self.chunks:
+                raise Exception(f"Live recording failed: {tail}")
+            print(f"[Live] Stream ended with an error after {len(self.chunks)} chunks: {tail}")
+
+    def finalize(self, url: str) -> str:
+        """
+        Moves the full recording next to the regular downloads, registers it
+        in the download index and removes the working directory.
+        """
+        with yt_dlp.YoutubeDL({'quiet': True}) as ydl:
+            base, _ = os.path.splitext(ydl.prepare_filename(self.info, outtmpl=os.path.join(DOWNLOAD_DIR, SPACE_TEMPLATE)))
+        final_path = os.path.abspath(base + ".mp3")
+        os.replace(self.full_path, final_path)
+
+        key = make_key("space", self.info.get("extractor_key", ""), str(self.info.get("id", "")))
+        download_index.put(key, "space", url, self.info, final_path)
+        shutil.rmtree(self.work_dir, ignore_errors=True)
+        print(f"[Live] Recording saved: {final_path}")
+        return final_path
+
+    def _close_log(self):
+        if self._log and not self._log.closed:
+            self._log.close()
+
+    def _log_tail(self) -> Optional[str]:
+        try:
+            with open(self.log_path, "rb") as f:
+                return f.read()[-500:].decode("utf-8", errors="replace")
+        except OSError:
+            return None
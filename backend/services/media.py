@@ -0,0 +1,224 @@
+"""
+Media helpers
+Thin wrappers around the bundled ffmpeg/ffprobe binaries shared by the
+transcription and rendering services.
+"""
+import os
+import json
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from ..metrics import FFMPEG_LATENCY
+
+# Project root (parent of backend)
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+FFMPEG_DIR = PROJECT_ROOT / "ffmpeg" / "ffmpeg-8.0.1-essentials_build" / "bin"
+
+
+def get_ffmpeg_bin(name: str = "ffmpeg") -> str:
+    """Resolves the bundled ffmpeg/ffprobe binary, falling back to PATH."""
+    for candidate in (FFMPEG_DIR / f"{name}.exe", FFMPEG_DIR / name):
+        if candidate.exists():
+            return str(candidate)
+    return shutil.which(name) or name
+
+
+def probe_duration(path: str) -> float:
+    """Returns the duration of a media file in seconds."""
+    cmd = [
+        get_ffmpeg_bin("ffprobe"),
+        "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"FFprobe failed: {result.stderr}")
+    return float(result.stdout.strip())
+
+
+def extract_window(input_path: str, start_time: float, duration: float, output_path: str) -> str:
+    """
+    Copies [start_time, start_time + duration) of the input into output_path
+    without re-encoding. Seeking happens on the input side so only the
+    requested window is read.
+    """
+    cmd = [
+        get_ffmpeg_bin(), "-y",
+        "-ss", f"{start_time:.3f}",
+        "-i", input_path,
+        "-t", f"{duration:.3f}",
+        "-vn",
+        "-c", "copy",
+        output_path,
+    ]
+    with FFMPEG_LATENCY.time(operation="window"):
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg window extraction failed: {result.stderr[-500:]}")
+    return output_path
+
+
+# ─────────────────────────────────────────────
+# Speech proxy
+# ─────────────────────────────────────────────
+
+# Low-bitrate mono copy of each download used for everything a machine
+# listens to (LLM transcription, Deepgram alignment). The full-quality MP3
+# stays the source for user downloads and clip audio.
+SPEECH_PROXY_SUFFIX = ".speech.ogg"
+SPEECH_PROXY_FORMAT = "ogg"
+SPEECH_PROXY_SAMPLE_RATE = 16000
+SPEECH_PROXY_BITRATE = "24k"
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def _file_lock(path: str) -> threading.Lock:
+    """Per-path lock so a derived file is only built once at a time."""
+    with _file_locks_guard:
+        return _file_locks.setdefault(path, threading.Lock())
+
+
+def _speech_encode_args(output_path: str) -> list:
+    return [
+        "-vn",
+        "-ac", "1",
+        "-ar", str(SPEECH_PROXY_SAMPLE_RATE),
+        "-c:a", "libopus",
+        "-b:a", SPEECH_PROXY_BITRATE,
+        "-application", "voip",
+        "-f", SPEECH_PROXY_FORMAT,
+        output_path,
+    ]
+
+
+def speech_proxy_path(audio_path: str) -> str:
+    """Returns where the speech proxy for audio_path lives (next to it)."""
+    base, _ = os.path.splitext(audio_path)
+    return base + SPEECH_PROXY_SUFFIX
+
+
+def get_speech_proxy(audio_path: str) -> str:
+    """
+    Returns the path to a cached 16 kHz mono Opus proxy of audio_path,
+    creating it on first use. The proxy is rebuilt if the source is newer.
+    """
+    if audio_path.endswith(SPEECH_PROXY_SUFFIX):
+        return audio_path
+
+    proxy_path = speech_proxy_path(audio_path)
+    with _file_lock(proxy_path):
+        if os.path.exists(proxy_path) and os.path.getmtime(proxy_path) >= os.path.getmtime(audio_path):
+            return proxy_path
+
+        tmp_path = proxy_path + ".tmp"
+        cmd = [get_ffmpeg_bin(), "-y", "-i", audio_path] + _speech_encode_args(tmp_path)
+        print(f"Building speech proxy: {os.path.basename(proxy_path)}")
+        with FFMPEG_LATENCY.time(operation="speech_proxy"):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            try: os.remove(tmp_path)
+            except OSError: pass
+            raise Exception(f"FFmpeg speech proxy failed: {result.stderr[-500:]}")
+        os.replace(tmp_path, proxy_path)
+
+    return proxy_path
+
+
+def speech_window(input_path: str, start_time: float, duration: float, output_path: str) -> str:
+    """Encodes [start_time, start_time + duration) of the input as a speech-proxy window."""
+    cmd = [get_ffmpeg_bin(), "-y", "-ss", f"{start_time:.3f}", "-i", input_path, "-t", f"{duration:.3f}"]
+    with FFMPEG_LATENCY.time(operation="window"):
+        result = subprocess.run(cmd + _speech_encode_args(output_path), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg window encode failed: {result.stderr[-500:]}")
+    return output_path
+
+
+def speech_from_bytes(data: bytes, output_path: str) -> str:
+    """
+    Encodes raw stream bytes (MPEG-TS / ADTS, which resync at any offset)
+    piped in on stdin as a speech-proxy window.
+    """
+    cmd = [get_ffmpeg_bin(), "-y", "-i", "pipe:0"]
+    with FFMPEG_LATENCY.time(operation="window"):
+        result = subprocess.run(cmd + _speech_encode_args(output_path), input=data, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg window encode failed: {result.stderr[-500:].decode('utf-8', errors='replace')}")
+    return output_path
+
+
+def get_speech_proxy_or_source(audio_path: str) -> str:
+    """Like get_speech_proxy, but falls back to the original file on failure."""
+    try:
+        return get_speech_proxy(audio_path)
+    except Exception as e:
+        print(f"Speech proxy unavailable, using original audio: {e}")
+        return audio_path
+
+
+# ─────────────────────────────────────────────
+# Loudness
+# ─────────────────────────────────────────────
+
+# EBU R128 targets for clip audio
+LOUDNESS_TARGET = "I=-16:TP=-1.5:LRA=11"
+LOUDNESS_SUFFIX = ".loudness.json"
+
+
+def measure_loudness(audio_path: str) -> dict:
+    """
+    Returns the loudnorm analysis (input_i, input_tp, input_lra,
+    input_thresh, target_offset) for a whole source file. Measured once and
+    cached next to the file; re-measured if the source is newer.
+    """
+    base, _ = os.path.splitext(audio_path)
+    cache_path = base + LOUDNESS_SUFFIX
+    with _file_lock(cache_path):
+        if os.path.exists(cache_path) and os.path.getmtime(cache_path) >= os.path.getmtime(audio_path):
+            with open(cache_path, "r") as f:
+                return json.load(f)
+
+        cmd = [
+            get_ffmpeg_bin(), "-hide_banner", "-nostats",
+            "-i", audio_path,
+            "-vn",
+            "-af", f"loudnorm={LOUDNESS_TARGET}:print_format=json",
+            "-f", "null", "-",
+        ]
+        print(f"Measuring loudness: {os.path.basename(audio_path)}")
+        with FFMPEG_LATENCY.time(operation="loudness"):
+            result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"FFmpeg loudness analysis failed: {result.stderr[-500:]}")
+
+        # The JSON block is the last {...} in stderr
+        report = result.stderr[result.stderr.rindex("{"):result.stderr.rindex("}") + 1]
+        measured = json.loads(report)
+        stats = {key: measured[key] for key in ("input_i", "input_tp", "input_lra", "input_thresh", "target_offset")}
+        with open(cache_path, "w") as f:
+            json.dump(stats, f)
+    return stats
+
+
+def loudness_filter(audio_path: str) -> str:
+    """
+    loudnorm filter for slices of audio_path. Uses the cached whole-file
+    measurement for linear (constant gain) normalization, so every slice of
+    a Space gets the same gain; falls back to single-pass loudnorm.
+    """
+    try:
+        m = measure_loudness(audio_path)
+    except Exception as e:
+        print(f"Loudness measurement unavailable, using single-pass loudnorm: {e}")
+        return f"loudnorm={LOUDNESS_TARGET}"
+    return (
+        f"loudnorm={LOUDNESS_TARGET}"
+        f":measured_I={m['input_i']}:measured_TP={m['input_tp']}"
+        f":measured_LRA={m['input_lra']}:measured_thresh={m['input_thresh']}"
+        f":offset={m['target_offset']}:linear=true"
+    )
@@ -0,0 +1,374 @@
+"""
+Pipelines
+The end-to-end flows behind /api/process, /api/transcribe, /api/live and
+/api/render-clip. Each stage runs inside a CPU or I/O slot from the job
+manager, so the same functions serve both the blocking endpoints and
+background jobs (pass the Job to get phase tracking and cancellation).
+"""
+import os
+import time
+import contextvars
+import concurrent.futures
+from contextlib import contextmanager
+from typing import Optional
+from .processor import analyze_audio, transcribe_full_space, transcript_mode, RollingTranscriber
+from .streaming import download_and_transcribe
+from .live import resolve_live_stream, LiveRecorder, POLL_SECONDS as LIVE_POLL_SECONDS
+from .transcript_store import transcript_store
+from .thread_generator import generate_thread
+from .alignment import align_segments
+from .clip_renderer import (
+    render_clip, slice_audio_batch, get_clip_words, stage_logo,
+    remove_public_file, render_composition, REMOTION_PUBLIC,
+)
+from .jobs import Job, JobCancelled, job_manager, CPU_STAGE_LIMIT
+from .storage import storage, touch
+from ..config import ConfigManager
+from ..utils import get_env_var
+from ..metrics import PIPELINE_PHASE_LATENCY
+
+# Clips rendered at once by a batch (each render also takes a CPU slot)
+RENDER_BATCH_CONCURRENCY = int(get_env_var("RENDER_BATCH_CONCURRENCY") or CPU_STAGE_LIMIT)
+# Parallel Deepgram requests while fetching word timings for a batch
+WORD_TIMING_WORKERS = 8
+
+
+class PhaseReporter:
+    """
+    Turns on_progress(phase, done, **details) callbacks into job events
+    carrying per-phase elapsed time and token usage. Phase durations are
+    recorded in the metrics with or without a job.
+    """
+
+    def __init__(self, job: Optional[Job]):
+        self.job = job
+        self._open = {}
+
+    def __call__(self, phase: str, done: bool, **details):
+        key = (phase, details.get("iteration"), details.get("candidate"))
+        if not done:
+            self._open[key] = (time.time(), self.job.usage.totals() if self.job else {})
+            if self.job:
+                self.job.emit({"status": "phase_started", "phase": phase, **details})
+            return
+        started, snapshot = self._open.pop(key, (time.time(), {}))
+        PIPELINE_PHASE_LATENCY.observe(time.time() - started, phase=phase)
+        if not self.job:
+            return
+        self.job.emit({
+            "status": "phase_completed",
+            "phase": phase,
+            "elapsed": round(time.time() - started, 2),
+            "tokens": self.job.usage.since(snapshot),
+            **details,
+        })
+
+
+@contextmanager
+def _phase(job: Optional[Job], report: PhaseReporter, kind: str, phase: str):
+    """Runs a stage in a CPU/I/O slot, reporting its start; the caller reports completion."""
+    with job_manager.stage(kind, job, phase):
+        report(phase, False)
+        yield
+
+
+def run_transcribe(job: Optional[Job] = None, url: str = "") -> dict:
+    """Downloads a Space and transcribes it, overlapping the two."""
+    config = ConfigManager.get_config()
+    report = PhaseReporter(job)
+    with job_manager.stage("io", job, "download"):
+        audio_path, transcript = download_and_transcribe(url, config=config, on_progress=report, job=job)
+    filename = os.path.basename(audio_path)
+    print(f"[Transcribe] Downloaded and transcribed: {audio_path}")
+    touch(audio_path)
+    with storage.pinned(audio_path):
+        storage.enforce("downloads")
+
+    return {
+        "transcript": transcript,
+        "audio_path": audio_path,
+        "filename": filename,
+        "download_url": f"/api/files/{filename}",
+        "config_version": config["version"]
+    }
+
+
+def run_process(job: Optional[Job] = None, url: str = "") -> dict:
+    """
+    Download + transcribe (overlapped) → extract/verify → align and thread
+    (side by side). Alignment and thread failures are non-fatal. With a job, every phase
+    emits events and the transcript, segments and drafts are published as
+    soon as they exist. The whole run uses one config snapshot, whose
+    version is returned with the result.
+    """
+    config = ConfigManager.get_config()
+    progress = PhaseReporter(job)
+
+    # 1-2. Download and transcribe; windows are transcribed while the rest downloads
+    with job_manager.stage("io", job, "download"):
+        audio_path, transcript = download_and_transcribe(url, config=config, on_progress=progress, job=job)
+    print(f"Downloaded to: {audio_path}")
+
+    # The Space stays on disk until this run is done with it
+    touch(audio_path)
+    with storage.pinned(audio_path):
+        storage.enforce("downloads")
+        return _analyze_and_thread(job, progress, audio_path, transcript, config)
+
+
+def _analyze_and_thread(job: Optional[Job], progress: PhaseReporter, audio_path: str,
+                        transcript: str, config: dict) -> dict:
+    """Extract/verify, then align and thread side by side, for a transcribed Space."""
+    # Analyze (extract + verify viral segments)
+    with job_manager.stage("io", job, "analyze"):
+        report = analyze_audio(audio_path, transcript_text=transcript, on_progress=progress, config=config)
+    print("Analysis complete.")
+
+    # Locate each segment's quotes in the audio (non-fatal). The thread
+    # doesn't need it, so it runs alongside thread generation.
+    def align():
+        with job_manager.stage("io"):
+            progress("align", False)
+            aligned = align_segments(audio_path, report.get("segments", ""))
+        progress("align", True, aligned_segments=aligned)
+        return aligned
+
+    align_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="align")
+    align_future = align_pool.submit(contextvars.copy_context().run, align)
+    align_pool.shutdown(wait=False)
+
+    # Generate tweet thread automatically
+    thread_result = None
+    try:
+        segments = report.get("segments", "")
+        if transcript:
+            with job_manager.stage("io", job, "thread"):
+                result = generate_thread(transcript, segments, on_progress=progress, config=config)
+            thread_result = {
+                "thread": result["thread"],
+                "iterations": result["iterations"],
+                "approved": result["approved"],
+                "feedback_history": result["feedback_history"],
+                "candidates": result.get("candidates", [])
+            }
+            print(f"Thread generated: approved={result['approved']}, iterations={result['iterations']}")
+        else:
+            print("Warning: Could not extract transcript for thread generation")
+    except Exception as thread_error:
+        if job and job.cancel_requested:
+            raise
+        print(f"Thread generation failed (non-fatal): {thread_error}")
+
+    aligned_segments = None
+    try:
+        aligned_segments = align_future.result()
+    except Exception as align_error:
+        print(f"Segment alignment failed (non-fatal): {align_error}")
+    if job:
+        job.check_cancelled()
+
+    return {
+        "markdown_report": report.get("markdown_report", ""),
+        "audio_path": audio_path,
+        "thread_result": thread_result,
+        "aligned_segments": aligned_segments,
+        "config_version": config["version"]
+    }
+
+
+def run_live(job: Optional[Job] = None, url: str = "") -> dict:
+    """
+    Records a Space while it is live and transcribes it as it goes: every
+    sealed chunk is transcribed right away and stitched onto a rolling
+    transcript (published as transcript_updated events). Once the Space
+    ends only extract/verify, align and thread are left. A Space that is
+    no longer live goes through run_process instead.
+    """
+    config = ConfigManager.get_config()
+    progress = PhaseReporter(job)
+    model = config.get("models", {}).get("transcript", "google/gemini-2.0-flash-001")
+    prompt = config.get("prompts", {}).get("transcript", "")
+
+    with _phase(job, progress, "io", "resolve"):
+        info = resolve_live_stream(url)
+    progress("resolve", True, title=info.get("title"), is_live=bool(info.get("is_live")))
+    if not info.get("is_live"):
+        print("[Live] Space is not live; running the regular pipeline")
+        return run_process(job, url)
+
+    def on_update(text: str, parts: int):
+        if job:
+            job.emit({"status": "transcript_updated", "phase": "record", "parts": parts, "transcript": text})
+
+    recorder = LiveRecorder(info)
+    rolling = RollingTranscriber(model, prompt, on_update=on_update)
+    if job:
+        job.set_phase("record")
+    progress("record", False)
+    recorder.start()
+    try:
+        while True:
+            # Read before listing, so the chunk sealed by the stream ending is not missed
+            running = recorder.running
+            for chunk in recorder.sealed_chunks(final=not running):
+                window_path, start, remove = recorder.window(chunk)
+                rolling.add(window_path, start, remove=remove)
+                if job:
+                    job.emit({"status": "chunk_sealed", "phase": "record", "chunk": chunk["index"], "start": chunk["start"]})
+            if not running:
+                break
+            if job:
+                job.check_cancelled()
+            time.sleep(LIVE_POLL_SECONDS)
+    except BaseException:
+        recorder.stop()
+        rolling.cancel()
+        raise
+    recorder.check()
+    progress("record", True, chunks=len(recorder.chunks))
+
+    # Keep the recording before anything else can fail: an ended Space can't be recorded again
+    audio_path = recorder.finalize(url)
+
+    with _phase(job, progress, "io", "transcribe"):
+        try:
+            transcript = rolling.finish()
+            if transcript:
+                transcript_store.save_transcript(
+                    audio_path, model, prompt, transcript, transcript_mode(True, recorder.chunk_seconds)
+                )
+        except Exception as e:
+            if job and job.cancel_requested:
+                raise
+            print(f"[Live] Rolling transcript failed, transcribing the recording: {e}")
+            transcript = transcribe_full_space(audio_path, config=config)
+    filename = os.path.basename(audio_path)
+    progress("transcribe", True, transcript=transcript, audio_path=audio_path, download_url=f"/api/files/{filename}")
+
+    with storage.pinned(audio_path):
+        storage.enforce("downloads")
+        return _analyze_and_thread(job, progress, audio_path, transcript, config)
+
+
+def run_render_clip(job: Optional[Job] = None, **spec) -> dict:
+    """Renders one clip; spec holds the render_clip keyword arguments."""
+    progress = PhaseReporter(job)
+
+    def on_render_progress(event: dict):
+        if job:
+            job.emit({
+                "status": "progress",
+                "phase": "render",
+                "progress": event.get("progress"),
+                "rendered_frames": event.get("renderedFrames"),
+                "total_frames": event.get("totalFrames"),
+            })
+
+    touch(spec.get("audio_path"))
+    with storage.pinned(spec.get("audio_path"), spec.get("logo_path")):
+        with _phase(job, progress, "cpu", "render"):
+            output_path = render_clip(**spec, on_progress=on_render_progress)
+    storage.enforce("clips")
+    filename = os.path.basename(output_path)
+    progress("render", True, filename=filename)
+    return {"clip_url": f"/api/clips/{filename}", "filename": filename}
+
+
+def run_render_batch(
+    job: Optional[Job] = None,
+    audio_path: str = "",
+    clips: list = (),
+    title: str = "Space2Thread",
+    logo_path: Optional[str] = None,
+    logo_position: str = "top-right",
+    colors: Optional[dict] = None,
+    concurrency: Optional[int] = None,
+) -> dict:
+    """
+    Renders many clips from one source. The source is decoded and
+    normalized once for all slices, word timings are fetched in parallel,
+    then renders run `concurrency` at a time. With a job, each clip is
+    published as a clip_completed / clip_failed event as soon as it finishes;
+    one failed clip does not stop the others.
+    """
+    if not clips:
+        return {"clips": []}
+    progress = PhaseReporter(job)
+
+    touch(audio_path)
+    with storage.pinned(audio_path, logo_path):
+        # 1. Slice every range in one decode
+        with _phase(job, progress, "cpu", "slice"):
+            audio_files = slice_audio_batch(audio_path, [(c["start_time"], c["end_time"]) for c in clips])
+        progress("slice", True, clips=len(clips))
+
+        pending = set(audio_files)
+        logo_filename = None
+        try:
+            # 2. Word timings for all slices in parallel
+            with _phase(job, progress, "io", "words"):
+                with concurrent.futures.ThreadPoolExecutor(max_workers=min(WORD_TIMING_WORKERS, len(clips))) as pool:
+                    words = list(pool.map(
+                        lambda item: get_clip_words(
+                            audio_path, item[0]["start_time"], item[0]["end_time"], str(REMOTION_PUBLIC / item[1])
+                        ),
+                        zip(clips, audio_files),
+                    ))
+            progress("words", True)
+
+            # 3. Render across cores
+            logo_filename = stage_logo(logo_path)
+            if job:
+                job.set_phase("render")
+            started = time.time()
+
+            def render_one(index: int) -> dict:
+                clip = clips[index]
+                try:
+                    with job_manager.stage("cpu", job):
+                        output_path = render_composition(
+                            clip.get("layout") or "centered_waveform",
+                            audio_files[index],
+                            clip["end_time"] - clip["start_time"],
+                            clip.get("title") or title,
+                            words[index],
+                            caption_text=clip.get("caption_text") or "",
+                            logo_filename=logo_filename,
+                            logo_position=logo_position,
+                            colors=colors,
+                        )
+                finally:
+                    remove_public_file(audio_files[index])
+                    pending.discard(audio_files[index])
+                filename = os.path.basename(output_path)
+                return {"index": index, "clip_url": f"/api/clips/{filename}", "filename": filename}
+
+            results = [None] * len(clips)
+            workers = max(1, min(concurrency or RENDER_BATCH_CONCURRENCY, len(clips)))
+            with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render_one, i): i for i in range(len(clips))}
+                for future in concurrent.futures.as_completed(futures):
+                    index = futures[future]
+                    try:
+                        results[index] = future.result()
+                        event = {"status": "clip_completed", **results[index]}
+                    except JobCancelled:
+                        for other in futures:
+                            other.cancel()
+                        raise
+                    except Exception as e:
+                        print(f"[Render Batch] Clip {index} failed: {e}")
+                        results[index] = {"index": index, "error": str(e)}
+                        event = {"status": "clip_failed", **results[index]}
+                    if job:
+                        job.emit(event)
+            PIPELINE_PHASE_LATENCY.observe(time.time() - started, phase="render_batch")
+        finally:
+            for filename in list(pending):
+                remove_public_file(filename)
+            remove_public_file(logo_filename)
+
+        rendered = sum(1 for r in results if "error" not in r)
+        print(f"[Render Batch] {rendered}/{len(clips)} clips rendered")
+    storage.enforce("clips")
+    return {"clips": results, "rendered": rendered, "failed": len(clips) - rendered}
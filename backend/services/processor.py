@@ -1,50 +1,293 @@
-import base64
+import os
+import re
+import shutil
+import tempfile
+import threading
+import contextvars
+import concurrent.futures
+from difflib import SequenceMatcher
+from typing import Callable, Optional
 from ..config import ConfigManager
-from ..utils import send_to_openrouter, get_env_var
+from ..utils import send_to_openrouter, get_env_var, audio_file_part, transcript_context_message
+from .media import probe_duration, extract_window, get_speech_proxy_or_source
+from .transcript_store import transcript_store
 
-def transcribe_full_space(file_path: str) -> str:
+# Chunked transcription: Spaces longer than CHUNKED_MIN_SECONDS are split into
+# CHUNK_SECONDS windows that overlap by CHUNK_OVERLAP_SECONDS and are
+# transcribed MAX_PARALLEL_CHUNKS at a time.
+CHUNKED_MIN_SECONDS = 30 * 60
+CHUNK_SECONDS = 10 * 60
+CHUNK_OVERLAP_SECONDS = 20
+MAX_PARALLEL_CHUNKS = 4
+
+# How many words at each side of a seam are compared when removing the
+# text duplicated by the overlap, and the shortest run accepted as a match.
+SEAM_SEARCH_WORDS = 150
+SEAM_MIN_MATCH_WORDS = 6
+
+_WORD_RE = re.compile(r"[\w']+")
+_TIMESTAMP_RE = re.compile(r"\[(?:(\d{1,2}):)?(\d{1,2}):(\d{2})\]")
+
+
+def transcript_mode(chunked: bool, chunk_seconds: int = CHUNK_SECONDS) -> str:
+    """How a transcript was made, as recorded in the transcript store."""
+    return f"chunked:{chunk_seconds}/{CHUNK_OVERLAP_SECONDS}" if chunked else "single"
+
+
+def _format_timestamp(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+def _offset_timestamps(text: str, offset: float) -> str:
+    """
+    Shifts the [MM:SS] / [HH:MM:SS] markers of a window transcript, which
+    count from the start of the window, to absolute [HH:MM:SS] time.
+    """
+    def _shift(match):
+        hours, minutes, secs = match.group(1), match.group(2), match.group(3)
+        total = int(hours or 0) * 3600 + int(minutes) * 60 + int(secs) + offset
+        return f"[{_format_timestamp(total)}]"
+
+    return _TIMESTAMP_RE.sub(_shift, text)
+
+
+def _window_instruction(index: int, total: Optional[int] = None) -> str:
+    # The window's start is left out on purpose: markers are shifted to absolute time afterwards
+    part = f"part {index + 1} of {total}" if total else f"part {index + 1}"
+    return (
+        f"Here is {part} of the audio file. Please transcribe it, "
+        f"with timestamps counted from the start of this part."
+    )
+
+
+def _merge_overlap(previous: str, following: str) -> str:
+    """
+    Joins two consecutive window transcripts, dropping the text both of them
+    contain because of the audio overlap. The seam is the longest run of
+    matching words between the tail of `previous` and the head of `following`.
+    """
+    prev_words = list(_WORD_RE.finditer(previous))[-SEAM_SEARCH_WORDS:]
+    next_words = list(_WORD_RE.finditer(following))[:SEAM_SEARCH_WORDS]
+    a = [m.group().lower() for m in prev_words]
+    b = [m.group().lower() for m in next_words]
+
+    match = SequenceMatcher(None, a, b, autojunk=False).find_longest_match(0, len(a), 0, len(b))
+    if match.size < SEAM_MIN_MATCH_WORDS:
+        return previous.rstrip() + "\n" + following.lstrip()
+
+    cut_prev = prev_words[match.a + match.size - 1].end()
+    cut_next = next_words[match.b + match.size - 1].end()
+    return previous[:cut_prev] + following[cut_next:]
+
+
+def stitch_transcripts(parts: list) -> str:
+    """Stitches ordered window transcripts into one, removing overlap duplicates."""
+    stitched = ""
+    for part in parts:
+        part = part.strip()
+        if not part:
+            continue
+        stitched = _merge_overlap(stitched, part) if stitched else part
+    return stitched
+
+
+def _plan_windows(duration: float) -> list:
+    """Returns (start, length) pairs covering the audio with overlapping windows."""
+    windows = []
+    start = 0.0
+    while start < duration:
+        window_start = max(0.0, start - CHUNK_OVERLAP_SECONDS)
+        window_end = min(duration, start + CHUNK_SECONDS)
+        windows.append((window_start, window_end - window_start))
+        start += CHUNK_SECONDS
+    return windows
+
+
+def _transcribe_file(file_path: str, prompt: str, model: str, instruction: str) -> str:
+    audio_format = os.path.splitext(file_path)[1].lstrip(".").lower() or "mp3"
+    messages = [
+        {"role": "system", "content": prompt},
+        {"role": "user", "content": [
+            {"type": "text", "text": instruction},
+            audio_file_part(file_path, audio_format)
+        ]}
+    ]
+    return send_to_openrouter(messages, model=model)
+
+
+def _transcribe_chunked(file_path: str, duration: float, prompt: str, model: str) -> str:
+    windows = _plan_windows(duration)
+    total = len(windows)
+    ext = os.path.splitext(file_path)[1] or ".mp3"
+    work_dir = tempfile.mkdtemp(prefix="s2t_chunks_")
+    print(f"--- Generating Transcript ({model}) in {total} windows, {MAX_PARALLEL_CHUNKS} at a time ---")
+
+    def _run(index: int) -> str:
+        start, length = windows[index]
+        window_path = os.path.join(work_dir, f"window_{index:03d}{ext}")
+        extract_window(file_path, start, length, window_path)
+        try:
+            text = _transcribe_file(window_path, prompt, model, _window_instruction(index, total))
+        finally:
+            os.remove(window_path)
+        print(f"Window {index + 1}/{total} transcribed.")
+        return _offset_timestamps(text, start)
+
+    try:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_PARALLEL_CHUNKS) as pool:
+            # Copy the context per window so usage tracking follows the calls
+            futures = [pool.submit(contextvars.copy_context().run, _run, i) for i in range(total)]
+            parts = [f.result() for f in futures]
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return stitch_transcripts(parts)
+
+
+class RollingTranscriber:
+    """
+    Transcribes audio windows as they become available (live recording,
+    in-progress downloads) and keeps a stitched transcript of the finished
+    prefix. Windows must be added in time order and may overlap the previous
+    one; the overlap is removed when stitching. on_update(transcript, parts)
+    is called whenever the stitched prefix grows.
+    """
+
+    def __init__(self, model: str, prompt: str, on_update: Optional[Callable] = None,
+                 workers: int = MAX_PARALLEL_CHUNKS):
+        self.model = model
+        self.prompt = prompt
+        self.on_update = on_update
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rolling")
+        self._futures = []
+        self._parts = {}
+        self._next = 0
+        self._stitched = ""
+        self._lock = threading.Lock()
+
+    def add(self, window_path: str, start: float, remove: bool = True) -> int:
+        """Queues a window starting at `start` seconds; returns its index."""
+        index = len(self._futures)
+        future = self._pool.submit(contextvars.copy_context().run, self._run, index, window_path, start, remove)
+        self._futures.append(future)
+        return index
+
+    def _run(self, index: int, window_path: str, start: float, remove: bool):
+        try:
+            text = _transcribe_file(window_path, self.prompt, self.model, _window_instruction(index))
+        finally:
+            if remove:
+                try: os.remove(window_path)
+                except OSError: pass
+        print(f"Rolling window {index + 1} transcribed.")
+
+        with self._lock:
+            self._parts[index] = _offset_timestamps(text, start)
+            advanced = False
+            while self._next in self._parts:
+                part = self._parts.pop(self._next).strip()
+                if part:
+                    self._stitched = _merge_overlap(self._stitched, part) if self._stitched else part
+                self._next += 1
+                advanced = True
+            stitched, parts = self._stitched, self._next
+        if advanced and self.on_update:
+            self.on_update(stitched, parts)
+
+    @property
+    def transcript(self) -> str:
+        with self._lock:
+            return self._stitched
+
+    def finish(self) -> str:
+        """Waits for every queued window and returns the full transcript."""
+        try:
+            for future in self._futures:
+                future.result()
+        finally:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        return self.transcript
+
+    def cancel(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+def transcribe_full_space(file_path: str, chunked: Optional[bool] = None,
+                          config: Optional[dict] = None) -> str:
     """
     Transcribes an audio file using the configured LLM.
     Returns the transcript text.
+
+    chunked=None picks chunked mode automatically for audio longer than
+    CHUNKED_MIN_SECONDS; True/False forces it on or off. Transcripts are
+    looked up in / saved to the transcript store, keyed by the audio
+    content hash, the transcript model + prompt and the mode, so a forced
+    mode never gets a transcript made the other way. Pass a config snapshot
+    to pin the models/prompts used; otherwise the current one is read.
     """
     if not get_env_var("OPENROUTER_API_KEY"):
         raise Exception("OPENROUTER_API_KEY not found in .env")
 
-    config = ConfigManager.get_config()
+    config = config or ConfigManager.get_config()
     models = config.get("models", {})
     prompts = config.get("prompts", {})
 
     model_transcript = models.get("transcript", "google/gemini-2.0-flash-001")
     prompt_transcript = prompts.get("transcript", "")
 
-    # Encode Audio
-    print("Encoding audio...")
-    with open(file_path, "rb") as audio_file:
-        encoded_string = base64.b64encode(audio_file.read()).decode("utf-8")
+    source_path = file_path
+    duration = None
+    if chunked is not False:
+        try:
+            duration = probe_duration(source_path)
+        except Exception as e:
+            print(f"Could not probe duration, transcribing in one request: {e}")
+    auto = chunked is None
+    if auto:
+        chunked = duration is not None and duration > CHUNKED_MIN_SECONDS
+    chunked = bool(chunked and duration)
+    mode = transcript_mode(chunked)
 
-    print(f"--- Generating Transcript ({model_transcript}) ---")
-    messages = [
-        {"role": "system", "content": prompt_transcript},
-        {"role": "user", "content": [
-            {"type": "text", "text": "Here is the audio file. Please transcribe it."},
-            {"type": "input_audio", "input_audio": {"data": encoded_string, "format": "mp3"}}
-        ]}
-    ]
-    transcript_text = send_to_openrouter(messages, model=model_transcript)
+    # Transcripts stored before modes were recorded were picked automatically too
+    stored = transcript_store.get_transcript(source_path, model_transcript, prompt_transcript, mode, accept_legacy=auto)
+    if stored:
+        print(f"[Transcript Store Hit] Re-using transcript #{stored['id']}")
+        return stored["text"]
+
+    # The model only needs speech, so send the small mono proxy
+    file_path = get_speech_proxy_or_source(source_path)
+
+    if chunked:
+        transcript_text = _transcribe_chunked(file_path, duration, prompt_transcript, model_transcript)
+    else:
+        print(f"--- Generating Transcript ({model_transcript}) ---")
+        transcript_text = _transcribe_file(
+            file_path, prompt_transcript, model_transcript,
+            "Here is the audio file. Please transcribe it."
+        )
     print("Transcript generated successfully.")
+    if transcript_text:
+        transcript_store.save_transcript(source_path, model_transcript, prompt_transcript, transcript_text, mode)
     return transcript_text
 
 
-def analyze_audio(file_path: str) -> dict:
+def analyze_audio(file_path: str, transcript_text: Optional[str] = None,
+                  on_progress: Optional[Callable] = None,
+                  config: Optional[dict] = None) -> dict:
     """
     Orchestrates the analysis pipeline using dynamic config.
     Returns a structured dictionary with transcript and segments.
+    Pass transcript_text to skip the transcription step. on_progress, if
+    given, is called as on_progress(phase, done, **details) around the
+    extract and verify steps. config pins a config snapshot.
     """
+    on_progress = on_progress or (lambda *args, **kwargs: None)
     if not get_env_var("OPENROUTER_API_KEY"):
         raise Exception("OPENROUTER_API_KEY not found in .env")
 
     # Load latest config
-    config = ConfigManager.get_config()
+    config = config or ConfigManager.get_config()
     models = config.get("models", {})
     prompts = config.get("prompts", {})
 
@@ -55,29 +298,38 @@ def analyze_audio(file_path: str) -> dict:
     prompt_verify = prompts.get("verify", "")
 
     # Step 1: Transcribe
-    transcript_text = transcribe_full_space(file_path)
+    if transcript_text is None:
+        transcript_text = transcribe_full_space(file_path, config=config)
 
     # ---------------------------------------------------------
     # STEP 2: EXTRACT SEGMENTS
     # ---------------------------------------------------------
     print(f"--- Step 2: Extracting Viral Segments ({model_extract}) ---")
+    on_progress("extract", False, model=model_extract)
+    # The transcript goes first so extract, verify and the thread writer
+    # share one cacheable prefix
     messages_step2 = [
+        transcript_context_message(transcript_text),
         {"role": "system", "content": prompt_extract},
-        {"role": "user", "content": f"Here is the transcript:\n\n{transcript_text}"}
+        {"role": "user", "content": "Extract the viral segments from the transcript above."}
     ]
     initial_segments = send_to_openrouter(messages_step2, model=model_extract)
     print("Initial segments extracted.")
+    on_progress("extract", True, segments=initial_segments)
 
     # ---------------------------------------------------------
     # STEP 3: VERIFY & REFINE
     # ---------------------------------------------------------
     print(f"--- Step 3: Verifying and Refining ({model_verify}) ---")
+    on_progress("verify", False, model=model_verify)
     messages_step3 = [
+        transcript_context_message(transcript_text),
         {"role": "system", "content": prompt_verify},
-        {"role": "user", "content": f"ORIGINAL TRANSCRIPT:\n{transcript_text}\n\nDRAFT SEGMENTS:\n{initial_segments}"}
+        {"role": "user", "content": f"DRAFT SEGMENTS:\n{initial_segments}"}
     ]
     final_segments = send_to_openrouter(messages_step3, model=model_verify)
     print("Final verification complete.")
+    on_progress("verify", True, segments=final_segments)
 
     final_report = f"{final_segments}\n\n---\n\n# Full Transcript\n{transcript_text}"
     
@@ -0,0 +1,123 @@
+"""
+Render Server Client
+Talks to the long-lived Remotion render server (remotion/render-server.mjs),
+starting it on first use. The server bundles the project once and keeps a
+browser warm, so a clip render is mostly encode time instead of npm
+resolution + webpack + browser launch on every call.
+
+Disable with REMOTION_RENDER_SERVER=0 to always use `npx remotion render`.
+"""
+import os
+import json
+import time
+import atexit
+import shutil
+import threading
+import subprocess
+import requests
+from pathlib import Path
+from typing import Callable, Optional
+from ..utils import get_env_var
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+REMOTION_DIR = PROJECT_ROOT / "remotion"
+
+RENDER_SERVER_ENABLED = (get_env_var("REMOTION_RENDER_SERVER") or "1").lower() not in ("0", "false", "no")
+RENDER_SERVER_PORT = int(get_env_var("REMOTION_RENDER_PORT") or 3123)
+RENDER_SERVER_URL = f"http://127.0.0.1:{RENDER_SERVER_PORT}"
+# First start bundles the project and launches Chrome
+STARTUP_TIMEOUT = 180
+RENDER_TIMEOUT = 30 * 60
+
+_process = None
+_lock = threading.Lock()
+
+
+class RenderServerUnavailable(Exception):
+    pass
+
+
+def _healthy() -> bool:
+    try:
+        resp = requests.get(f"{RENDER_SERVER_URL}/health", timeout=2)
+        return resp.status_code == 200 and resp.json().get("ok", False)
+    except (requests.RequestException, ValueError):
+        return False
+
+
+def _stop():
+    global _process
+    if _process and _process.poll() is None:
+        _process.terminate()
+        try:
+            _process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            _process.kill()
+    _process = None
+
+
+def ensure_running():
+    """Starts the render server if it is not already answering health checks."""
+    global _process
+    if _healthy():
+        return
+    with _lock:
+        if _healthy():
+            return
+        if _process is None or _process.poll() is not None:
+            node = shutil.which("node") or "node"
+            env = {**os.environ, "REMOTION_RENDER_PORT": str(RENDER_SERVER_PORT)}
+            print(f"Starting Remotion render server on {RENDER_SERVER_URL}...")
+            try:
+                _process = subprocess.Popen([node, "render-server.mjs"], cwd=str(REMOTION_DIR), env=env)
+            except OSError as e:
+                raise RenderServerUnavailable(f"Could not start node: {e}")
+            atexit.register(_stop)
+
+        deadline = time.time() + STARTUP_TIMEOUT
+        while time.time() < deadline:
+            if _healthy():
+                return
+            if _process.poll() is not None:
+                raise RenderServerUnavailable(f"Render server exited with code {_process.returncode}")
+            time.sleep(1)
+        raise RenderServerUnavailable("Render server did not become ready in time")
+
+
+def render(composition_id: str, output_path: str, input_props: dict,
+           on_progress: Optional[Callable] = None) -> str:
+    """
+    Renders a composition through the server. on_progress receives each
+    progress event ({progress, renderedFrames, encodedFrames, totalFrames}).
+    Raises RenderServerUnavailable if the server cannot be reached.
+    """
+    ensure_running()
+    try:
+        resp = requests.post(
+            f"{RENDER_SERVER_URL}/render",
+            json={"compositionId": composition_id, "outputPath": output_path, "inputProps": input_props},
+            stream=True,
+            timeout=(5, RENDER_TIMEOUT),
+        )
+    except requests.ConnectionError as e:
+        raise RenderServerUnavailable(str(e))
+
+    last_logged = -1
+    with resp:
+        for line in resp.iter_lines():
+            if not line:
+                continue
+            msg = json.loads(line)
+            status = msg.get("status")
+            if status == "progress":
+                if on_progress:
+                    on_progress(msg)
+                pct = int(msg.get("progress", 0) * 100)
+                if pct // 25 != last_logged // 25:
+                    last_logged = pct
+                    print(f"Render progress: {pct}% ({msg.get('renderedFrames')}/{msg.get('totalFrames')} frames)")
+            elif status == "completed":
+                return output_path
+            elif status == "error":
+                raise Exception(f"Remotion render failed: {msg.get('message', '')[-500:]}")
+    raise Exception("Render server closed the stream without a result")
@@ -1,6 +1,11 @@
 import os
 import requests
+import concurrent.futures
+from typing import Optional
 from dotenv import load_dotenv
+from ..utils import get_env_var
+from .download_index import canonical_id
+from .scout_store import scout_store, normalize_username
 
 # Ensure env is loaded
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,14 +17,22 @@ if os.path.exists(env_path):
     except:
         pass
 
+# Apify results per user are reused for this long
+SCOUT_CACHE_TTL = int(get_env_var("SCOUT_CACHE_TTL") or 15 * 60)
+# Actor runs at once while scanning a watchlist
+SCOUT_CONCURRENCY = int(get_env_var("SCOUT_CONCURRENCY") or 4)
+# Latest Spaces fetched per user in a watchlist scan
+SCOUT_ITEMS_PER_USER = int(get_env_var("SCOUT_ITEMS_PER_USER") or 3)
+ACTOR_TIMEOUT = 60
+
+
 class ScoutService:
     @staticmethod
     def _get_api_token():
-        from ..utils import get_env_var
         return get_env_var("APIFY_API_TOKEN")
 
     @staticmethod
-    def find_latest_space(username: str = "elonmusk") -> str:
+    def _run_actor(username: str, max_items: int) -> list:
         token = ScoutService._get_api_token()
         if not token:
             raise ValueError("APIFY_API_TOKEN not found in configuration.")
@@ -33,35 +46,99 @@ class ScoutService:
         
         payload = {
             "searchTerms": [query],
-            "maxItems": 1,
+            "maxItems": max_items,
             "sort": "Latest",
             "proxyConfig": { "useApifyProxy": True }
         }
 
-        try:
-            response = requests.post(
-                actor_url,
-                headers={"Authorization": f"Bearer {token}"},
-                json=payload,
-                timeout=60
-            )
+        response = requests.post(
+            actor_url,
+            headers={"Authorization": f"Bearer {token}"},
+            json=payload,
+            timeout=ACTOR_TIMEOUT
+        )
 
-            if response.status_code != 201:
-                error_msg = f"Apify Error {response.status_code}: {response.text}"
-                print(error_msg)
-                raise Exception("Failed to contact Scout.")
+        if response.status_code != 201:
+            error_msg = f"Apify Error {response.status_code}: {response.text}"
+            print(error_msg)
+            raise Exception("Failed to contact Scout.")
 
-            data = response.json()
-            
-            if not data:
-                return None # No spaces found
+        return response.json() or []
 
-            item = data[0]
-            # Extract URL, prioritizing direct link
-            url = item.get("url") or item.get("expanded_url") or f"https://twitter.com/i/spaces/{item.get('id_str')}"
-            
-            return url
+    @staticmethod
+    def _to_space(item: dict, username: str) -> dict:
+        # Extract URL, prioritizing direct link
+        url = item.get("url") or item.get("expanded_url") or f"https://twitter.com/i/spaces/{item.get('id_str')}"
+        parsed = canonical_id(url)
+        return {
+            "id": parsed[1] if parsed else (item.get("id_str") or url),
+            "url": url,
+            "username": normalize_username(username),
+            "created_at": item.get("created_at"),
+        }
 
+    @staticmethod
+    def find_spaces(username: str, max_items: int = 1, max_age: float = SCOUT_CACHE_TTL) -> list:
+        """
+        The user's latest Spaces, newest first. A result fetched within
+        max_age seconds is served from the store without an actor run.
+        """
+        cached = scout_store.get_cached(username, max_items, max_age)
+        if cached is not None:
+            print(f"[Scout Cache Hit] {username}")
+            return cached
+        try:
+            items = ScoutService._run_actor(username, max_items)
         except Exception as e:
             print(f"Scout failed: {e}")
             raise e
+        spaces = [ScoutService._to_space(item, username) for item in items[:max_items]]
+        scout_store.put_cached(username, max_items, spaces)
+        return spaces
+
+    @staticmethod
+    def find_latest_space(username: str = "elonmusk") -> str:
+        spaces = ScoutService.find_spaces(username, 1)
+        if not spaces:
+            return None # No spaces found
+        return spaces[0]["url"]
+
+    @staticmethod
+    def find_spaces_bulk(usernames: list, max_items: int = SCOUT_ITEMS_PER_USER,
+                         max_age: float = SCOUT_CACHE_TTL) -> tuple:
+        """
+        find_spaces for every username, at most SCOUT_CONCURRENCY actor runs
+        at once. Returns (spaces, errors): the Spaces in username order,
+        newest first per user, a Space shared by co-hosts listed once, and
+        the error per failed user; one failing user does not stop the others.
+        """
+        results, errors = {}, {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=SCOUT_CONCURRENCY, thread_name_prefix="scout") as pool:
+            futures = {pool.submit(ScoutService.find_spaces, u, max_items, max_age): u for u in usernames}
+            for future in concurrent.futures.as_completed(futures):
+                username = futures[future]
+                try:
+                    results[username] = future.result()
+                except Exception as e:
+                    errors[username] = str(e)
+        spaces = {}
+        for username in usernames:
+            for space in results.get(username, []):
+                spaces.setdefault(space["id"], space)
+        return list(spaces.values()), errors
+
+    @staticmethod
+    def scan_watchlist(usernames: Optional[list] = None, max_items: int = SCOUT_ITEMS_PER_USER,
+                       force: bool = False) -> dict:
+        """
+        Scans every username (the stored watchlist by default) and returns
+        the Spaces not seen in any earlier scan, plus per-user errors.
+        force=True ignores cached results.
+        """
+        usernames = list(dict.fromkeys(
+            u for u in map(normalize_username, usernames if usernames is not None else scout_store.get_watchlist()) if u
+        ))
+        spaces, errors = ScoutService.find_spaces_bulk(usernames, max_items, 0 if force else SCOUT_CACHE_TTL)
+        new_spaces = [space for space in spaces if scout_store.mark_seen(space)]
+        print(f"[Scout] Scanned {len(usernames)} users: {len(new_spaces)} new Spaces, {len(errors)} errors")
+        return {"new": new_spaces, "scanned": len(usernames), "errors": errors}
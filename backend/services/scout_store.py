@@ -0,0 +1,214 @@
+"""
+Scout Store
+The Scout watchlist, the last Apify result per user (served until it is
+older than the TTL) and every Space ID seen so far, so repeated scans only
+report Spaces that are actually new. Also holds the auto-ingest queue and
+the results of Spaces processed in the background.
+"""
+import json
+import time
+import zlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+DATA_DIR = PROJECT_ROOT / "data"
+SCOUT_DB = DATA_DIR / "scout.sqlite3"
+
+
+def normalize_username(username: str) -> str:
+    return (username or "").strip().lstrip("@").lower()
+
+
+class ScoutStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS watchlist (
+                    username TEXT PRIMARY KEY,
+                    added REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS scout_results (
+                    username TEXT PRIMARY KEY,
+                    fetched REAL NOT NULL,
+                    max_items INTEGER NOT NULL,
+                    spaces TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS seen_spaces (
+                    space_id TEXT PRIMARY KEY,
+                    username TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    first_seen REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS ingest_queue (
+                    space_id TEXT PRIMARY KEY,
+                    url TEXT NOT NULL,
+                    username TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    job_id TEXT,
+                    queued REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    error TEXT,
+                    result BLOB
+                );
+            """)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_watchlist(self) -> list:
+        with self._lock:
+            rows = self._db().execute("SELECT username FROM watchlist ORDER BY added, username").fetchall()
+        return [r[0] for r in rows]
+
+    def set_watchlist(self, usernames: list) -> list:
+        """Replaces the watchlist; existing entries keep their position."""
+        wanted = list(dict.fromkeys(u for u in map(normalize_username, usernames) if u))
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            if wanted:
+                placeholders = ",".join("?" * len(wanted))
+                db.execute(f"DELETE FROM watchlist WHERE username NOT IN ({placeholders})", wanted)
+            else:
+                db.execute("DELETE FROM watchlist")
+            db.executemany(
+                "INSERT OR IGNORE INTO watchlist (username, added) VALUES (?, ?)",
+                [(u, now + i * 1e-6) for i, u in enumerate(wanted)],
+            )
+            db.commit()
+        return self.get_watchlist()
+
+    def get_cached(self, username: str, max_items: int, max_age: float) -> Optional[list]:
+        """Cached Spaces for a user if fetched within max_age with at least max_items requested."""
+        with self._lock:
+            row = self._db().execute(
+                "SELECT fetched, max_items, spaces FROM scout_results WHERE username = ?",
+                (normalize_username(username),),
+            ).fetchone()
+        if not row or row[1] < max_items or time.time() - row[0] > max_age:
+            return None
+        return json.loads(row[2])[:max_items]
+
+    def put_cached(self, username: str, max_items: int, spaces: list):
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO scout_results (username, fetched, max_items, spaces) VALUES (?, ?, ?, ?)",
+                (normalize_username(username), time.time(), max_items, json.dumps(spaces)),
+            )
+            db.commit()
+
+    def mark_seen(self, space: dict) -> bool:
+        """Records a Space; True if it had not been seen before."""
+        with self._lock:
+            db = self._db()
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO seen_spaces (space_id, username, url, first_seen) VALUES (?, ?, ?, ?)",
+                (space["id"], normalize_username(space.get("username")), space["url"], time.time()),
+            )
+            db.commit()
+        return cursor.rowcount == 1
+
+    def list_seen(self, limit: int = 100) -> list:
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT space_id, username, url, first_seen FROM seen_spaces ORDER BY first_seen DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [{"id": r[0], "username": r[1], "url": r[2], "first_seen": r[3]} for r in rows]
+
+    def ingest_add(self, space: dict) -> bool:
+        """Queues a Space for auto-ingest; False if it was queued before."""
+        with self._lock:
+            db = self._db()
+            cursor = db.execute(
+                "INSERT OR IGNORE INTO ingest_queue (space_id, url, username, status, queued) VALUES (?, ?, ?, 'queued', ?)",
+                (space["id"], space["url"], normalize_username(space.get("username")), time.time()),
+            )
+            db.commit()
+        return cursor.rowcount == 1
+
+    def ingest_next(self, limit: int) -> list:
+        """Oldest queued Spaces."""
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT space_id, url, username FROM ingest_queue WHERE status = 'queued' ORDER BY queued LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [{"id": r[0], "url": r[1], "username": r[2]} for r in rows]
+
+    def ingest_update(self, space_id: str, status: str, job_id: Optional[str] = None,
+                      error: Optional[str] = None, result: Optional[dict] = None):
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            if status == "running":
+                db.execute(
+                    "UPDATE ingest_queue SET status = ?, job_id = ?, started = ? WHERE space_id = ?",
+                    (status, job_id, now, space_id),
+                )
+            else:
+                db.execute(
+                    "UPDATE ingest_queue SET status = ?, finished = ?, error = ?, result = ? WHERE space_id = ?",
+                    (status, now, error,
+                     zlib.compress(json.dumps(result).encode("utf-8")) if result is not None else None,
+                     space_id),
+                )
+            db.commit()
+
+    def ingest_requeue_running(self) -> int:
+        """Puts Spaces whose job was lost to a restart back in the queue."""
+        with self._lock:
+            db = self._db()
+            cursor = db.execute("UPDATE ingest_queue SET status = 'queued', job_id = NULL, started = NULL WHERE status = 'running'")
+            db.commit()
+        return cursor.rowcount
+
+    def ingest_started_since(self, since: float) -> int:
+        with self._lock:
+            row = self._db().execute("SELECT COUNT(*) FROM ingest_queue WHERE started >= ?", (since,)).fetchone()
+        return row[0]
+
+    def ingest_list(self, limit: int = 50) -> list:
+        """Auto-ingest entries (without results), newest first."""
+        with self._lock:
+            rows = self._db().execute(
+                """SELECT space_id, url, username, status, job_id, queued, started, finished, error
+                   FROM ingest_queue ORDER BY queued DESC LIMIT ?""",
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "id": r[0], "url": r[1], "username": r[2], "status": r[3], "job_id": r[4],
+                "queued": r[5], "started": r[6], "finished": r[7], "error": r[8],
+            }
+            for r in rows
+        ]
+
+    def ingest_get(self, space_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._db().execute(
+                "SELECT space_id, url, username, status, job_id, queued, started, finished, error, result FROM ingest_queue WHERE space_id = ?",
+                (space_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0], "url": row[1], "username": row[2], "status": row[3], "job_id": row[4],
+            "queued": row[5], "started": row[6], "finished": row[7], "error": row[8],
+            "result": json.loads(zlib.decompress(row[9]).decode("utf-8")) if row[9] else None,
+        }
+
+
+scout_store = ScoutStore(SCOUT_DB)
@@ -0,0 +1,199 @@
+"""
+Storage Manager
+Size quotas per storage area with least-recently-used eviction. Last
+access is the file's atime, which touch() sets explicitly whenever an
+artifact is served or reused (so it works on noatime/relatime volumes and
+on Windows). Files used by running jobs are pinned and never evicted, and
+neither is anything younger than STORAGE_MIN_AGE. Evicted downloads are
+dropped from the download index. Temp files left behind by crashed
+renders and recordings are swept on startup.
+"""
+import os
+import glob
+import time
+import shutil
+import tempfile
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from typing import Optional
+from ..utils import get_env_var
+from .downloader import DOWNLOAD_DIR, VIDEOS_DIR
+from .download_index import download_index
+from .clip_renderer import CLIPS_DIR, LOGOS_DIR, REMOTION_PUBLIC
+from .live import LIVE_DIR
+from .media import SPEECH_PROXY_SUFFIX, LOUDNESS_SUFFIX
+from .streaming import STREAM_DIR_PREFIX
+
+MB = 1024 * 1024
+# Files this young are never evicted (just written, about to be served)
+STORAGE_MIN_AGE = int(get_env_var("STORAGE_MIN_AGE") or 10 * 60)
+
+# Sidecars evicted together with the file they were derived from
+_SIDECAR_SUFFIXES = (SPEECH_PROXY_SUFFIX, LOUDNESS_SUFFIX)
+# Files still being written by yt-dlp/ffmpeg
+_PARTIAL_SUFFIXES = (".part", ".ytdl", ".tmp")
+
+
+def _quota(area: str, default_mb: int) -> int:
+    """Quota in bytes from STORAGE_QUOTA_<AREA>_MB; 0 means unlimited."""
+    return int(get_env_var(f"STORAGE_QUOTA_{area.upper()}_MB") or default_mb) * MB
+
+
+# name → (directory, file patterns managed there, default quota in MB)
+AREAS = {
+    "downloads": (os.path.abspath(DOWNLOAD_DIR), ("*",), 20000),
+    "videos": (os.path.abspath(VIDEOS_DIR), ("*",), 20000),
+    "clips": (str(CLIPS_DIR), ("clip_*",), 5000),
+    "logos": (str(LOGOS_DIR), ("*",), 200),
+    # Only generated files; the checked-in test assets stay
+    "remotion_public": (str(REMOTION_PUBLIC), ("slice_*", "logo_*"), 1000),
+}
+
+# Temp files of renders and recordings; none survive a restart legitimately
+ORPHAN_PATTERNS = [
+    os.path.join(str(REMOTION_PUBLIC), "slice_*"),
+    os.path.join(str(REMOTION_PUBLIC), "logo_*"),
+    os.path.join(str(CLIPS_DIR), "props_*"),
+    os.path.join(str(CLIPS_DIR), "speech_*"),
+    os.path.join(os.path.abspath(DOWNLOAD_DIR), "*.tmp"),
+    os.path.join(str(LIVE_DIR), "*"),
+    os.path.join(tempfile.gettempdir(), f"{STREAM_DIR_PREFIX}*"),
+]
+
+
+def touch(path: Optional[str]):
+    """Marks a file as just used (sets its atime, keeps its mtime)."""
+    if not path:
+        return
+    try:
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+    except OSError:
+        pass
+
+
+def _group_key(path: str) -> str:
+    """Files sharing a key (a download and its sidecars) are evicted together."""
+    for suffix in _SIDECAR_SUFFIXES:
+        if path.endswith(suffix):
+            return path[:-len(suffix)]
+    return os.path.splitext(path)[0]
+
+
+class StorageManager:
+    def __init__(self, areas: dict):
+        self.areas = {name: (directory, patterns, _quota(name, default)) for name, (directory, patterns, default) in areas.items()}
+        self._pins = Counter()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def pinned(self, *paths):
+        """Keeps the given files (and their sidecars) from being evicted."""
+        keys = [_group_key(os.path.abspath(p)) for p in paths if p]
+        with self._lock:
+            self._pins.update(keys)
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._pins.subtract(keys)
+                self._pins += Counter()
+
+    def _files(self, area: str) -> list:
+        directory, patterns, _ = self.areas[area]
+        files = set()
+        for pattern in patterns:
+            for path in glob.glob(os.path.join(directory, pattern)):
+                if os.path.isfile(path):
+                    files.add(os.path.abspath(path))
+        return sorted(files)
+
+    def usage(self, area: str) -> dict:
+        directory, _, quota = self.areas[area]
+        used = count = 0
+        for path in self._files(area):
+            try:
+                used += os.path.getsize(path)
+                count += 1
+            except OSError:
+                pass
+        return {"path": directory, "used": used, "files": count, "quota": quota}
+
+    def enforce(self, area: str) -> list:
+        """Evicts least recently used files until the area fits its quota; returns what was removed."""
+        _, _, quota = self.areas[area]
+        if not quota:
+            return []
+
+        groups = {}
+        total = 0
+        for path in self._files(area):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            total += stat.st_size
+            group = groups.setdefault(_group_key(path), {"paths": [], "size": 0, "accessed": 0.0, "modified": 0.0, "partial": False})
+            group["paths"].append(path)
+            group["size"] += stat.st_size
+            group["accessed"] = max(group["accessed"], stat.st_atime, stat.st_mtime)
+            group["modified"] = max(group["modified"], stat.st_mtime)
+            group["partial"] = group["partial"] or path.endswith(_PARTIAL_SUFFIXES)
+        if total <= quota:
+            return []
+
+        with self._lock:
+            pinned = set(self._pins)
+        now = time.time()
+        removed = []
+        for key, group in sorted(groups.items(), key=lambda item: item[1]["accessed"]):
+            if total <= quota:
+                break
+            if key in pinned or group["partial"] or now - group["modified"] < STORAGE_MIN_AGE:
+                continue
+            for path in group["paths"]:
+                try:
+                    size = os.path.getsize(path)
+                    os.remove(path)
+                    total -= size
+                    removed.append(path)
+                except OSError:
+                    pass
+        if removed:
+            download_index.remove_files(removed)
+            print(f"[Storage] {area}: evicted {len(removed)} files, {total / MB:.0f}/{quota / MB:.0f} MB used")
+        if total > quota:
+            print(f"[Storage] {area} is over quota; the rest is pinned or in use")
+        return removed
+
+    def enforce_all(self) -> dict:
+        return {area: self.enforce(area) for area in self.areas}
+
+    def sweep_orphans(self) -> int:
+        """Removes temp files left by renders/recordings that never cleaned up."""
+        removed = 0
+        for pattern in ORPHAN_PATTERNS:
+            for path in glob.glob(pattern):
+                try:
+                    if os.path.isdir(path):
+                        shutil.rmtree(path)
+                    else:
+                        os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        if removed:
+            print(f"[Storage] Swept {removed} orphan temp files")
+        return removed
+
+    def stats(self) -> dict:
+        with self._lock:
+            pins = len(self._pins)
+        return {
+            "areas": {area: self.usage(area) for area in self.areas},
+            "pinned": pins,
+            "min_age": STORAGE_MIN_AGE,
+        }
+
+
+storage = StorageManager(AREAS)
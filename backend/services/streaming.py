@@ -0,0 +1,180 @@
+"""
+Streaming Ingest
+Overlaps download and transcription of a finished Space. yt-dlp appends
+HLS fragments to its .part file in order, so the file is always a
+contiguous prefix of the stream; as soon as a whole window is on disk it
+is encoded straight from those bytes (MPEG-TS/ADTS resync at any offset)
+and handed to a RollingTranscriber. Whatever is left when the download
+finishes is cut from the final MP3, so time-to-transcript is close to
+max(download, transcribe) instead of their sum.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Optional
+from ..config import ConfigManager
+from .media import probe_duration, speech_from_bytes, speech_window
+from .downloader import space_download_events
+from .processor import (
+    RollingTranscriber, transcribe_full_space, transcript_mode,
+    CHUNKED_MIN_SECONDS, CHUNK_SECONDS, CHUNK_OVERLAP_SECONDS,
+)
+from .transcript_store import transcript_store
+from .jobs import Job
+
+# Byte rate assumed until the first window has been decoded (64 kbps AAC)
+DEFAULT_BYTES_PER_SECOND = 8000
+POLL_SECONDS = 1.0
+# Window directories in the system temp dir; leftovers are swept on startup
+STREAM_DIR_PREFIX = "s2t_stream_"
+
+
+class _DownloadWatcher:
+    """Follows a Space download on a background thread, keeping its latest state."""
+
+    def __init__(self, url: str):
+        self.part_path = None
+        self.duration = None
+        self.abr = None
+        self.result = None
+        self.error = None
+        self.finished = False
+        self._cond = threading.Condition()
+        threading.Thread(target=self._follow, args=(url,), daemon=True, name="download-watch").start()
+
+    def _follow(self, url: str):
+        try:
+            for event in space_download_events(url):
+                with self._cond:
+                    status = event.get("status")
+                    if status == "downloading":
+                        self.part_path = event.get("part_path") or self.part_path
+                        self.duration = event.get("duration") or self.duration
+                        self.abr = event.get("abr") or self.abr
+                    elif status == "processing":
+                        # Fragments are done; the .part is renamed and converted next
+                        self.part_path = None
+                    elif status == "completed":
+                        self.result = event
+                    elif status == "error":
+                        self.error = event.get("message")
+                    self._cond.notify_all()
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            with self._cond:
+                self.finished = True
+                self._cond.notify_all()
+
+    def wait(self, timeout: float) -> tuple:
+        """Waits for news, then returns (finished, part_path, duration, abr)."""
+        with self._cond:
+            if not self.finished:
+                self._cond.wait(timeout)
+            return self.finished, self.part_path, self.duration, self.abr
+
+
+def download_and_transcribe(url: str, config: Optional[dict] = None,
+                            on_progress: Optional[Callable] = None, job: Optional[Job] = None) -> tuple:
+    """
+    Downloads a Space and transcribes it, transcribing windows of the
+    partial download while the rest is still arriving. Returns
+    (audio_path, transcript). Reports download/transcribe phases through
+    on_progress(phase, done, **details); with a job, its phase moves to
+    "transcribe" as soon as transcription starts.
+
+    Cached downloads, Spaces short enough for a single transcription request
+    and downloads whose partial file can't be decoded go through
+    transcribe_full_space once the file is complete.
+    """
+    config = config or ConfigManager.get_config()
+    model = config.get("models", {}).get("transcript", "google/gemini-2.0-flash-001")
+    prompt = config.get("prompts", {}).get("transcript", "")
+    report = on_progress or (lambda *args, **kwargs: None)
+
+    def start_transcribing():
+        if job:
+            job.set_phase("transcribe")
+        report("transcribe", False)
+
+    report("download", False)
+    watcher = _DownloadWatcher(url)
+    window_dir = tempfile.mkdtemp(prefix=STREAM_DIR_PREFIX)
+    rolling = None
+    offset = 0
+    bytes_per_second = None
+    streaming = True
+    try:
+        while True:
+            finished, part_path, duration, abr = watcher.wait(POLL_SECONDS)
+            if finished:
+                break
+            if not streaming or not part_path:
+                continue
+            if duration and duration <= CHUNKED_MIN_SECONDS:
+                streaming = False
+                continue
+
+            rate = bytes_per_second or (abr * 125 if abr else DEFAULT_BYTES_PER_SECOND)
+            end = offset + int(CHUNK_SECONDS * rate)
+            try:
+                if os.path.getsize(part_path) < end:
+                    continue
+                with open(part_path, "rb") as f:
+                    f.seek(offset)
+                    data = f.read(end - offset)
+            except OSError:
+                continue
+
+            window_path = os.path.join(window_dir, f"window_{offset}.ogg")
+            try:
+                speech_from_bytes(data, window_path)
+                if bytes_per_second is None:
+                    # Calibrate the byte rate on the first decoded window
+                    bytes_per_second = len(data) / probe_duration(window_path)
+            except Exception as e:
+                print(f"[Stream] Partial download not decodable, transcribing after download: {e}")
+                streaming = False
+                continue
+
+            if rolling is None:
+                start_transcribing()
+                rolling = RollingTranscriber(model, prompt)
+            start = offset / bytes_per_second
+            rolling.add(window_path, start)
+            print(f"[Stream] Transcribing window at {start:.0f}s while downloading")
+            offset = end - int(CHUNK_OVERLAP_SECONDS * bytes_per_second)
+
+        if watcher.error:
+            raise Exception(watcher.error)
+        if not watcher.result:
+            raise Exception("Download ended without producing a file")
+        audio_path = os.path.abspath(watcher.result["filepath"])
+        filename = os.path.basename(audio_path)
+        report("download", True, audio_path=audio_path, download_url=f"/api/files/{filename}")
+
+        if rolling is None:
+            start_transcribing()
+            transcript = transcribe_full_space(audio_path, config=config)
+        else:
+            # The rest of the Space, from the finished file
+            start = offset / bytes_per_second
+            total = probe_duration(audio_path)
+            while start + CHUNK_OVERLAP_SECONDS < total:
+                length = min(CHUNK_SECONDS, total - start)
+                window_path = os.path.join(window_dir, f"tail_{int(start)}.ogg")
+                rolling.add(speech_window(audio_path, start, length, window_path), start)
+                start += length - CHUNK_OVERLAP_SECONDS
+            transcript = rolling.finish()
+            if transcript:
+                # Same windows and overlap as a chunked transcription
+                transcript_store.save_transcript(audio_path, model, prompt, transcript, transcript_mode(True))
+        report("transcribe", True, transcript=transcript)
+        return audio_path, transcript
+    except BaseException:
+        if rolling is not None:
+            rolling.cancel()
+        raise
+    finally:
+        shutil.rmtree(window_dir, ignore_errors=True)
@@ -1,24 +1,49 @@
 """
 Thread Generator Service
 Generates tweet thread summaries using a writer/judge feedback loop.
+Optionally drafts several candidates in parallel and keeps the best one.
 """
 import json
-from typing import Optional
+import contextvars
+import concurrent.futures
+from typing import Callable, Optional
 from ..config import ConfigManager
-from ..utils import send_to_openrouter, get_env_var
+from ..utils import send_to_openrouter, get_env_var, transcript_context_message
 
 MAX_ITERATIONS = 3
 
+# Parallel drafting: number of candidates written and judged concurrently in
+# the first round (1 = classic sequential loop). Candidates cycle through the
+# writer models (configured writer plus the comma-separated
+# `thread_writer_candidates` model ids, if set) and these temperatures.
+THREAD_CANDIDATES = int(get_env_var("THREAD_CANDIDATES") or 1)
+CANDIDATE_TEMPERATURES = [0.7, 1.0, 0.85, 1.15]
+
+# Compact rewrites: feedback rewrites get only the segments, the rejected
+# draft and the judge's feedback instead of the whole transcript again.
+COMPACT_REWRITES = (get_env_var("THREAD_COMPACT_REWRITES") or "").lower() in ("1", "true", "yes")
+
 
 def _call_writer(transcript: str, segments: str, prompt: str, model: str, 
-                 previous_feedback: Optional[str] = None) -> str:
-    """Call the writer LLM to generate a thread draft."""
+                 previous_feedback: Optional[str] = None,
+                 temperature: Optional[float] = None,
+                 previous_draft: Optional[str] = None,
+                 compact: bool = False,
+                 seed: Optional[int] = None) -> str:
+    """
+    Call the writer LLM to generate a thread draft.
+    The transcript is sent as the shared cacheable prefix; in compact mode a
+    rewrite skips it and works from the segments and the previous draft.
+    """
     
-    user_content = f"""# Transcript
-{transcript}
-
-# Viral Segments (High-Value Moments)
+    user_content = f"""# Viral Segments (High-Value Moments)
 {segments}"""
+
+    if previous_draft and (compact or previous_feedback):
+        user_content += f"""
+
+# Your Previous Draft
+{previous_draft}"""
     
     if previous_feedback:
         user_content += f"""
@@ -29,12 +54,16 @@ Your last draft was rejected. Here's what to fix:
 
 Please rewrite the thread addressing this feedback."""
     
-    messages = [
-        {"role": "system", "content": prompt},
-        {"role": "user", "content": user_content}
-    ]
+    messages = [{"role": "system", "content": prompt}, {"role": "user", "content": user_content}]
+    if not (compact and previous_draft):
+        messages.insert(0, transcript_context_message(transcript))
     
-    return send_to_openrouter(messages, model)
+    params = {}
+    if temperature is not None:
+        params["temperature"] = temperature
+    if seed is not None:
+        params["seed"] = seed
+    return send_to_openrouter(messages, model, params=params or None)
 
 
 def _call_judge(thread: str, prompt: str, model: str) -> dict:
@@ -66,9 +95,86 @@ def _call_judge(thread: str, prompt: str, model: str) -> dict:
         }
 
 
-def generate_thread(transcript: str, segments: str) -> dict:
+def _score(judge_result: dict) -> float:
+    try:
+        return float(judge_result.get("score") or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _candidate_plan(writer_model: str, models: dict, count: int) -> list:
+    """
+    (model, temperature, seed) for each parallel candidate. When there are
+    more candidates than distinct (model, temperature) pairs, repeats get a
+    seed so they sample a different draft (and miss each other in the LLM
+    cache); otherwise seed is None.
+    """
+    extra = models.get("thread_writer_candidates") or ""
+    writer_models = [writer_model] + [m.strip() for m in extra.split(",") if m.strip()]
+    plan = []
+    used = {}
+    for i in range(count):
+        pair = (writer_models[i % len(writer_models)], CANDIDATE_TEMPERATURES[i % len(CANDIDATE_TEMPERATURES)])
+        repeat = used.get(pair, 0)
+        used[pair] = repeat + 1
+        plan.append((*pair, repeat or None))
+    return plan
+
+
+def _draft_candidates(transcript: str, segments: str, plan: list,
+                      writer_prompt: str, judge_prompt: str, judge_model: str,
+                      on_progress: Callable) -> list:
+    """Writes and judges every planned candidate concurrently."""
+
+    def _run(index: int) -> dict:
+        model, temperature, seed = plan[index]
+        on_progress("writer", False, iteration=1, candidate=index + 1, model=model, temperature=temperature)
+        draft = _call_writer(transcript, segments, writer_prompt, model, temperature=temperature, seed=seed)
+        on_progress("writer", True, iteration=1, candidate=index + 1, draft=draft)
+
+        on_progress("judge", False, iteration=1, candidate=index + 1, model=judge_model)
+        verdict = _call_judge(draft, judge_prompt, judge_model)
+        on_progress("judge", True, iteration=1, candidate=index + 1,
+                    approved=verdict.get("approved", False), score=verdict.get("score"),
+                    feedback=verdict.get("feedback"))
+        print(f"Candidate {index + 1} ({model}, t={temperature}): "
+              f"approved={verdict.get('approved')}, score={verdict.get('score')}")
+        return {
+            "candidate": index + 1,
+            "model": model,
+            "temperature": temperature,
+            "draft": draft,
+            "approved": bool(verdict.get("approved", False)),
+            "score": _score(verdict),
+            "feedback": verdict.get("feedback", "No specific feedback provided"),
+        }
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(plan)) as pool:
+        futures = [pool.submit(contextvars.copy_context().run, _run, i) for i in range(len(plan))]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                print(f"Candidate failed: {e}")
+    if not results:
+        raise Exception("All thread candidates failed")
+    return results
+
+
+def generate_thread(transcript: str, segments: str,
+                    on_progress: Optional[Callable] = None,
+                    candidates: Optional[int] = None,
+                    config: Optional[dict] = None) -> dict:
     """
     Generate a tweet thread using writer/judge feedback loop.
+    on_progress, if given, is called as on_progress(phase, done, **details)
+    around every writer and judge call.
+
+    With candidates > 1 (default THREAD_CANDIDATES) the first round drafts
+    and judges that many threads concurrently and returns the highest-scoring
+    approved one; feedback rewrites only happen when none pass. config pins
+    a config snapshot.
     
     Returns:
         {
@@ -76,13 +182,15 @@ def generate_thread(transcript: str, segments: str) -> dict:
             "iterations": int,       # Number of attempts made
             "approved": bool,        # Whether judge approved
             "feedback_history": list # All feedback received
+            "candidates": list       # Parallel first-round summary (parallel mode)
         }
     """
     if not get_env_var("OPENROUTER_API_KEY"):
         raise Exception("OPENROUTER_API_KEY not found in .env")
+    on_progress = on_progress or (lambda *args, **kwargs: None)
     
     # Load config
-    config = ConfigManager.get_config()
+    config = config or ConfigManager.get_config()
     models = config.get("models", {})
     prompts = config.get("prompts", {})
     
@@ -98,27 +206,75 @@ def generate_thread(transcript: str, segments: str) -> dict:
     previous_feedback = None
     draft = ""
     approved = False
-    
-    for iteration in range(1, MAX_ITERATIONS + 1):
+    first_iteration = 1
+    candidate_summary = []
+    best = None
+
+    candidates = candidates or THREAD_CANDIDATES
+    if candidates > 1:
+        print(f"--- Thread Generation: {candidates} parallel candidates ---")
+        plan = _candidate_plan(writer_model, models, candidates)
+        results = _draft_candidates(
+            transcript, segments, plan, writer_prompt, judge_prompt, judge_model, on_progress
+        )
+        candidate_summary = [
+            {k: r[k] for k in ("candidate", "model", "temperature", "approved", "score")}
+            for r in results
+        ]
+        passed = [r for r in results if r["approved"]]
+        best = max(passed or results, key=lambda r: r["score"])
+        draft = best["draft"]
+        if passed:
+            print(f"Candidate {best['candidate']} approved (score {best['score']}).")
+            return {
+                "thread": draft,
+                "iterations": 1,
+                "approved": True,
+                "feedback_history": [],
+                "candidates": candidate_summary,
+            }
+        # None passed: rewrite the strongest draft using its feedback
+        feedback_history.append({
+            "iteration": 1,
+            "score": best["score"],
+            "feedback": best["feedback"]
+        })
+        previous_feedback = best["feedback"]
+        first_iteration = 2
+        print(f"No candidate approved. Rewriting candidate {best['candidate']}. Feedback: {previous_feedback}")
+
+    iteration = first_iteration - 1
+    for iteration in range(first_iteration, MAX_ITERATIONS + 1):
         print(f"--- Thread Generation: Iteration {iteration}/{MAX_ITERATIONS} ---")
         
         # Step 1: Generate draft
         print(f"Calling writer ({writer_model})...")
+        on_progress("writer", False, iteration=iteration, model=writer_model,
+                    compact=bool(COMPACT_REWRITES and draft))
         draft = _call_writer(
             transcript, segments, writer_prompt, writer_model, 
-            previous_feedback
+            previous_feedback,
+            previous_draft=draft or None,
+            compact=COMPACT_REWRITES,
         )
         print("Draft generated.")
+        on_progress("writer", True, iteration=iteration, draft=draft)
         
         # Step 2: Judge the draft
         print(f"Calling judge ({judge_model})...")
+        on_progress("judge", False, iteration=iteration, model=judge_model)
         judge_result = _call_judge(draft, judge_prompt, judge_model)
         print(f"Judge result: approved={judge_result.get('approved')}, score={judge_result.get('score')}")
+        on_progress("judge", True, iteration=iteration, approved=judge_result.get("approved", False),
+                    score=judge_result.get("score"), feedback=judge_result.get("feedback"))
         
         if judge_result.get("approved", False):
             approved = True
             print("Thread approved!")
             break
+
+        if best is None or _score(judge_result) >= best["score"]:
+            best = {"draft": draft, "score": _score(judge_result)}
         
         # Store feedback for next iteration
         feedback = judge_result.get("feedback", "No specific feedback provided")
@@ -132,10 +288,13 @@ def generate_thread(transcript: str, segments: str) -> dict:
     
     if not approved:
         print(f"Max iterations ({MAX_ITERATIONS}) reached. Returning best attempt.")
+        if best:
+            draft = best["draft"]
     
     return {
         "thread": draft,
         "iterations": iteration,
         "approved": approved,
-        "feedback_history": feedback_history
+        "feedback_history": feedback_history,
+        "candidates": candidate_summary,
     }
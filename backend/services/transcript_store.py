@@ -0,0 +1,265 @@
+"""
+Transcript Store
+Persists transcripts in SQLite (zlib-compressed blobs) keyed by the audio
+file's content hash plus the transcript model, prompt and mode (single
+request or chunked, with its window and overlap), so the same Space is
+never transcribed twice with the same settings. Word-level timings are
+stored per audio hash as a packed WordIndex.
+"""
+import os
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+from ..utils import file_sha256
+from .word_index import WordIndex
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent.resolve()
+DATA_DIR = PROJECT_ROOT / "data"
+TRANSCRIPTS_DB = DATA_DIR / "transcripts.sqlite3"
+# Word indexes kept decoded in memory (one per recently clipped Space)
+WORD_INDEX_CACHE_SIZE = 8
+
+
+def _pack(obj) -> bytes:
+    if isinstance(obj, str):
+        return zlib.compress(obj.encode("utf-8"))
+    return zlib.compress(json.dumps(obj, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack_text(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+def prompt_digest(prompt: str) -> str:
+    return hashlib.sha256((prompt or "").encode("utf-8")).hexdigest()
+
+
+class TranscriptStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._word_indexes = OrderedDict()
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.path), check_same_thread=False)
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS file_hashes (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS transcripts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    audio_sha256 TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    prompt_sha256 TEXT NOT NULL,
+                    filename TEXT,
+                    audio_path TEXT,
+                    created REAL NOT NULL,
+                    chars INTEGER NOT NULL,
+                    text BLOB NOT NULL,
+                    mode TEXT NOT NULL DEFAULT '',
+                    UNIQUE (audio_sha256, model, prompt_sha256, mode)
+                );
+                CREATE TABLE IF NOT EXISTS word_timings (
+                    audio_sha256 TEXT PRIMARY KEY,
+                    source TEXT,
+                    created REAL NOT NULL,
+                    count INTEGER NOT NULL,
+                    words BLOB NOT NULL
+                );
+            """)
+            self._migrate(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection):
+        """Adds the mode to the transcript key of older databases; their rows get mode ''."""
+        columns = [r[1] for r in conn.execute("PRAGMA table_info(transcripts)")]
+        if "mode" in columns:
+            return
+        conn.executescript("""
+            ALTER TABLE transcripts RENAME TO transcripts_old;
+            CREATE TABLE transcripts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                audio_sha256 TEXT NOT NULL,
+                model TEXT NOT NULL,
+                prompt_sha256 TEXT NOT NULL,
+                filename TEXT,
+                audio_path TEXT,
+                created REAL NOT NULL,
+                chars INTEGER NOT NULL,
+                text BLOB NOT NULL,
+                mode TEXT NOT NULL DEFAULT '',
+                UNIQUE (audio_sha256, model, prompt_sha256, mode)
+            );
+            INSERT INTO transcripts (id, audio_sha256, model, prompt_sha256, filename, audio_path, created, chars, text)
+                SELECT id, audio_sha256, model, prompt_sha256, filename, audio_path, created, chars, text FROM transcripts_old;
+            DROP TABLE transcripts_old;
+        """)
+
+    def audio_hash(self, audio_path: str) -> str:
+        """Content hash of an audio file, memoized by path, size and mtime."""
+        path = os.path.abspath(audio_path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._db().execute(
+                "SELECT sha256 FROM file_hashes WHERE path = ? AND size = ? AND mtime = ?",
+                (path, stat.st_size, stat.st_mtime),
+            ).fetchone()
+        if row:
+            return row[0]
+
+        digest = file_sha256(path)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO file_hashes (path, size, mtime, sha256) VALUES (?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime, digest),
+            )
+            db.commit()
+        return digest
+
+    def get_transcript(self, audio_path: str, model: str, prompt: str, mode: str,
+                       accept_legacy: bool = False) -> Optional[dict]:
+        """
+        Returns the stored transcript for this audio/model/prompt/mode, or
+        None. accept_legacy also takes a transcript stored before modes were
+        recorded (mode '') when there is none for the mode itself.
+        """
+        audio_sha = self.audio_hash(audio_path)
+        modes = (mode, "") if accept_legacy else (mode, mode)
+        with self._lock:
+            row = self._db().execute(
+                """SELECT id FROM transcripts
+                   WHERE audio_sha256 = ? AND model = ? AND prompt_sha256 = ? AND mode IN (?, ?)
+                   ORDER BY mode = '' LIMIT 1""",
+                (audio_sha, model, prompt_digest(prompt), *modes),
+            ).fetchone()
+        return self.get_by_id(row[0]) if row else None
+
+    def save_transcript(self, audio_path: str, model: str, prompt: str, text: str, mode: str) -> int:
+        """Stores a transcript made in the given mode and returns its id."""
+        audio_sha = self.audio_hash(audio_path)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                """INSERT INTO transcripts
+                       (audio_sha256, model, prompt_sha256, filename, audio_path, created, chars, text, mode)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (audio_sha256, model, prompt_sha256, mode) DO UPDATE SET
+                       filename = excluded.filename,
+                       audio_path = excluded.audio_path,
+                       created = excluded.created,
+                       chars = excluded.chars,
+                       text = excluded.text""",
+                (audio_sha, model, prompt_digest(prompt), os.path.basename(audio_path),
+                 os.path.abspath(audio_path), time.time(), len(text), _pack(text), mode),
+            )
+            transcript_id = db.execute(
+                "SELECT id FROM transcripts WHERE audio_sha256 = ? AND model = ? AND prompt_sha256 = ? AND mode = ?",
+                (audio_sha, model, prompt_digest(prompt), mode),
+            ).fetchone()[0]
+            db.commit()
+        return transcript_id
+
+    def save_word_timings(self, audio_path: str, words: list, source: str = "deepgram") -> WordIndex:
+        """Stores whole-file word timings ({text, start, end} dicts) for an audio file."""
+        audio_sha = self.audio_hash(audio_path)
+        index = WordIndex.from_words(words)
+        with self._lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO word_timings (audio_sha256, source, created, count, words) VALUES (?, ?, ?, ?, ?)",
+                (audio_sha, source, time.time(), len(index), index.to_bytes()),
+            )
+            db.commit()
+            self._remember_index(audio_sha, index)
+        return index
+
+    def _remember_index(self, audio_sha256: str, index: WordIndex):
+        self._word_indexes[audio_sha256] = index
+        self._word_indexes.move_to_end(audio_sha256)
+        while len(self._word_indexes) > WORD_INDEX_CACHE_SIZE:
+            self._word_indexes.popitem(last=False)
+
+    def get_word_index(self, audio_sha256: str) -> Optional[WordIndex]:
+        """Word index for an audio hash, decoded once and kept in memory."""
+        with self._lock:
+            index = self._word_indexes.get(audio_sha256)
+            if index is not None:
+                self._word_indexes.move_to_end(audio_sha256)
+                return index
+            row = self._db().execute(
+                "SELECT words FROM word_timings WHERE audio_sha256 = ?", (audio_sha256,)
+            ).fetchone()
+            if not row:
+                return None
+            index = WordIndex.from_bytes(row[0])
+            self._remember_index(audio_sha256, index)
+        return index
+
+    def get_word_timings(self, audio_sha256: str) -> Optional[list]:
+        index = self.get_word_index(audio_sha256)
+        return index.to_words() if index is not None else None
+
+    def list_transcripts(self) -> list:
+        """Metadata for every stored transcript, newest first (no text)."""
+        with self._lock:
+            rows = self._db().execute(
+                """SELECT t.id, t.audio_sha256, t.model, t.filename, t.audio_path, t.created, t.chars,
+                          w.count
+                   FROM transcripts t LEFT JOIN word_timings w ON w.audio_sha256 = t.audio_sha256
+                   ORDER BY t.created DESC"""
+            ).fetchall()
+        return [
+            {
+                "id": r[0],
+                "audio_sha256": r[1],
+                "model": r[2],
+                "filename": r[3],
+                "audio_path": r[4],
+                "created": r[5],
+                "chars": r[6],
+                "word_count": r[7] or 0,
+            }
+            for r in rows
+        ]
+
+    def get_by_id(self, transcript_id: int) -> Optional[dict]:
+        """Full transcript record including text and word timings (if any)."""
+        with self._lock:
+            row = self._db().execute(
+                """SELECT id, audio_sha256, model, prompt_sha256, filename, audio_path, created, text, mode
+                   FROM transcripts WHERE id = ?""",
+                (transcript_id,),
+            ).fetchone()
+        if not row:
+            return None
+        return {
+            "id": row[0],
+            "audio_sha256": row[1],
+            "model": row[2],
+            "prompt_sha256": row[3],
+            "filename": row[4],
+            "audio_path": row[5],
+            "created": row[6],
+            "text": _unpack_text(row[7]),
+            "mode": row[8],
+            "words": self.get_word_timings(row[1]),
+        }
+
+
+transcript_store = TranscriptStore(TRANSCRIPTS_DB)
@@ -0,0 +1,112 @@
+"""
+Waveform Frames
+Precomputes the per-frame bar levels drawn by remotion/src/components/Waveform.tsx
+so the composition does no audio decoding or FFT in the headless browser.
+
+Mirrors @remotion/media-utils visualizeAudio (a windowed FFT of 2 x N samples
+centered on each frame, averaged over the neighbouring frames) followed by
+the component's mirroring and gain logic, for all frames in one NumPy pass.
+"""
+import base64
+import subprocess
+from typing import Optional
+from .media import get_ffmpeg_bin
+from ..metrics import FFMPEG_LATENCY
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - the composition falls back to live FFT
+    np = None
+
+# Must match FPS in remotion/src/Root.tsx
+WAVEFORM_FPS = 30
+# Rate the browser decodes audio at for useAudioData
+WAVEFORM_SAMPLE_RATE = 48000
+# Same constants as Waveform.tsx
+MAX_GAIN = 20.0
+TARGET_PEAK = 0.8
+MIN_LEVEL = 0.08
+MAX_LEVEL = 0.95
+
+
+def _nearest_power_of_two(n: int) -> int:
+    for p in (32, 64, 128, 256):
+        if p >= n:
+            return p
+    return 256
+
+
+def _decode_mono(audio_path: str) -> "np.ndarray":
+    cmd = [
+        get_ffmpeg_bin(), "-v", "error",
+        "-i", audio_path,
+        "-ac", "1",
+        "-ar", str(WAVEFORM_SAMPLE_RATE),
+        "-f", "f32le",
+        "pipe:1",
+    ]
+    with FFMPEG_LATENCY.time(operation="waveform_decode"):
+        result = subprocess.run(cmd, capture_output=True)
+    if result.returncode != 0:
+        raise Exception(f"FFmpeg decode failed: {result.stderr.decode(errors='replace')[-500:]}")
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+
+def compute_levels(samples: "np.ndarray", duration_seconds: float, bar_count: int,
+                   fps: int = WAVEFORM_FPS, sample_rate: int = WAVEFORM_SAMPLE_RATE) -> "np.ndarray":
+    """
+    Returns a (frames, ceil(bar_count / 2)) array of bar heights as a
+    fraction of the waveform height. Only the left half is returned; the
+    component mirrors it.
+    """
+    half = -(-bar_count // 2)
+    sample_count = _nearest_power_of_two(half)
+    fft_size = sample_count * 2
+    frames = int(np.ceil(duration_seconds * fps))
+
+    # Windows for frames -1 .. frames (one extra each side for smoothing)
+    frame_index = np.arange(-1, frames + 1)
+    starts = np.floor(frame_index / fps * sample_rate).astype(np.int64) - fft_size // 2
+    starts = np.maximum(starts, 0)
+    padded = np.concatenate([samples, np.zeros(fft_size, dtype=np.float32)])
+    starts = np.minimum(starts, len(padded) - fft_size)
+    windows = padded[starts[:, None] + np.arange(fft_size)[None, :]]
+
+    # Same weighting as visualizeAudio
+    alpha = 16 / 25
+    weights = alpha - (1 - alpha) * np.cos(2 * np.pi * np.arange(fft_size) / (fft_size - 1))
+    magnitudes = np.abs(np.fft.rfft(windows * weights, axis=1))[:, :sample_count]
+    magnitudes /= weights.sum() / 2
+
+    # smoothing: true → average of previous, current and next frame
+    smoothed = (magnitudes[:-2] + magnitudes[1:-1] + magnitudes[2:]) / 3
+    raw = smoothed[:, :half]
+
+    max_amp = np.maximum(raw.max(axis=1, keepdims=True), 0.001)
+    gain = np.minimum(MAX_GAIN, TARGET_PEAK / max_amp)
+    return np.clip(raw * gain, MIN_LEVEL, MAX_LEVEL)
+
+
+def waveform_props(audio_path: str, duration_seconds: float, bar_count: int) -> Optional[dict]:
+    """
+    Builds the `waveform` clip prop: per-frame levels quantized to bytes and
+    base64 encoded (frames x bars, row-major). Returns None when NumPy or
+    decoding is unavailable, which makes the composition analyse the audio
+    itself.
+    """
+    if np is None:
+        return None
+    try:
+        samples = _decode_mono(audio_path)
+        levels = compute_levels(samples, duration_seconds, bar_count)
+    except Exception as e:
+        print(f"Waveform precompute failed, composition will analyse audio: {e}")
+        return None
+
+    quantized = np.round(levels * 255).astype(np.uint8)
+    return {
+        "fps": WAVEFORM_FPS,
+        "bars": int(quantized.shape[1]),
+        "frames": int(quantized.shape[0]),
+        "levels": base64.b64encode(quantized.tobytes()).decode("ascii"),
+    }
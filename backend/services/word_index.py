@@ -0,0 +1,90 @@
+"""
+Word Index
+Whole-Space word timings kept as parallel float arrays (start, end) plus a
+token table. Words are sorted by start time, so the words for any clip are
+a binary-search range query, rebased to the clip start.
+
+Serialized form (zlib-compressed):
+    b"WIX1" | uint32 count | float64 starts[count] | float64 ends[count] | tokens
+with tokens joined by TOKEN_SEPARATOR.
+"""
+import zlib
+import json
+import struct
+import bisect
+from array import array
+
+MAGIC = b"WIX1"
+TOKEN_SEPARATOR = "\x1f"
+# Words starting this much before a clip boundary still count as inside it
+BOUNDARY_SLACK = 0.05
+
+
+class WordIndex:
+    def __init__(self, starts: array, ends: array, tokens: list):
+        self.starts = starts
+        self.ends = ends
+        self.tokens = tokens
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @classmethod
+    def from_words(cls, words: list) -> "WordIndex":
+        """Builds an index from {text, start, end} dicts."""
+        ordered = sorted(words, key=lambda w: w["start"])
+        return cls(
+            array("d", (float(w["start"]) for w in ordered)),
+            array("d", (float(w["end"]) for w in ordered)),
+            [w.get("text", "") for w in ordered],
+        )
+
+    def to_bytes(self) -> bytes:
+        body = (
+            MAGIC
+            + struct.pack("<I", len(self.tokens))
+            + self.starts.tobytes()
+            + self.ends.tobytes()
+            + TOKEN_SEPARATOR.join(self.tokens).encode("utf-8")
+        )
+        return zlib.compress(body)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "WordIndex":
+        data = zlib.decompress(blob)
+        if not data.startswith(MAGIC):
+            # Rows written before the packed format: a JSON list of words
+            return cls.from_words(json.loads(data.decode("utf-8")))
+        (count,) = struct.unpack_from("<I", data, len(MAGIC))
+        offset = len(MAGIC) + 4
+        starts = array("d")
+        starts.frombytes(data[offset:offset + 8 * count])
+        offset += 8 * count
+        ends = array("d")
+        ends.frombytes(data[offset:offset + 8 * count])
+        offset += 8 * count
+        tokens = data[offset:].decode("utf-8").split(TOKEN_SEPARATOR) if count else []
+        return cls(starts, ends, tokens)
+
+    def to_words(self) -> list:
+        return [
+            {"text": text, "start": start, "end": end}
+            for text, start, end in zip(self.tokens, self.starts, self.ends)
+        ]
+
+    def range(self, start_time: float, end_time: float) -> list:
+        """
+        Words starting inside [start_time, end_time), with times relative to
+        start_time and ends clamped to the clip length.
+        """
+        lo = bisect.bisect_left(self.starts, start_time - BOUNDARY_SLACK)
+        hi = bisect.bisect_left(self.starts, end_time)
+        duration = end_time - start_time
+        return [
+            {
+                "text": self.tokens[i],
+                "start": round(max(0.0, self.starts[i] - start_time), 3),
+                "end": round(min(duration, self.ends[i] - start_time), 3),
+            }
+            for i in range(lo, hi)
+        ]
@@ -1,7 +1,20 @@
 import os
+import asyncio
+import base64
+import copy
+import hashlib
+import threading
+import time
+import contextvars
+from contextlib import contextmanager
 import requests
 import json
+from requests.adapters import HTTPAdapter
 from dotenv import load_dotenv
+from .metrics import (
+    OPENROUTER_LATENCY, OPENROUTER_TOKENS, OPENROUTER_COST,
+    OPENROUTER_REQUEST_BYTES, LLM_CACHE_LOOKUPS,
+)
 
 # Find the project root .env
 _current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -17,34 +30,305 @@ def get_env_var(key: str) -> str:
     """Helper to get an env var (tries standard os.getenv first)."""
     return os.getenv(key)
 
-def send_to_openrouter(messages: list, model: str) -> str:
+def file_sha256(path: str) -> str:
+    """Streams a file through sha256 and returns the hex digest."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# ─────────────────────────────────────────────
+# Shared OpenRouter client
+# ─────────────────────────────────────────────
+
+# Seconds to wait for a single completion. Audio transcription of a long
+# Space can legitimately take several minutes, so the default is generous.
+OPENROUTER_TIMEOUT = float(get_env_var("OPENROUTER_TIMEOUT") or 600)
+OPENROUTER_CONNECT_TIMEOUT = 10
+# Max number of OpenRouter requests in flight across the whole process
+OPENROUTER_MAX_CONCURRENCY = int(get_env_var("OPENROUTER_MAX_CONCURRENCY") or 8)
+
+_session = None
+_session_lock = threading.Lock()
+_request_slots = threading.BoundedSemaphore(OPENROUTER_MAX_CONCURRENCY)
+
+
+def get_http_session() -> requests.Session:
     """
-    Centralized helper to send requests to OpenRouter.
-    Automatically fetches the API key from environment.
+    Returns the process-wide keep-alive session used for OpenRouter calls.
+    The connection pool is sized to the concurrency cap so every in-flight
+    request can reuse a warm TLS connection.
     """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=OPENROUTER_MAX_CONCURRENCY,
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def _openrouter_headers() -> dict:
     api_key = get_env_var("OPENROUTER_API_KEY")
     if not api_key:
         raise Exception("OPENROUTER_API_KEY not found in environment.")
 
-    headers = {
+    return {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
         "HTTP-Referer": "https://space2thread.app",
         "X-Title": "Space2Thread"
     }
+
+
+# ─────────────────────────────────────────────
+# Token usage tracking
+# ─────────────────────────────────────────────
+
+class UsageTracker:
+    """Accumulates OpenRouter `usage` blocks for a job or pipeline phase."""
+
+    FIELDS = ("calls", "prompt_tokens", "completion_tokens", "total_tokens",
+              "cached_tokens", "uncached_prompt_tokens")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = dict.fromkeys(self.FIELDS, 0)
+
+    def add(self, usage: dict):
+        prompt_tokens = usage.get("prompt_tokens") or 0
+        cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+        with self._lock:
+            self._totals["calls"] += 1
+            self._totals["prompt_tokens"] += prompt_tokens
+            self._totals["completion_tokens"] += usage.get("completion_tokens") or 0
+            self._totals["total_tokens"] += usage.get("total_tokens") or 0
+            self._totals["cached_tokens"] += cached
+            self._totals["uncached_prompt_tokens"] += prompt_tokens - cached
+
+    def totals(self) -> dict:
+        with self._lock:
+            return dict(self._totals)
+
+    def since(self, snapshot: dict) -> dict:
+        """Usage recorded after `snapshot` (an earlier totals() result)."""
+        current = self.totals()
+        return {key: current[key] - snapshot.get(key, 0) for key in current}
+
+
+# Stack of trackers active in the current context; every OpenRouter call
+# is recorded into all of them so phase and job totals nest naturally.
+_active_trackers = contextvars.ContextVar("openrouter_usage_trackers", default=())
+
+
+@contextmanager
+def track_usage(tracker: UsageTracker = None):
+    """
+    Records the usage of every OpenRouter call made inside the block.
+    Worker threads only see the tracker if started with a copied context
+    (contextvars.copy_context().run).
+    """
+    tracker = tracker or UsageTracker()
+    token = _active_trackers.set(_active_trackers.get() + (tracker,))
+    try:
+        yield tracker
+    finally:
+        _active_trackers.reset(token)
+
+
+def _record_usage(usage: dict, model: str = ""):
+    for tracker in _active_trackers.get():
+        tracker.add(usage)
+
+    cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens") or 0
+    OPENROUTER_TOKENS.inc((usage.get("prompt_tokens") or 0) - cached, model=model, type="prompt_uncached")
+    OPENROUTER_TOKENS.inc(cached, model=model, type="prompt_cached")
+    OPENROUTER_TOKENS.inc(usage.get("completion_tokens") or 0, model=model, type="completion")
+    if usage.get("cost"):
+        OPENROUTER_COST.inc(usage["cost"], model=model)
+
+# ─────────────────────────────────────────────
+# Prompt prefix caching
+# ─────────────────────────────────────────────
+
+# Mark the shared transcript block as a cache breakpoint so providers that
+# support prompt caching reuse it across extract, verify and writer calls.
+PROMPT_CACHING = (get_env_var("PROMPT_CACHING") or "1").lower() not in ("0", "false", "no")
+
+
+def transcript_context_message(transcript: str) -> dict:
+    """
+    The leading message every transcript-based call starts with. Keeping it
+    byte-identical and first lets the provider cache the transcript prefix
+    once per Space instead of prefilling it on every step.
+    """
+    part = {"type": "text", "text": f"# Original Transcript\n{transcript}"}
+    if PROMPT_CACHING:
+        part["cache_control"] = {"type": "ephemeral"}
+    return {"role": "system", "content": [part]}
+
+# Raw bytes per base64 chunk when streaming audio (multiple of 3 so chunks
+# concatenate into one valid base64 string)
+_B64_READ_SIZE = 3 * 64 * 1024
+
+
+def audio_file_part(path: str, audio_format: str) -> dict:
+    """
+    Builds an `input_audio` content part that references a file on disk.
+    The file is base64-encoded on the fly while the request body is sent,
+    so it is never held in memory as one big string.
+    """
+    return {"type": "input_audio", "input_audio": {"file": path, "format": audio_format}}
+
+
+class _StreamedBody:
+    """
+    Iterable request body made of JSON text with file contents spliced in
+    as base64. Exposes __len__ so requests sends a Content-Length instead
+    of falling back to chunked transfer encoding.
+    """
+
+    def __init__(self, pieces: list):
+        # pieces: list of bytes (literal JSON) or str (path to base64-encode)
+        self.pieces = pieces
+
+    def __len__(self):
+        total = 0
+        for piece in self.pieces:
+            if isinstance(piece, bytes):
+                total += len(piece)
+            else:
+                size = os.path.getsize(piece)
+                total += 4 * ((size + 2) // 3)
+        return total
+
+    def __iter__(self):
+        for piece in self.pieces:
+            if isinstance(piece, bytes):
+                yield piece
+                continue
+            with open(piece, "rb") as f:
+                while True:
+                    chunk = f.read(_B64_READ_SIZE)
+                    if not chunk:
+                        break
+                    yield base64.b64encode(chunk)
+
+
+def _build_request_body(payload: dict):
+    """
+    Serializes the payload. Returns JSON bytes, or a _StreamedBody when
+    messages contain file-backed audio parts.
+    """
+    files = []
+    messages = copy.deepcopy(payload["messages"])
+    for message in messages:
+        content = message.get("content")
+        if not isinstance(content, list):
+            continue
+        for part in content:
+            audio = part.get("input_audio") if isinstance(part, dict) else None
+            if audio and "file" in audio:
+                placeholder = f"__s2t_audio_{len(files)}__"
+                files.append((placeholder, audio.pop("file")))
+                audio["data"] = placeholder
+
+    body = json.dumps({**payload, "messages": messages})
+    if not files:
+        return body.encode("utf-8")
+
+    pieces = []
+    for placeholder, path in files:
+        head, body = body.split(placeholder, 1)
+        pieces.append(head.encode("utf-8"))
+        pieces.append(path)
+    pieces.append(body.encode("utf-8"))
+    return _StreamedBody(pieces)
+
+
+def send_to_openrouter(messages: list, model: str, timeout: float = None,
+                       use_cache: bool = None, params: dict = None) -> str:
+    """
+    Centralized helper to send requests to OpenRouter.
+    Automatically fetches the API key from environment.
+
+    Requests go through a shared keep-alive session and are capped at
+    OPENROUTER_MAX_CONCURRENCY in flight. `timeout` overrides the default
+    read timeout (seconds) for this call. Audio parts built with
+    audio_file_part are streamed from disk.
+
+    When the LLM cache is enabled (or use_cache=True) identical requests
+    are answered from disk. `params` holds extra sampling options such as
+    temperature and is merged into the request payload.
+    """
+    from .llm_cache import llm_cache, make_cache_key, LLM_CACHE_ENABLED
+
+    if use_cache is None:
+        use_cache = LLM_CACHE_ENABLED
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(model, messages, params)
+        cached = llm_cache.get(cache_key)
+        LLM_CACHE_LOOKUPS.inc(result="hit" if cached is not None else "miss")
+        if cached is not None:
+            print(f"[LLM Cache Hit] {model}")
+            return cached
+
+    headers = _openrouter_headers()
     payload = {
         "model": model,
-        "messages": messages
+        "messages": messages,
+        # Ask OpenRouter to include cost and cached-token details in usage
+        "usage": {"include": True},
+        **(params or {})
     }
-    
+    body = _build_request_body(payload)
+    read_timeout = timeout or OPENROUTER_TIMEOUT
+    OPENROUTER_REQUEST_BYTES.inc(len(body), model=model)
+
     print(f"Sending request to OpenRouter ({model})...")
-    response = requests.post(OPENROUTER_URL, headers=headers, data=json.dumps(payload))
-    
+    with _request_slots:
+        started = time.perf_counter()
+        status = "error"
+        try:
+            response = get_http_session().post(
+                OPENROUTER_URL,
+                headers=headers,
+                data=body,
+                timeout=(OPENROUTER_CONNECT_TIMEOUT, read_timeout),
+            )
+            status = str(response.status_code)
+        finally:
+            OPENROUTER_LATENCY.observe(time.perf_counter() - started, model=model, status=status)
+
     if response.status_code != 200:
         raise Exception(f"OpenRouter API Error ({response.status_code}): {response.text}")
 
     result = response.json()
     try:
-        return result["choices"][0]["message"]["content"]
+        content = result["choices"][0]["message"]["content"]
     except (KeyError, IndexError):
         raise Exception(f"Unexpected response format: {result}")
+
+    _record_usage(result.get("usage") or {}, model)
+    if cache_key and content:
+        llm_cache.set(cache_key, content)
+    return content
+
+
+async def send_to_openrouter_async(messages: list, model: str, timeout: float = None,
+                                   use_cache: bool = None, params: dict = None) -> str:
+    """
+    Async variant of send_to_openrouter for use inside FastAPI handlers.
+    Runs on a worker thread so it shares the same connection pool and
+    concurrency cap as the synchronous callers.
+    """
+    # asyncio.to_thread copies the context, so usage tracking still applies
+    return await asyncio.to_thread(send_to_openrouter, messages, model, timeout, use_cache, params)
@@ -139,7 +139,11 @@ function App() {
                         if (!line.trim()) continue;
                         try {
                             const data = JSON.parse(line);
-                            if (data.status === 'downloading') {
+                            if (data.status === 'queued') {
+                                setDownloadStatus(`Queued — position ${data.position}`);
+                            } else if (data.status === 'starting') {
+                                setDownloadStatus('Starting download...');
+                            } else if (data.status === 'downloading') {
                                 setDownloadPhase('download');
                                 setDownloadProgress(data.progress);
                                 // Show fragment info if available
@@ -254,7 +258,11 @@ function App() {
                     if (!line.trim()) continue;
                     try {
                         const data = JSON.parse(line);
-                        if (data.status === 'downloading') {
+                        if (data.status === 'queued') {
+                            setDownloadStatus(`Queued — position ${data.position}`);
+                        } else if (data.status === 'starting') {
+                            setDownloadStatus('Starting download...');
+                        } else if (data.status === 'downloading') {
                             setDownloadProgress(data.progress);
                             setDownloadStatus(`Downloading: ${data.progress}% (${data.speed})`);
                         } else if (data.status === 'processing') {
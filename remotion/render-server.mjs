@@ -0,0 +1,200 @@
+/**
+ * Local Render Server
+ * ===================
+ *
+ * Long-lived alternative to `npx remotion render` for the Python backend.
+ * The project is bundled once and a headless browser is kept warm, so each
+ * clip only pays for rendering + encoding.
+ *
+ *   GET  /health    → { ok, bundledAt, rendering }
+ *   POST /render    → { compositionId, outputPath, inputProps }
+ *                     streams NDJSON: progress events, then completed/error
+ *   POST /rebundle  → re-bundles src/ (after editing compositions)
+ *
+ * Start with `npm run render-server` (the backend also starts it on demand).
+ * Listens on 127.0.0.1:$REMOTION_RENDER_PORT (default 3123).
+ */
+
+import http from "node:http";
+import fs from "node:fs";
+import path from "node:path";
+import { fileURLToPath } from "node:url";
+import { bundle } from "@remotion/bundler";
+import { openBrowser, renderMedia, selectComposition } from "@remotion/renderer";
+
+const ROOT = path.dirname(fileURLToPath(import.meta.url));
+const ENTRY = path.join(ROOT, "src", "index.ts");
+const PUBLIC_DIR = path.join(ROOT, "public");
+const PORT = Number(process.env.REMOTION_RENDER_PORT || 3123);
+
+let serveUrl = null;
+let bundledAt = null;
+let browser = null;
+let rendering = 0;
+
+async function ensureBundle(force = false) {
+    if (serveUrl && !force) return serveUrl;
+    console.log("[render-server] Bundling project...");
+    const started = Date.now();
+    serveUrl = await bundle({ entryPoint: ENTRY, publicDir: PUBLIC_DIR });
+    bundledAt = new Date().toISOString();
+    console.log(`[render-server] Bundled in ${Date.now() - started}ms → ${serveUrl}`);
+    return serveUrl;
+}
+
+async function ensureBrowser() {
+    if (browser) return browser;
+    console.log("[render-server] Launching headless browser...");
+    browser = await openBrowser("chrome");
+    return browser;
+}
+
+/**
+ * The bundle holds a copy of public/ taken at bundle time. Per-clip assets
+ * (audio slice, logo, waveform data) are created later, so link them into
+ * the bundle's public folder for the duration of the render. Batch renders
+ * share a logo, so staged files are reference counted.
+ */
+const stagedRefs = new Map();
+
+function stageAssets(bundleDir, props) {
+    const staged = [];
+    const targetDir = path.join(bundleDir, "public");
+    fs.mkdirSync(targetDir, { recursive: true });
+    for (const name of [props.audioFile, props.logoFile]) {
+        if (!name) continue;
+        const source = path.join(PUBLIC_DIR, name);
+        const target = path.join(targetDir, name);
+        if (!fs.existsSync(source)) continue;
+        const refs = stagedRefs.get(target) || 0;
+        if (refs === 0 && !fs.existsSync(target)) {
+            try {
+                fs.linkSync(source, target);
+            } catch {
+                fs.copyFileSync(source, target);
+            }
+        } else if (refs === 0) {
+            // Present since bundle time; not ours to remove
+            continue;
+        }
+        stagedRefs.set(target, refs + 1);
+        staged.push(target);
+    }
+    return staged;
+}
+
+function releaseAssets(staged) {
+    for (const target of staged) {
+        const refs = (stagedRefs.get(target) || 1) - 1;
+        if (refs > 0) {
+            stagedRefs.set(target, refs);
+            continue;
+        }
+        stagedRefs.delete(target);
+        fs.rmSync(target, { force: true });
+    }
+}
+
+function readJson(req) {
+    return new Promise((resolve, reject) => {
+        let body = "";
+        req.on("data", (chunk) => (body += chunk));
+        req.on("end", () => {
+            try {
+                resolve(body ? JSON.parse(body) : {});
+            } catch (err) {
+                reject(err);
+            }
+        });
+        req.on("error", reject);
+    });
+}
+
+async function handleRender(req, res) {
+    const { compositionId, outputPath, inputProps = {} } = await readJson(req);
+    res.writeHead(200, { "Content-Type": "application/x-ndjson" });
+    const send = (msg) => res.write(JSON.stringify(msg) + "\n");
+
+    rendering += 1;
+    const started = Date.now();
+    let staged = [];
+    try {
+        const url = await ensureBundle();
+        const puppeteerInstance = await ensureBrowser();
+        staged = stageAssets(url, inputProps);
+
+        const composition = await selectComposition({
+            serveUrl: url,
+            id: compositionId,
+            inputProps,
+            puppeteerInstance,
+        });
+
+        let lastSent = -1;
+        await renderMedia({
+            composition,
+            serveUrl: url,
+            codec: "h264",
+            outputLocation: outputPath,
+            inputProps,
+            puppeteerInstance,
+            onProgress: ({ progress, renderedFrames, encodedFrames }) => {
+                const pct = Math.floor(progress * 100);
+                if (pct === lastSent) return;
+                lastSent = pct;
+                send({
+                    status: "progress",
+                    progress,
+                    renderedFrames,
+                    encodedFrames,
+                    totalFrames: composition.durationInFrames,
+                });
+            },
+        });
+
+        send({ status: "completed", outputPath, elapsedMs: Date.now() - started });
+    } catch (err) {
+        console.error("[render-server] Render failed:", err);
+        send({ status: "error", message: String(err && err.stack ? err.stack : err) });
+    } finally {
+        rendering -= 1;
+        releaseAssets(staged);
+        res.end();
+    }
+}
+
+const server = http.createServer(async (req, res) => {
+    try {
+        if (req.method === "GET" && req.url === "/health") {
+            res.writeHead(200, { "Content-Type": "application/json" });
+            res.end(JSON.stringify({ ok: Boolean(serveUrl && browser), bundledAt, rendering }));
+        } else if (req.method === "POST" && req.url === "/render") {
+            await handleRender(req, res);
+        } else if (req.method === "POST" && req.url === "/rebundle") {
+            await ensureBundle(true);
+            res.writeHead(200, { "Content-Type": "application/json" });
+            res.end(JSON.stringify({ ok: true, bundledAt }));
+        } else {
+            res.writeHead(404);
+            res.end();
+        }
+    } catch (err) {
+        if (!res.headersSent) res.writeHead(500, { "Content-Type": "application/json" });
+        res.end(JSON.stringify({ status: "error", message: String(err) }));
+    }
+});
+
+// Warm everything up before accepting work so the first clip is fast too
+await ensureBundle();
+await ensureBrowser();
+server.listen(PORT, "127.0.0.1", () => {
+    console.log(`[render-server] Ready on http://127.0.0.1:${PORT}`);
+});
+
+const shutdown = async () => {
+    server.close();
+    if (browser) await browser.close({ silent: true }).catch(() => {});
+    process.exit(0);
+};
+process.on("SIGINT", shutdown);
+process.on("SIGTERM", shutdown);
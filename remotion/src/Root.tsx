@@ -3,6 +3,7 @@ import { Composition } from "remotion";
 import { CenteredWaveform } from "./compositions/CenteredWaveform";
 import { SplitScreen } from "./compositions/SplitScreen";
 import { PodcastCard } from "./compositions/PodcastCard";
+import type { WaveformData } from "./components/Waveform";
 
 export type ClipProps = {
     /** Filename in public/ directory */
@@ -23,6 +24,8 @@ export type ClipProps = {
         accent: string;
     };
     durationInSeconds: number;
+    /** Per-frame bar levels precomputed by the backend (skips FFT in the browser) */
+    waveform?: WaveformData | null;
 };
 
 const FPS = 30;
@@ -1,7 +1,19 @@
-import React from "react";
+import React, { useMemo } from "react";
 import { useCurrentFrame, useVideoConfig } from "remotion";
 import { useAudioData, visualizeAudio } from "@remotion/media-utils";
 
+/**
+ * Bar levels precomputed by the backend (backend/services/waveform.py):
+ * `frames` rows of `bars` bytes (0-255 → 0-1 of the height), base64 encoded.
+ * Only the left half is stored; it is mirrored here like the live version.
+ */
+export type WaveformData = {
+    fps: number;
+    bars: number;
+    frames: number;
+    levels: string;
+};
+
 type WaveformProps = {
     audioSrc: string;
     barColor: string;
@@ -9,6 +21,16 @@ type WaveformProps = {
     style?: "bars" | "rounded";
     width?: number;
     height?: number;
+    data?: WaveformData | null;
+};
+
+type BarsProps = {
+    levels: number[];
+    barColor: string;
+    barCount: number;
+    style: "bars" | "rounded";
+    width: number;
+    height: number;
 };
 
 function nearestPowerOfTwo(n: number): number {
@@ -16,7 +38,63 @@ function nearestPowerOfTwo(n: number): number {
     return 256;
 }
 
-export const Waveform: React.FC<WaveformProps> = ({
+/** Draws bars from levels given as a fraction of the height */
+const Bars: React.FC<BarsProps> = ({ levels, barColor, barCount, style, width, height }) => {
+    const barWidth = (width / barCount) * 0.65;
+    const gap = (width / barCount) * 0.35;
+
+    return (
+        <div
+            style={{
+                display: "flex",
+                alignItems: "center",
+                justifyContent: "center",
+                gap: `${gap}px`,
+                width: `${width}px`,
+                height: `${height}px`,
+            }}
+        >
+            {levels.map((level, i) => {
+                const boosted = level * height;
+                const radius = style === "rounded" ? barWidth / 2 : 2;
+                return (
+                    <div
+                        key={i}
+                        style={{
+                            width: `${barWidth}px`,
+                            height: `${boosted}px`,
+                            backgroundColor: barColor,
+                            borderRadius: `${radius}px`,
+                            opacity: 0.4 + level * 0.6,
+                            boxShadow: `0 0 ${Math.floor(level * 16)}px ${barColor}50`,
+                        }}
+                    />
+                );
+            })}
+        </div>
+    );
+};
+
+const PrecomputedWaveform: React.FC<Omit<WaveformProps, "audioSrc"> & { data: WaveformData }> = ({
+    data,
+    barColor,
+    barCount = 32,
+    style = "rounded",
+    width = 800,
+    height = 200,
+}) => {
+    const frame = useCurrentFrame();
+    const { fps } = useVideoConfig();
+    const bytes = useMemo(() => Uint8Array.from(atob(data.levels), (c) => c.charCodeAt(0)), [data.levels]);
+
+    const row = Math.min(data.frames - 1, Math.max(0, Math.round((frame / fps) * data.fps)));
+    const halfLevels = Array.from(bytes.subarray(row * data.bars, (row + 1) * data.bars), (b) => b / 255);
+    const levels = [...halfLevels, ...[...halfLevels].reverse()];
+
+    return <Bars levels={levels} barColor={barColor} barCount={barCount} style={style} width={width} height={height} />;
+};
+
+const LiveWaveform: React.FC<WaveformProps> = ({
     audioSrc,
     barColor,
     barCount = 32,
@@ -50,39 +128,19 @@ export const Waveform: React.FC<WaveformProps> = ({
     // Amplify strongly so bars are always visibly animated.
     const gain = Math.min(20, 0.8 / maxAmp);
 
-    const barWidth = (width / barCount) * 0.65;
-    const gap = (width / barCount) * 0.35;
     // Minimum bar height so there's always a visible bar even during pauses
-    const minBarHeight = height * 0.08;
+    const levels = raw.map((amp) => Math.max(0.08, Math.min(0.95, amp * gain)));
 
-    return (
-        <div
-            style={{
-                display: "flex",
-                alignItems: "center",
-                justifyContent: "center",
-                gap: `${gap}px`,
-                width: `${width}px`,
-                height: `${height}px`,
-            }}
-        >
-            {raw.map((amp, i) => {
-                const boosted = Math.max(minBarHeight, Math.min(height * 0.95, amp * gain * height));
-                const radius = style === "rounded" ? barWidth / 2 : 2;
-                return (
-                    <div
-                        key={i}
-                        style={{
-                            width: `${barWidth}px`,
-                            height: `${boosted}px`,
-                            backgroundColor: barColor,
-                            borderRadius: `${radius}px`,
-                            opacity: 0.4 + (boosted / height) * 0.6,
-                            boxShadow: `0 0 ${Math.floor((boosted / height) * 16)}px ${barColor}50`,
-                        }}
-                    />
-                );
-            })}
-        </div>
-    );
+    return <Bars levels={levels} barColor={barColor} barCount={barCount} style={style} width={width} height={height} />;
+};
+
+/**
+ * Uses the backend's precomputed levels when present; otherwise decodes the
+ * audio and runs an FFT per frame.
+ */
+export const Waveform: React.FC<WaveformProps> = (props) => {
+    if (props.data) {
+        return <PrecomputedWaveform {...props} data={props.data} />;
+    }
+    return <LiveWaveform {...props} />;
 };
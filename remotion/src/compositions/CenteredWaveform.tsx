@@ -23,6 +23,7 @@ export const CenteredWaveform: React.FC<ClipProps> = ({
     logoPosition = "top-right",
     colors,
     durationInSeconds,
+    waveform,
 }) => {
     const frame = useCurrentFrame();
     const { fps } = useVideoConfig();
@@ -84,6 +85,7 @@ export const CenteredWaveform: React.FC<ClipProps> = ({
             <div style={{ marginTop: 40 }}>
                 <Waveform
                     audioSrc={audioSrc}
+                    data={waveform}
                     barColor={colors.waveform}
                     barCount={40}
                     style="rounded"
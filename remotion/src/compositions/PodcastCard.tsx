@@ -22,6 +22,7 @@ export const PodcastCard: React.FC<ClipProps> = ({
     logoFile,
     colors,
     durationInSeconds,
+    waveform,
 }) => {
     const frame = useCurrentFrame();
     const { fps } = useVideoConfig();
@@ -141,6 +142,7 @@ export const PodcastCard: React.FC<ClipProps> = ({
 
                 <Waveform
                     audioSrc={audioSrc}
+                    data={waveform}
                     barColor={colors.waveform}
                     barCount={28}
                     style="rounded"
@@ -22,6 +22,7 @@ export const SplitScreen: React.FC<ClipProps> = ({
     logoFile,
     colors,
     durationInSeconds,
+    waveform,
 }) => {
     const frame = useCurrentFrame();
     const { fps } = useVideoConfig();
@@ -124,6 +125,7 @@ export const SplitScreen: React.FC<ClipProps> = ({
 
                 <Waveform
                     audioSrc={audioSrc}
+                    data={waveform}
                     barColor={colors.waveform}
                     barCount={24}
                     style="rounded"